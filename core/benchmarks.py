@@ -0,0 +1,283 @@
+# backend/core/benchmarks.py
+"""
+Endpoint benchmark harness used by finance/tests.py and users/tests.py.
+
+Each app lists a Scenario per endpoint (and method). The normal test run
+replays every scenario once against seeded data and fails if a request
+runs more queries than its baseline in core/benchmark_baselines.json.
+
+    python manage.py test                       # query-count gates
+    RUN_BENCHMARKS=1 python manage.py test      # + latency/throughput gates
+    UPDATE_BENCHMARK_BASELINES=1 ...            # rewrite the baselines
+
+Latency runs send each scenario one untimed warm-up request, then
+BENCHMARK_ROUNDS rounds of BENCHMARK_ITERATIONS timed ones, and compare
+the median of the rounds' p95s with the baseline times
+BENCHMARK_LATENCY_TOLERANCE.
+
+Set DATABASE_URL to run against a local Postgres instead of SQLite.
+"""
+
+import json
+import os
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'benchmark_baselines.json'
+
+RUN_BENCHMARKS = bool(os.getenv('RUN_BENCHMARKS'))
+UPDATE_BASELINES = bool(os.getenv('UPDATE_BENCHMARK_BASELINES'))
+BENCHMARK_ITERATIONS = int(os.getenv('BENCHMARK_ITERATIONS', 30))
+# The gated p95 is the median of this many rounds' p95s, so one slow
+# round (a GC pause, a busy machine) doesn't fail the run
+BENCHMARK_ROUNDS = int(os.getenv('BENCHMARK_ROUNDS', 3))
+BENCHMARK_SCALE = int(os.getenv('BENCHMARK_SCALE', 1))
+# Latency baselines are machine dependent; allow this much headroom (a
+# whole run on a busy machine comes in up to ~1.8x slower)
+LATENCY_TOLERANCE = float(os.getenv('BENCHMARK_LATENCY_TOLERANCE', 2.0))
+
+
+class Scenario:
+    """
+    One request to benchmark. `path` and `data` may be callables taking
+    (data, i), where `data` is the seeded namespace and `i` the iteration;
+    `setup(data, i)` runs before each request, outside the measurement.
+    """
+
+    def __init__(self, url_name, method, path, data=None, setup=None, status=200, auth=True):
+        self.url_name = url_name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.setup = setup
+        self.status = status
+        self.auth = auth
+
+    @property
+    def key(self):
+        return f"{self.method} {self.url_name}"
+
+    def build(self, value, seeded, i):
+        return value(seeded, i) if callable(value) else value
+
+
+def seed_benchmark_data(scale=BENCHMARK_SCALE):
+    """
+    Seeds a catalog, a crowd of other users and one heavily active user
+    (`data.user`) whose requests are benchmarked.
+    """
+    from finance.installments import build_schedule
+    from finance.models import Goal, Installment, Order, Product, RecurringDeposit, Transaction
+    from users.models import User
+
+    password = make_password('bench-pass')
+    now = timezone.now()
+
+    products = Product.objects.bulk_create([
+        Product(
+            name=f"Product {i}", description="Benchmark item", price=Decimal('2000.00'),
+            required_koin_score=0, vendor_name="Bench Vendor", vendor_location="Campus",
+        )
+        for i in range(50 * scale)
+    ])
+
+    others = User.objects.bulk_create([
+        User(username=f"other{i}@bench.test", email=f"other{i}@bench.test", name=f"Other {i}", password=password)
+        for i in range(100 * scale)
+    ])
+    other_goals = Goal.objects.bulk_create([
+        Goal(owner=user, name="Savings", target_amount=Decimal('10000.00'), current_amount=Decimal('500.00'))
+        for user in others
+    ])
+    Transaction.objects.bulk_create([
+        Transaction(
+            owner_id=goal.owner_id, goal=goal, amount=Decimal('100.00'), status='completed',
+            checkout_request_id=f"bench-other-{goal.id}-{j}", transaction_date=now - timedelta(days=j),
+        )
+        for goal in other_goals for j in range(20)
+    ])
+
+    user = User.objects.create(
+        username='bench@bench.test', email='bench@bench.test', name='Bench Student', password=password,
+        phone_number='0712345678', koin_score=10 ** 9,
+    )
+    goals = Goal.objects.bulk_create([
+        Goal(owner=user, name=f"Goal {i}", target_amount=Decimal('10000000.00'), current_amount=Decimal('1000000.00'))
+        for i in range(10)
+    ])
+    Transaction.objects.bulk_create([
+        Transaction(
+            owner=user, goal=goals[j % len(goals)], amount=Decimal('250.00'), status='completed',
+            checkout_request_id=f"bench-user-{j}", mpesa_receipt_number=f"BENCH{j}",
+            transaction_date=now - timedelta(hours=j),
+        )
+        for j in range(500 * scale)
+    ])
+    orders = Order.objects.bulk_create([
+        Order(
+            user=user, product=product, total_amount=product.price, down_payment=Decimal('500.00'),
+            amount_financed=Decimal('1500.00'), status='COMPLETED',
+        )
+        for product in products[:20]
+    ])
+    Installment.objects.bulk_create([installment for order in orders for installment in build_schedule(order)])
+    recurring = RecurringDeposit.objects.bulk_create([
+        RecurringDeposit(
+            owner=user, goal=goal, amount=Decimal('100.00'), next_run_at=now + timedelta(days=30),
+            day_of_month=(now + timedelta(days=30)).day,
+        )
+        for goal in goals[:5]
+    ])
+
+    return SimpleNamespace(
+        user=user, password='bench-pass', goals=goals, products=products, orders=orders,
+        recurring=recurring, started_at=now,
+    )
+
+
+def _client(seeded, scenario):
+    client = APIClient()
+    if scenario.auth:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(seeded.user).access_token}")
+    return client
+
+
+def _external_calls_mocked():
+    stack = ExitStack()
+    stack.enter_context(mock.patch('finance.views.initiate_payhero_push', return_value={'success': True}))
+    stack.enter_context(mock.patch('finance.views.messaging.send', return_value='bench-message'))
+    stack.enter_context(mock.patch('finance.async_views.initiate_payhero_push_async', return_value={'success': True}))
+    # Replaying a payment endpoint dozens of times would trip the throttles
+    # and velocity limits; keep them in the measured path but out of the way
+    stack.enter_context(override_settings(
+        PAYHERO_USER_THROTTLE_RATE='1000/s', PAYHERO_USER_THROTTLE_BURST=10000,
+        PAYHERO_GLOBAL_THROTTLE_RATE='1000/s', PAYHERO_GLOBAL_THROTTLE_BURST=10000,
+        ORDER_CREATE_THROTTLE_RATE='1000/s', ORDER_CREATE_THROTTLE_BURST=10000,
+        VELOCITY_DEPOSIT_ATTEMPT_LIMIT='100000/s', VELOCITY_REPAY_ATTEMPT_LIMIT='100000/s',
+        VELOCITY_DEPOSIT_LIMIT='100000/s', VELOCITY_ORDER_CYCLE_LIMIT='100000/s',
+    ))
+    return stack
+
+
+def _p95(latencies_ms):
+    latencies_ms = sorted(latencies_ms)
+    return latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+
+
+def run_scenario(scenario, seeded, iterations, warmup=0, rounds=1):
+    """
+    Replays a scenario and returns the worst query count plus latency and
+    throughput figures for the measured requests: `rounds` rounds of
+    `iterations` requests, reporting the median of the rounds' p95s. The
+    first `warmup` requests count towards the queries but aren't timed, so
+    the figures don't include the first request's one-off costs.
+    """
+    client = _client(seeded, scenario)
+    query_counts, latencies = [], []
+
+    with _external_calls_mocked():
+        for i in range(warmup + rounds * iterations):
+            if scenario.setup:
+                scenario.setup(seeded, i)
+            path = scenario.build(scenario.path, seeded, i)
+            data = scenario.build(scenario.data, seeded, i)
+            send = getattr(client, scenario.method.lower())
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                if scenario.method == 'GET':
+                    response = send(path, data)
+                else:
+                    response = send(path, data, format='json')
+                if i >= warmup:
+                    latencies.append(time.perf_counter() - started)
+
+            if response.status_code != scenario.status:
+                raise AssertionError(
+                    f"{scenario.key} returned {response.status_code}, expected {scenario.status}: "
+                    f"{response.content[:300]!r}"
+                )
+            query_counts.append(len(queries))
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    round_p95s = [_p95(latencies_ms[start:start + iterations]) for start in range(0, len(latencies_ms), iterations)]
+    return {
+        'queries': max(query_counts),
+        'p50_ms': round(statistics.median(latencies_ms), 3),
+        'p95_ms': round(statistics.median(round_p95s), 3),
+        'rps': round(len(latencies) / sum(latencies), 1),
+    }
+
+
+def load_baselines():
+    if not BASELINES_PATH.exists():
+        return {}
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def save_baselines(results, include_latency):
+    baselines = load_baselines()
+    for key, result in results.items():
+        entry = baselines.setdefault(key, {})
+        entry['queries'] = result['queries']
+        if include_latency:
+            entry['p95_ms'] = result['p95_ms']
+    BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def check_scenarios(testcase, scenarios, seeded, measure_latency=False):
+    """
+    Runs every scenario and fails the test if any exceeds its baseline.
+    """
+    baselines = load_baselines()
+    # Start cold: cached responses from earlier tests would hide queries
+    cache.clear()
+    results, failures = {}, []
+
+    for scenario in scenarios:
+        if measure_latency:
+            result = run_scenario(scenario, seeded, BENCHMARK_ITERATIONS, warmup=1, rounds=BENCHMARK_ROUNDS)
+        else:
+            result = run_scenario(scenario, seeded, 1)
+        results[scenario.key] = result
+        baseline = baselines.get(scenario.key)
+
+        if baseline is None:
+            failures.append(f"{scenario.key}: no baseline recorded ({result['queries']} queries)")
+            continue
+        if result['queries'] > baseline['queries']:
+            failures.append(f"{scenario.key}: {result['queries']} queries, baseline {baseline['queries']}")
+        if measure_latency and 'p95_ms' not in baseline:
+            failures.append(f"{scenario.key}: no p95 baseline recorded ({result['p95_ms']} ms)")
+        elif measure_latency and result['p95_ms'] > baseline['p95_ms'] * LATENCY_TOLERANCE:
+            failures.append(f"{scenario.key}: p95 {result['p95_ms']} ms, baseline {baseline['p95_ms']} ms")
+
+    if measure_latency:
+        print(f"\n{'endpoint':<45}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+        for key, result in results.items():
+            print(f"{key:<45}{result['queries']:>8}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['rps']:>10}")
+
+    if UPDATE_BASELINES:
+        save_baselines(results, include_latency=measure_latency)
+        return
+
+    testcase.assertFalse(failures, "Benchmark regressions:\n" + "\n".join(failures))
+
+
+def uncovered_url_names(urlpatterns, scenarios):
+    covered = {scenario.url_name for scenario in scenarios}
+    return sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
@@ -0,0 +1,32 @@
+# backend/core/checks.py
+"""
+System checks for settings that only matter once there are several worker
+processes (registered from FinanceConfig.ready()).
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # Invalidation (goal summaries, cached list responses), the throttles'
+    # token buckets and the velocity counters all assume one cache for
+    # every worker
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] in SHARED_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        "The default cache is local to each process.",
+        hint=(
+            "Set REDIS_URL. Without a shared cache, cache invalidation, payment throttles and velocity "
+            "limits only apply within a single worker."
+        ),
+        id='core.W001',
+    )]
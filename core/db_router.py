@@ -0,0 +1,125 @@
+# backend/core/db_router.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+# Reads go to the primary ('default') unless code explicitly opts in, either
+# with read_from_replica() or by using ReplicaReadMixin on a read-only view.
+# Writes always go to the primary.
+
+REPLICA = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _pin_key(user_id):
+    return f"db_pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Sends this user's reads to the primary for REPLICA_PIN_SECONDS, so they
+    see their own writes even if the replica is lagging.
+    """
+    if replica_configured():
+        cache.set(_pin_key(user_id), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views: GET/HEAD/OPTIONS requests read from the replica unless
+    the user wrote something in the last REPLICA_PIN_SECONDS. Other methods
+    are untouched and stay on the primary.
+
+    Only for responses that are neither cached nor used to issue sync
+    tokens: a lagging replica would otherwise be cached under a fresh
+    version (response_cache.py, summary.py) or behind a token whose
+    timestamp skips rows the replica hadn't seen yet (sync.py).
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _use_replica.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication runs here, against the primary
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_configured() and not is_pinned(request.user.id):
+            _use_replica.set(True)
+
+
+@sync_and_async_middleware
+class PrimaryPinMiddleware:
+    """
+    Pins the user to the primary after any successful write request.
+    Runs after the view so it sees the user DRF authenticated.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.should_pin(request, response):
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.should_pin(request, response):
+            # request.user may still be lazy, and the cache client is sync
+            await sync_to_async(self.pin)(request)
+        return response
+
+    def should_pin(self, request, response):
+        return replica_configured() and request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.id)
@@ -0,0 +1,190 @@
+# backend/core/fast_serializers.py
+"""
+Read-only fast path for large list endpoints.
+
+ValuesSerializer reproduces a ModelSerializer's many=True output from a
+single values_list() query: no model instances, no per-row field lookups,
+just a tuple per row and a converter per column worked out once from the
+serializer's own fields. The output is the same, byte for byte, as long as
+every field is a plain model column (no method fields, nested serializers
+or dotted sources); anything else is rejected when the serializer is
+compiled, not silently mis-rendered.
+"""
+
+import decimal
+import heapq
+from functools import partial
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .serializers import parse_field_spec, requested_expansions
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.decimal_places is None or field.normalize_output or field.localize or not coerce_to_string:
+        return field.to_representation
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or not settings.USE_TZ:
+        return field.to_representation
+
+    field_timezone = getattr(field, 'timezone', None)
+
+    def convert(value, current_timezone):
+        if not timezone.is_aware(value):
+            # Not what the database hands back with USE_TZ; let DRF decide
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone or current_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    convert.needs_timezone = True
+    return convert
+
+
+def _choice_converter(field):
+    # Model choices with string keys come back from the database as the key
+    if all(key == str(key) == value for key, value in field.choice_strings_to_values.items()):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Wraps a ModelSerializer class. `serialize(queryset)` returns the same
+    list of dicts as `serializer_class(queryset, many=True).data`.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._columns = None
+
+    def compile(self):
+        """(name, column, converter) per readable field, built on first use."""
+        if self._columns is None:
+            model = self.serializer_class.Meta.model
+            columns = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                columns.append((name, *self._column_for(model, name, field)))
+            self._columns = columns
+        return self._columns
+
+    def _column_for(self, model, name, field):
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) or '.' in field.source:
+            raise ImproperlyConfigured(
+                f"{self.serializer_class.__name__}.{name} is not a plain model column; "
+                "ValuesSerializer can't render it."
+            )
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"{self.serializer_class.__name__}.{name} has no model field.")
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            if field.pk_field is not None or model_field.many_to_many:
+                raise ImproperlyConfigured(f"{self.serializer_class.__name__}.{name} is not a plain foreign key.")
+            return model_field.attname, None
+        if isinstance(field, serializers.DecimalField):
+            return model_field.attname, _decimal_converter(field)
+        if isinstance(field, serializers.DateTimeField):
+            return model_field.attname, _datetime_converter(field)
+        if isinstance(field, serializers.ChoiceField):
+            return model_field.attname, _choice_converter(field)
+        if type(field) in (serializers.IntegerField, serializers.CharField):
+            # The database already returns int/str
+            return model_field.attname, None
+        return model_field.attname, field.to_representation
+
+    def serialize(self, queryset, fields=None):
+        """
+        `fields`, if given, limits the output to those names (as ?fields=
+        does), keeping the serializer's field order.
+        """
+        return [row for _, row in self._rows(queryset, fields)]
+
+    def serialize_merged(self, querysets, key, fields=None):
+        """
+        Like serialize() over several querysets with the same columns (a
+        table and its archive, say), each ordered by descending `key`. The
+        rows are merged into one list in that order.
+        """
+        streams = [self._rows(queryset, fields, key) for queryset in querysets]
+        return [row for _, row in heapq.merge(*streams, key=itemgetter(0), reverse=True)]
+
+    def _rows(self, queryset, fields=None, key=None):
+        """Yields (key value, row) pairs; the key is None without `key`."""
+        columns = self.compile()
+        if fields is not None:
+            columns = [column for column in columns if column[0] in fields]
+
+        # Datetimes render in the timezone active for this request, as in DRF
+        current_timezone = timezone.get_current_timezone()
+        offset = 1 if key else 0
+        names = [name for name, _, _ in columns]
+        converted = [
+            (i + offset, partial(convert, current_timezone=current_timezone) if getattr(convert, 'needs_timezone', False) else convert)
+            for i, (_, _, convert) in enumerate(columns) if convert is not None
+        ]
+        # values_list() with no names would mean every column
+        select = ([key] if key else []) + [column for _, column, _ in columns] or ['pk']
+
+        for values in queryset.values_list(*select):
+            if converted:
+                values = list(values)
+                for i, convert in converted:
+                    value = values[i]
+                    if value is not None:
+                        values[i] = convert(value)
+            yield (values[0] if key else None), dict(zip(names, values[offset:]))
+
+
+class ValuesListMixin:
+    """
+    For read-only list views whose serializer is all plain columns: GETs are
+    rendered by a ValuesSerializer over `get_queryset()`. Requests using
+    ?expand= or dotted ?fields= need real serializers and take the normal
+    path, as do paginated views.
+    """
+    values_serializer = None
+
+    def use_values_serializer(self, request):
+        wanted = parse_field_spec(request.query_params.get('fields'))
+        return not (
+            self.values_serializer is None or self.paginator is not None
+            or requested_expansions(request) or any(wanted.values())
+        )
+
+    def values_fields(self, request):
+        """The flat ?fields= names, or None for every field."""
+        return set(parse_field_spec(request.query_params.get('fields'))) or None
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.values_serializer.serialize(queryset, fields=self.values_fields(request)))
@@ -0,0 +1,169 @@
+# backend/core/metrics.py
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), every worker
+# writes its samples to that directory and /metrics sums them across workers.
+
+REQUEST_LATENCY = Histogram(
+    'kampus_request_duration_seconds', 'Request latency by view.',
+    ['view', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'kampus_request_db_queries', 'Database queries per request.',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf')),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'kampus_request_db_seconds', 'Time spent in the database per request.',
+    ['view'],
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+    'kampus_external_call_seconds', 'Latency of outbound calls (PayHero, FCM, callback forwarding).',
+    ['service', 'view'],
+)
+
+_current_request = ContextVar('metrics_request', default=None)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+    if view_class is not None:
+        return view_class.__name__
+    return match.view_name or match.func.__name__
+
+
+class _RequestStats:
+    __slots__ = ('request', 'queries', 'db_seconds')
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+def _record_query(execute, sql, params, many, context):
+    # Installed permanently on every connection (see _instrument). Async
+    # views run their queries in worker threads with their own connections,
+    # so the current request is found through the context variable, which
+    # asgiref copies into those threads.
+    stats = _current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _instrument(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_instrument)
+
+
+@sync_and_async_middleware
+class MetricsMiddleware:
+    """
+    Records latency, query count and DB time for every request, labelled by
+    the view that handled it. Keep it first in MIDDLEWARE so the latency
+    covers the rest of the stack. Works under both WSGI and ASGI.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was loaded
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = _RequestStats(request)
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        self.observe(stats, started, response)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats(request)
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        self.observe(stats, started, response)
+        return response
+
+    def observe(self, stats, started, response):
+        request = stats.request
+        view = view_name(request)
+        REQUEST_LATENCY.labels(view=view, method=request.method, status=response.status_code).observe(
+            time.perf_counter() - started
+        )
+        REQUEST_DB_QUERIES.labels(view=view).observe(stats.queries)
+        REQUEST_DB_SECONDS.labels(view=view).observe(stats.db_seconds)
+
+
+@contextmanager
+def track_external_call(service):
+    """
+    Times an outbound call, attributing it to the view currently being
+    served ('none' outside a request, e.g. management commands).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_request.get()
+        view = view_name(stats.request) if stats else 'none'
+        EXTERNAL_CALL_SECONDS.labels(service=service, view=view).observe(time.perf_counter() - started)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers must send METRICS_TOKEN as a bearer
+    token; with no token configured it is only open when DEBUG is on.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,42 @@
+# backend/core/pagination.py
+
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for `queryset`, or None where the database
+    can't give one cheaply (only PostgreSQL does). Filters are included, so
+    this is as good as the table statistics, not an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin changelist paginator for tables too big to COUNT(*) on every page
+    view. When the planner expects more than ADMIN_EXACT_COUNT_LIMIT rows the
+    page links are built from its estimate; smaller results (and databases
+    without estimates) still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+            return estimate
+        return super().count
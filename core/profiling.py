@@ -0,0 +1,176 @@
+# backend/core/profiling.py
+
+import cProfile
+import io
+import pstats
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from core.metrics import view_name
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+
+def _is_staff(request):
+    # API clients authenticate with JWT inside DRF, after middleware runs,
+    # so check the token here as well as the session user (admin).
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+class _SQLRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': round((time.perf_counter() - started) * 1000, 3)})
+
+
+@sync_and_async_middleware
+class ProfilingMiddleware:
+    """
+    Profiles a single request for staff users who send `X-Profile: <mode>`
+    or `?profile=<mode>`:
+
+      - `return`: respond with the text report instead of the normal response
+      - `sample`: use pyinstrument's sampling profiler if it is installed
+      - anything else: cProfile
+
+    Unless the mode is `return`, the report is stored as a ProfileReport
+    (browse it in the admin) and its id is sent back in `X-Profile-Report`.
+    Requests without the flag only pay for the header lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = request.headers.get('X-Profile') or request.GET.get('profile')
+        if not mode or not _is_staff(request):
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    async def __acall__(self, request):
+        mode = request.headers.get('X-Profile') or request.GET.get('profile')
+        if not mode:
+            return await self.get_response(request)
+        # Profiled requests run the rest of the stack in one worker thread,
+        # which the async ORM calls below also end up in, so the SQL
+        # recorder sees every query.
+        return await sync_to_async(self.profile_if_staff)(request, mode)
+
+    def profile_if_staff(self, request, mode):
+        if not _is_staff(request):
+            return self.downstream(request)
+        return self.profile(request, mode)
+
+    def downstream(self, request):
+        if self.async_mode:
+            return async_to_sync(self.get_response)(request)
+        return self.get_response(request)
+
+    def profile(self, request, mode):
+        recorder = _SQLRecorder()
+        sampling = mode == 'sample' and SamplingProfiler is not None
+        profiler = SamplingProfiler() if sampling else cProfile.Profile()
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            if sampling:
+                profiler.start()
+            else:
+                profiler.enable()
+            try:
+                response = self.downstream(request)
+            finally:
+                if sampling:
+                    profiler.stop()
+                else:
+                    profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if sampling:
+            profile_text = profiler.output_text(unicode=True, color=False)
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(settings.PROFILE_TOP_FUNCTIONS)
+            profile_text = stream.getvalue()
+
+        report = {
+            'method': request.method,
+            'path': request.get_full_path()[:500],
+            'view': view_name(request),
+            'status_code': response.status_code,
+            'profiler': 'pyinstrument' if sampling else 'cProfile',
+            'duration_ms': duration_ms,
+            'query_count': len(recorder.queries),
+            'db_ms': sum(query['ms'] for query in recorder.queries),
+            'profile': profile_text,
+            'queries': recorder.queries,
+        }
+
+        if mode == 'return':
+            return HttpResponse(_render_report(report), content_type='text/plain; charset=utf-8')
+
+        response['X-Profile-Report'] = str(_store_report(request, report))
+        return response
+
+
+def _render_report(report):
+    lines = [
+        f"{report['method']} {report['path']} -> {report['status_code']} ({report['view']})",
+        f"{report['duration_ms']:.1f} ms total, {report['query_count']} queries, {report['db_ms']:.1f} ms in DB",
+        f"Profiler: {report['profiler']}",
+        "",
+        "--- SQL ---",
+    ]
+    lines += [f"{query['ms']:>9.3f} ms  {query['sql']}" for query in report['queries']]
+    lines += ["", "--- PROFILE ---", report['profile']]
+    return "\n".join(lines)
+
+
+def _store_report(request, report):
+    from finance.models import ProfileReport
+
+    # By now DRF may have set a stateless TokenUser, so store only the id
+    user = getattr(request, 'user', None)
+    saved = ProfileReport.objects.create(
+        user_id=user.pk if user is not None and user.is_authenticated else None,
+        **report,
+    )
+
+    # Keep only the newest PROFILE_REPORT_LIMIT reports
+    limit = settings.PROFILE_REPORT_LIMIT
+    overflow = list(ProfileReport.objects.order_by('-id').values_list('id', flat=True)[limit:limit + 1])
+    if overflow:
+        ProfileReport.objects.filter(id__lte=overflow[0]).delete()
+
+    return saved.id
@@ -0,0 +1,134 @@
+# backend/core/serializers.py
+"""
+Sparse fieldsets for read requests:
+
+    ?fields=id,name,active_order.status     only these fields (dotted names
+                                            reach into nested objects)
+    ?expand=goal                            replace an id with the nested
+                                            object, for fields listed in
+                                            the serializer's expandable_fields
+
+Without the parameters the output is unchanged. Unknown names are ignored.
+Writes always use every field, so validation is unaffected.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_spec(value):
+    """
+    'id,active_order.status,active_order.product.name' ->
+    {'id': {}, 'active_order': {'status': {}, 'product': {'name': {}}}}
+    An empty dict means "the whole field".
+    """
+    tree = {}
+    for name in (value or '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        node = tree
+        for part in name.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _subtree(tree, path):
+    for part in path:
+        if part not in tree:
+            return {}
+        tree = tree[part]
+    return tree
+
+
+def requested_expansions(request):
+    """
+    ?expand= as ORM paths ('goal', 'goal__owner'), for views to intersect
+    with the relations they can select_related.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+
+    paths = set()
+
+    def walk(tree, prefix):
+        for name, subtree in tree.items():
+            paths.add(prefix + name)
+            walk(subtree, prefix + name + '__')
+
+    walk(parse_field_spec(request.query_params.get('expand')), '')
+    return paths
+
+
+def _trim(value, spec):
+    # For method fields that return plain dicts (e.g. active_order)
+    if not spec or not isinstance(value, dict):
+        return value
+    return {key: _trim(item, spec[key]) for key, item in value.items() if key in spec}
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializer mixin implementing ?fields= and ?expand=. Serializers built
+    by hand inside another serializer (rather than declared as a field)
+    should pass their position as `sparse_path` in the context.
+    """
+    # name -> (serializer class, kwargs)
+    expandable_fields = {}
+
+    def _sparse_specs(self):
+        """
+        The (fields, expand) specs that apply at this serializer's position,
+        or (None, None) when sparse fieldsets don't apply. Computed once per
+        serializer; a many=True child is reused for every row.
+        """
+        try:
+            return self._sparse_cache
+        except AttributeError:
+            pass
+
+        request = self.context.get('request')
+        query_params = getattr(request, 'query_params', None)
+        if query_params is None or request.method not in SAFE_METHODS:
+            specs = (None, None)
+        else:
+            path = self.sparse_path()
+            specs = (
+                _subtree(parse_field_spec(query_params.get('fields')), path),
+                _subtree(parse_field_spec(query_params.get('expand')), path),
+            )
+
+        self._sparse_cache = specs
+        return specs
+
+    def sparse_path(self):
+        """Field names leading from the top of the response to this serializer."""
+        path, node = [], self
+        while node.parent is not None:
+            # many=True children are bound with an empty name
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return list(self.context.get('sparse_path', ())) + path[::-1]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._sparse_specs()
+        if only is None:
+            return fields
+
+        for name in expand:
+            if name in self.expandable_fields:
+                serializer_class, kwargs = self.expandable_fields[name]
+                fields[name] = serializer_class(read_only=True, **kwargs)
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        return fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        only, _ = self._sparse_specs()
+        if only:
+            for name, spec in only.items():
+                if spec and name in data:
+                    data[name] = _trim(data[name], spec)
+        return data
@@ -3,6 +3,7 @@
 from pathlib import Path
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware', # <-- FIRST, so latency covers everything below
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # <-- THIS MUST BE NEAR THE TOP
     'corsheaders.middleware.CorsMiddleware',
@@ -52,6 +54,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware', # <-- staff-only, opt-in per request
+    'core.db_router.PrimaryPinMiddleware', # <-- read-your-writes with a replica
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -88,12 +92,165 @@ DATABASES = {
 
 database_url = os.getenv('DATABASE_URL')
 
+# Persistent connections are per thread. Under ASGI every request runs its
+# sync code in a fresh thread, so they would pile up; gunicorn.conf.py
+# sets DB_CONN_MAX_AGE=0 for the ASGI worker.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 600))
+
 if database_url:
     DATABASES['default'] = dj_database_url.config(
         default=database_url,
-        conn_max_age=600
+        conn_max_age=DB_CONN_MAX_AGE
     )
 
+# --- READ REPLICA ---
+# If 'DATABASE_REPLICA_URL' is set, read-only views, admin changelists and
+# analytics read from it (see core/db_router.py). Locally this can be a
+# second SQLite file, e.g. sqlite:///replica.sqlite3 (migrate it with
+# `migrate --database replica`). Tests mirror it onto the default test DB.
+
+replica_url = os.getenv('DATABASE_REPLICA_URL')
+
+if replica_url:
+    DATABASES['replica'] = dj_database_url.config(
+        default=replica_url,
+        conn_max_age=DB_CONN_MAX_AGE
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# --- LEDGER SHARDS ---
+# Goals, transactions, orders and their dependents are spread over
+# LEDGER_SHARDS by user (see core/sharding.py). 'default' is the first
+# shard; DATABASE_SHARD_URLS (comma-separated) appends shard1, shard2, ...
+# Locally these can be SQLite files, e.g.
+# DATABASE_SHARD_URLS=sqlite:///shard1.sqlite3,sqlite:///shard2.sqlite3
+# (migrate each with `migrate --database shard1`). Only ever append: after
+# adding one, run rebalance_shards. Each shard reserves its own id range
+# (core.sharding.reserve_id_range), which only Postgres and SQLite support.
+
+shard_urls = [url.strip() for url in os.getenv('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+
+LEDGER_SHARDS = ['default']
+for index, shard_url in enumerate(shard_urls, start=1):
+    DATABASES[f'shard{index}'] = dj_database_url.parse(shard_url, conn_max_age=DB_CONN_MAX_AGE)
+    if DATABASES[f'shard{index}']['ENGINE'] not in ('django.db.backends.postgresql', 'django.db.backends.sqlite3'):
+        raise ImproperlyConfigured(
+            f"DATABASE_SHARD_URLS: shard{index} uses {DATABASES[f'shard{index}']['ENGINE']}; "
+            "ledger shards must be Postgres or SQLite."
+        )
+    LEDGER_SHARDS.append(f'shard{index}')
+
+DATABASE_ROUTERS = ['core.sharding.LedgerShardRouter', 'core.db_router.PrimaryReplicaRouter']
+
+# After a write, keep that user's reads on the primary for this long
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# --- CACHE CONFIGURATION ---
+# If 'REDIS_URL' is set, use Redis so every worker shares the same cache
+# (needed for invalidation to reach all workers). Otherwise fall back to
+# the per-process local memory cache (for local development); with DEBUG
+# off, the core.W001 system check warns about it.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+redis_url = os.getenv('REDIS_URL')
+
+if redis_url:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': redis_url,
+    }
+
+# How long (seconds) a cached goal dashboard lives before being rebuilt,
+# even if no deposit callback invalidated it.
+GOAL_SUMMARY_CACHE_TIMEOUT = int(os.getenv('GOAL_SUMMARY_CACHE_TIMEOUT', 300))
+
+# --- DELTA SYNC SETTINGS ---
+# Sync tokens are issued this many seconds in the past so rows committed by
+# concurrent requests are picked up on the next sync.
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 5))
+# Tombstones older than this are pruned; older tokens get a full resync.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Per-user cached goal, order and transaction lists (finance/response_cache.py).
+# Entries are invalidated by version bumps; this only bounds their memory.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 600))
+
+# How many of the latest transactions the bootstrap endpoint includes;
+# older history is paged in from the transactions endpoint.
+BOOTSTRAP_RECENT_TRANSACTIONS = int(os.getenv('BOOTSTRAP_RECENT_TRANSACTIONS', 50))
+
+# archive_transactions moves completed and failed transactions untouched for
+# this many days into ArchivedTransaction, keeping the hot table small.
+TRANSACTION_ARCHIVE_AFTER_DAYS = int(os.getenv('TRANSACTION_ARCHIVE_AFTER_DAYS', 180))
+
+# --- METRICS ---
+# /metrics (core/metrics.py) needs `Authorization: Bearer <METRICS_TOKEN>`,
+# and is closed when this is unset unless DEBUG is on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# --- PROFILING SETTINGS ---
+# Staff can profile a request with `X-Profile: 1` (see core/profiling.py).
+PROFILE_REPORT_LIMIT = int(os.getenv('PROFILE_REPORT_LIMIT', 200))
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 60))
+
+# --- CALLBACK FORWARDING ---
+# Callbacks for the other app are queued and delivered by the
+# forward_callbacks worker (see finance/management/commands).
+CALLBACK_FORWARD_TIMEOUT = float(os.getenv('CALLBACK_FORWARD_TIMEOUT', 5))
+# Attempt n waits BACKOFF * 2**(n-1) seconds, capped at MAX_BACKOFF
+CALLBACK_FORWARD_BACKOFF_SECONDS = int(os.getenv('CALLBACK_FORWARD_BACKOFF_SECONDS', 15))
+CALLBACK_FORWARD_MAX_BACKOFF_SECONDS = int(os.getenv('CALLBACK_FORWARD_MAX_BACKOFF_SECONDS', 3600))
+# After this many failed attempts a forward is dead-lettered (replay_callback_forwards)
+CALLBACK_FORWARD_MAX_ATTEMPTS = int(os.getenv('CALLBACK_FORWARD_MAX_ATTEMPTS', 8))
+CALLBACK_FORWARD_RETENTION_DAYS = int(os.getenv('CALLBACK_FORWARD_RETENTION_DAYS', 14))
+
+# --- SPLIT DEPOSITS ---
+# Most goals one STK push can be split across (finance/views.py SplitDepositView)
+SPLIT_DEPOSIT_MAX_GOALS = int(os.getenv('SPLIT_DEPOSIT_MAX_GOALS', 10))
+
+# --- REPAYMENT SCHEDULES ---
+# A new order's amount_financed is split into this many installments, due
+# every ORDER_INSTALLMENT_INTERVAL_DAYS from the order date (finance/installments.py).
+ORDER_INSTALLMENT_COUNT = int(os.getenv('ORDER_INSTALLMENT_COUNT', 3))
+ORDER_INSTALLMENT_INTERVAL_DAYS = int(os.getenv('ORDER_INSTALLMENT_INTERVAL_DAYS', 30))
+# send_repayment_reminders keeps its per-user daily log this long
+REPAYMENT_REMINDER_RETENTION_DAYS = int(os.getenv('REPAYMENT_REMINDER_RETENTION_DAYS', 30))
+
+# --- PAYMENT THROTTLING ---
+# Token buckets shared through the cache (finance/throttling.py): a rate in
+# DRF syntax ('6/min') plus how many requests may arrive back to back.
+PAYHERO_USER_THROTTLE_RATE = os.getenv('PAYHERO_USER_THROTTLE_RATE', '6/min')
+PAYHERO_USER_THROTTLE_BURST = int(os.getenv('PAYHERO_USER_THROTTLE_BURST', 3))
+# Every user's STK pushes together
+PAYHERO_GLOBAL_THROTTLE_RATE = os.getenv('PAYHERO_GLOBAL_THROTTLE_RATE', '30/s')
+PAYHERO_GLOBAL_THROTTLE_BURST = int(os.getenv('PAYHERO_GLOBAL_THROTTLE_BURST', 60))
+ORDER_CREATE_THROTTLE_RATE = os.getenv('ORDER_CREATE_THROTTLE_RATE', '10/min')
+ORDER_CREATE_THROTTLE_BURST = int(os.getenv('ORDER_CREATE_THROTTLE_BURST', 3))
+
+# --- VELOCITY LIMITS ---
+# Abuse checks on sliding-window counts per user and per phone number
+# (finance/velocity.py): '20/min' allows 20 in any sliding minute.
+# Deposit and repayment STK pushes asked for, refused ones included
+VELOCITY_DEPOSIT_ATTEMPT_LIMIT = os.getenv('VELOCITY_DEPOSIT_ATTEMPT_LIMIT', '20/min')
+VELOCITY_REPAY_ATTEMPT_LIMIT = os.getenv('VELOCITY_REPAY_ATTEMPT_LIMIT', '20/min')
+# Completed deposits (each earns koin); further deposits are refused
+VELOCITY_DEPOSIT_LIMIT = os.getenv('VELOCITY_DEPOSIT_LIMIT', '30/hour')
+# Unlocks plus completed repayments; further unlocks are refused
+VELOCITY_ORDER_CYCLE_LIMIT = os.getenv('VELOCITY_ORDER_CYCLE_LIMIT', '10/hour')
+
+# --- ADMIN ---
+# Changelists expected to hold more rows than this show the planner's
+# estimate instead of running COUNT(*) (core/pagination.py).
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', 10000))
+# Pending transactions older than this can be failed in bulk from the admin;
+# PayHero has long since given up on the STK push by then.
+STALE_PENDING_TRANSACTION_MINUTES = int(os.getenv('STALE_PENDING_TRANSACTION_MINUTES', 60))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -147,7 +304,12 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # orjson-backed, same output as DRF's JSONRenderer (see core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # --- CORS SETTINGS ---
@@ -0,0 +1,271 @@
+# backend/core/sharding.py
+"""
+User-sharded ledger.
+
+Goals, transactions, orders and the rows hanging off them (SHARDED_MODELS)
+live on one of the LEDGER_SHARDS database aliases, picked by a stable hash
+of the owning user's id; everything else (users, products, caches of
+derived data) stays on 'default', which is also the first shard. With a
+single shard, the default, none of this changes where anything goes.
+
+Code says which shard it means in one of three ways, and LedgerShardRouter
+follows it:
+
+- Inside on_shard(alias) / on_user_shard(user_id), queries on sharded
+  models that have no instance to go by use that shard. UserShardMixin
+  does this for DRF views, for the authenticated user.
+- Model instances stay where they were loaded from, and a new row follows
+  the user (or order) it belongs to, so save(), create(), delete() and
+  related lookups need nothing extra.
+- LedgerQuerySet.for_user() pins a queryset to a user's shard outright.
+
+A shard other than 'default' only has the ledger tables. Their foreign
+keys to users and products carry no database constraint, and joins across
+that line become prefetches there (select_related_across). Writes touching
+both a user and their ledger rows go through ledger_atomic(). The admin
+only browses the ledger rows on 'default'.
+
+The hash is a jump consistent hash, so adding a shard only reassigns about
+1/N of the users; rebalance_shards then moves their rows. Shards may only
+be appended: a user's shard is picked by position. Each shard draws ids
+from its own range (reserve_id_range), so moved rows keep their ids.
+"""
+
+import hashlib
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, models, transaction
+from django.db.models.fields import AutoFieldMixin
+
+# model label -> attribute that says whose rows they are: the owning user's
+# id, or a sharded parent whose row is already on the right shard
+SHARDED_MODELS = {
+    'finance.goal': 'owner_id',
+    'finance.transaction': 'owner_id',
+    'finance.archivedtransaction': 'owner_id',
+    'finance.splitdeposit': 'owner_id',
+    'finance.recurringdeposit': 'owner_id',
+    'finance.order': 'user_id',
+    'finance.installment': 'order',
+    'finance.vendorpayout': 'order',
+    'finance.repaymentreminder': 'user_id',
+}
+
+# Shard n hands out ids from n * SHARD_ID_SPACING up
+SHARD_ID_SPACING = 10 ** 12
+
+_shard = ContextVar('ledger_shard', default=None)
+
+
+def ledger_shards():
+    return settings.LEDGER_SHARDS
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def jump_hash(key, buckets):
+    """Lamping and Veach's jump consistent hash of a 64-bit key."""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) % 2 ** 64
+        j = int((b + 1) * (2 ** 31 / ((key >> 33) + 1)))
+    return b
+
+
+def shard_for_user(user_id):
+    shards = ledger_shards()
+    if len(shards) == 1:
+        return shards[0]
+    # Not hash(): that changes between processes
+    key = int.from_bytes(hashlib.blake2b(str(user_id).encode(), digest_size=8).digest(), 'big')
+    return shards[jump_hash(key, len(shards))]
+
+
+def ledger_db():
+    """The shard ledger queries go to right now."""
+    return _shard.get() or 'default'
+
+
+@contextmanager
+def on_shard(alias):
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def on_user_shard(user_id):
+    return on_shard(shard_for_user(user_id))
+
+
+@contextmanager
+def ledger_atomic():
+    """
+    atomic() on 'default' and, when it's another database, the current
+    shard, for writes to a user and their ledger rows. The shard commits
+    first; the two are not one distributed transaction.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(transaction.atomic())
+        if ledger_db() != 'default':
+            stack.enter_context(transaction.atomic(using=ledger_db()))
+        yield
+
+
+def across_shards(queryset):
+    """
+    `queryset` on every shard, for lookups that can't know the user. On
+    'default' it is left to the routers, so it may read the replica.
+    """
+    for alias in ledger_shards():
+        yield queryset if alias == 'default' else queryset.using(alias)
+
+
+def select_related_across(queryset, *fields):
+    """
+    select_related(*fields), except on a shard that doesn't hold the rows
+    they point at (users, products), where they are prefetched instead.
+    """
+    if not fields:
+        return queryset
+    if queryset.db != 'default' and queryset.db in ledger_shards():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+class LedgerQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """This queryset on the shard holding `user`'s rows (a user or an id)."""
+        return self.using(shard_for_user(getattr(user, 'pk', user)))
+
+    def create(self, **kwargs):
+        # Like save(), a new row follows its user rather than the current
+        # shard, unless the queryset names a database
+        if self._db is None:
+            alias = _instance_shard(self.model(**kwargs))
+            if alias is not None:
+                return self.using(alias).create(**kwargs)
+        return super().create(**kwargs)
+
+
+def _instance_shard(instance):
+    if is_sharded(type(instance)):
+        if instance._state.db:
+            return instance._state.db
+        owner = SHARDED_MODELS[instance._meta.label_lower]
+        if owner.endswith('_id'):
+            user_id = getattr(instance, owner)
+            return shard_for_user(user_id) if user_id is not None else None
+        field = instance._meta.get_field(owner)
+        # Only a parent that's already loaded; never a query to find one
+        if field.is_cached(instance):
+            parent = field.get_cached_value(instance)
+            return parent._state.db if parent is not None else None
+        return None
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower() and instance.pk is not None:
+        # user.goals.all() and friends
+        return shard_for_user(instance.pk)
+    return None
+
+
+class LedgerShardRouter:
+    """
+    Goes before PrimaryReplicaRouter. Routes sharded models only; on
+    'default' it steps aside (returns None) so the replica still works.
+    """
+
+    def _db_for(self, model, hints):
+        instance = hints.get('instance')
+        if not is_sharded(model):
+            # goal.owner, order.product: Django would otherwise look on the
+            # hinted row's shard, which has no users or products
+            if instance is not None and is_sharded(type(instance)) and instance._state.db not in (None, 'default'):
+                return 'default'
+            return None
+        alias = _instance_shard(instance) if instance is not None else None
+        alias = alias or ledger_db()
+        return None if alias == 'default' else alias
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = [is_sharded(type(obj)) for obj in (obj1, obj2)]
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        if any(sharded):
+            # Ledger rows point at users and products on 'default'
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default' or db not in ledger_shards():
+            return None
+        # The other shards hold the ledger tables and nothing else (data
+        # migrations, which name no model, included)
+        return model_name is not None and f"{app_label}.{model_name}" in SHARDED_MODELS
+
+
+class UserShardMixin:
+    """
+    For DRF views: once the request is authenticated, its ledger queries
+    go to the user's shard.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _shard.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _shard.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            _shard.set(shard_for_user(request.user.id))
+
+
+def reserve_id_range(alias, sharded_models):
+    """
+    Moves the id sequences of `sharded_models` on shard `alias` to the
+    start of its range, unless they are already past it. Run after
+    migrating a shard (finance does it from post_migrate). Settings refuse
+    shards on databases other than Postgres and SQLite.
+    """
+    index = ledger_shards().index(alias)
+    if index == 0:
+        return
+    start = index * SHARD_ID_SPACING
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in sharded_models:
+            if not isinstance(model._meta.pk, AutoFieldMixin):
+                # ArchivedTransaction keeps the ids it was given
+                continue
+            table = model._meta.db_table
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM " + connection.ops.quote_name(table) + ")))",
+                    [table, start],
+                )
+            elif connection.vendor == 'sqlite':
+                # Django's SQLite ids are AUTOINCREMENT, which reads sqlite_sequence
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+                elif row[0] < start:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [start, table])
+            else:
+                raise ImproperlyConfigured(f"Ledger shards don't support {connection.vendor}.")
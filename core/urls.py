@@ -22,6 +22,8 @@ from rest_framework_simplejwt.views import (
 )
 from django.conf import settings
 from django.conf.urls.static import static
+from core.metrics import metrics_view
+from core.warmup import healthz_view, readyz_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -29,4 +31,7 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/finance/', include('finance.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('healthz', healthz_view, name='healthz'),
+    path('readyz', readyz_view, name='readyz'),
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
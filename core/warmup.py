@@ -0,0 +1,131 @@
+# backend/core/warmup.py
+"""
+Worker warmup and the load balancer's health checks.
+
+gunicorn.conf.py calls warm_up() in each worker after it has loaded the
+app and before it accepts connections, so the one-off costs of a cold
+process (compiling every URL pattern, first use of each serializer and its
+model metadata, opening the database and cache connections, building the
+Firebase and Cloudinary clients) are not paid by the first users sent to it.
+
+/healthz only says the process is serving. /readyz also needs every
+database it serves from (the primary, each ledger shard and the replica)
+and a finished warmup, so a new or restarted worker gets no
+traffic until it's warm. Servers without the gunicorn hook (runserver, a
+bare uvicorn) warm up on their first readiness probe instead.
+"""
+
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.db import close_old_connections, connections
+from django.http import JsonResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+
+from core.sharding import ledger_shards
+
+_warm = threading.Event()
+_lock = threading.Lock()
+
+
+def _walk(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def _warm_urls():
+    resolver = get_resolver()
+    # Fills the reverse() lookup and compiles every pattern's regex
+    resolver.reverse_dict
+    for pattern in _walk(resolver.url_patterns):
+        pattern.pattern.regex
+
+
+def _warm_serializers():
+    seen = set()
+    for pattern in _walk(get_resolver().url_patterns):
+        view_class = getattr(pattern.callback, 'view_class', None)
+        for serializer_class in (
+            getattr(view_class, 'serializer_class', None),
+            getattr(getattr(view_class, 'values_serializer', None), 'serializer_class', None),
+        ):
+            if serializer_class is None or serializer_class in seen:
+                continue
+            seen.add(serializer_class)
+            # DRF builds fields per instance; this pays for the imports,
+            # model metadata and validators they use the first time
+            serializer_class().fields
+        values_serializer = getattr(view_class, 'values_serializer', None)
+        if values_serializer is not None:
+            values_serializer.compile()
+
+
+def _warm_connections():
+    for alias in settings.DATABASES:
+        connections[alias].ensure_connection()
+    cache.get('warmup')
+
+
+def _warm_clients():
+    # Firebase is set up when finance.views is imported (by _warm_urls)
+    storages['default']
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+
+
+WARMUP_STEPS = [
+    ('urls', _warm_urls),
+    ('serializers', _warm_serializers),
+    ('connections', _warm_connections),
+    ('clients', _warm_clients),
+]
+
+
+def warm_up():
+    """
+    Runs every warmup step once per process. A failing step is logged, not
+    raised: a worker that can't reach the database is kept out of rotation
+    by /readyz, not by crashing on boot.
+    """
+    with _lock:
+        if _warm.is_set():
+            return
+        started = time.perf_counter()
+        for name, step in WARMUP_STEPS:
+            try:
+                step()
+            except Exception as e:
+                print(f"WARMUP: step '{name}' failed: {e!r}")
+        # Keeps persistent connections for the first request, closes the rest
+        close_old_connections()
+        _warm.set()
+        print(f"WARMUP: worker {os.getpid()} warm in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def healthz_view(request):
+    """Liveness: the process is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz_view(request):
+    """Readiness: warmed up and every database the app reads answers."""
+    warm_up()
+    aliases = list(ledger_shards())
+    if 'replica' in settings.DATABASES:
+        aliases.append('replica')
+    for alias in aliases:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception as e:
+            print(f"READYZ: database check failed on '{alias}': {e!r}")
+            return JsonResponse({'status': 'unavailable', 'error': 'Database unreachable.'}, status=503)
+    return JsonResponse({'status': 'ready'})
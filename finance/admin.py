@@ -1,10 +1,202 @@
 # finance/admin.py
 
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Goal, Transaction, Product,Order
+from django.utils import timezone
+
+from core.db_router import read_from_replica
+from core.pagination import EstimatedCountPaginator
+from .models import (
+    Goal, Transaction, ArchivedTransaction, SplitDeposit, Product, Order, Installment, RepaymentReminder, VendorPayout,
+    RecurringDeposit, UserSavingsStats, ProfileReport, CallbackForward,
+)
+from .response_cache import invalidate_user_responses
+
+
+class ReplicaChangeListMixin:
+    """
+    Serves the changelist (filters, counts, the rows themselves) from the
+    read replica. Edits and bulk actions (POST) stay on the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with read_from_replica():
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse evaluates the querysets lazily; render here
+            # so those queries run inside the replica block too
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class LargeTableAdminMixin:
+    """
+    For models with millions of rows: no COUNT(*) of the whole table next
+    to the filtered count, and page links from the planner's estimate once
+    the result is large (see core/pagination.py).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def stale_pending_cutoff():
+    return timezone.now() - timedelta(minutes=settings.STALE_PENDING_TRANSACTION_MINUTES)
+
+
+class StalePendingFilter(admin.SimpleListFilter):
+    title = 'stale'
+    parameter_name = 'stale'
+
+    def lookups(self, request, model_admin):
+        return [('yes', f"Pending over {settings.STALE_PENDING_TRANSACTION_MINUTES} min")]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(status='pending', created_at__lt=stale_pending_cutoff())
+        return queryset
+
 
 # Register your models here.
-admin.site.register(Goal)
-admin.site.register(Transaction)
-admin.site.register(Product) 
-admin.site.register(Order)
\ No newline at end of file
+# Goal and Order __str__ read their related rows, so every admin showing them
+# selects those rows up front, and foreign keys are edited through
+# autocomplete widgets rather than a <select> of the whole table.
+@admin.register(Goal)
+class GoalAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'name', 'owner', 'target_amount', 'current_amount', 'created_at')
+    list_select_related = ('owner',)
+    search_fields = ('=owner__email', 'name')
+    autocomplete_fields = ('owner',)
+
+    def get_queryset(self, request):
+        # Also used by the goal autocomplete on other admins
+        return super().get_queryset(request).select_related('owner')
+
+
+@admin.register(Transaction)
+class TransactionAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'checkout_request_id', 'owner', 'transaction_type', 'amount', 'status', 'created_at')
+    list_select_related = ('owner',)
+    # Indexed: (status, created_at)
+    list_filter = ('status', StalePendingFilter, 'created_at', 'transaction_type')
+    # Exact matches only; both columns are unique, so these are index lookups
+    search_fields = ('=checkout_request_id', '=mpesa_receipt_number', '=owner__email')
+    autocomplete_fields = ('owner', 'goal', 'order')
+    actions = ['fail_stale_pending']
+
+    @admin.action(description="Mark stale pending transactions as failed")
+    def fail_stale_pending(self, request, queryset):
+        # Only rows still pending past the cutoff, whatever else was selected.
+        # update() skips auto_now and signals, so set updated_at for delta
+        # sync and drop the owners' cached lists by hand.
+        stale = queryset.filter(status='pending', created_at__lt=stale_pending_cutoff())
+        owner_ids = set(stale.values_list('owner_id', flat=True))
+        failed = stale.update(status='failed', updated_at=timezone.now())
+        for owner_id in owner_ids:
+            invalidate_user_responses(owner_id)
+        self.message_user(request, f"Marked {failed} stale pending transactions as failed.")
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    # Written only by archive_transactions
+    list_display = ('id', 'owner', 'transaction_type', 'amount', 'status', 'created_at', 'archived_at')
+    list_select_related = ('owner',)
+    list_filter = ('status', 'transaction_type')
+    search_fields = ('=checkout_request_id', '=mpesa_receipt_number')
+    readonly_fields = [field.name for field in ArchivedTransaction._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SplitDeposit)
+class SplitDepositAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'checkout_request_id', 'owner', 'amount', 'status', 'created_at')
+    list_select_related = ('owner',)
+    list_filter = ('status',)
+    search_fields = ('=checkout_request_id', '=mpesa_receipt_number', '=owner__email')
+    autocomplete_fields = ('owner',)
+
+
+@admin.register(Product)
+class ProductAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+class InstallmentInline(admin.TabularInline):
+    model = Installment
+    fields = ('number', 'due_date', 'amount', 'amount_paid', 'status', 'paid_at')
+    readonly_fields = ('paid_at',)
+    ordering = ('number',)
+    extra = 0
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'product', 'status', 'total_amount', 'amount_paid', 'order_date')
+    list_select_related = ('user', 'product')
+    # Indexed: (status, order_date)
+    list_filter = ('status', 'order_date')
+    search_fields = ('=user__email',)
+    autocomplete_fields = ('user', 'product')
+    inlines = [InstallmentInline]
+
+    def get_queryset(self, request):
+        # Also used by the order autocomplete on other admins
+        return super().get_queryset(request).select_related('user', 'product')
+
+
+@admin.register(RepaymentReminder)
+class RepaymentReminderAdmin(LargeTableAdminMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'sent_on', 'order_count', 'status', 'sent_at')
+    list_select_related = ('user',)
+    list_filter = ('status',)
+    date_hierarchy = 'sent_on'
+    autocomplete_fields = ('user',)
+    readonly_fields = ('sent_at', 'error')
+
+
+@admin.register(VendorPayout)
+class VendorPayoutAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'order', 'vendor_name', 'amount', 'mpesa_transaction_id', 'created_at')
+    list_select_related = ('order__product', 'order__user')
+    search_fields = ('=mpesa_transaction_id', 'vendor_name')
+    autocomplete_fields = ('order',)
+
+
+@admin.register(RecurringDeposit)
+class RecurringDepositAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'owner', 'goal_id', 'amount', 'frequency', 'next_run_at', 'is_active')
+    list_select_related = ('owner',)
+    list_filter = ('is_active', 'frequency')
+    autocomplete_fields = ('owner', 'goal')
+
+
+admin.site.register(UserSavingsStats)
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'view', 'status_code', 'duration_ms', 'query_count', 'db_ms', 'user')
+    list_filter = ('view', 'method', 'profiler')
+    search_fields = ('path',)
+    list_select_related = ('user',)
+    readonly_fields = [field.name for field in ProfileReport._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CallbackForward)
+class CallbackForwardAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'attempts', 'next_attempt_at', 'created_at', 'delivered_at', 'target_url')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'delivered_at')
+    actions = ['replay_forwards']
+
+    @admin.action(description="Replay selected forwards")
+    def replay_forwards(self, request, queryset):
+        self.message_user(request, f"Re-queued {queryset.replay()} forwards.")
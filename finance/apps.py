@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finance'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Registers the per-query metrics hook before any connection opens
+        from core import metrics  # noqa: F401
+        from core import checks  # noqa: F401
@@ -0,0 +1,108 @@
+# backend/finance/archive.py
+"""
+Hot/cold split of the transaction history.
+
+Pending transactions, and settled ones touched in the last
+TRANSACTION_ARCHIVE_AFTER_DAYS, live in Transaction; older completed and
+failed rows are moved to ArchivedTransaction by archive_transactions. The
+move keeps ids and never fires delete signals, so clients see the same
+history and get no sync tombstones for it.
+
+Only readers of the full history need the archive. Delta sync and the goal
+summary's 90 day pace only look at recent rows, which is why the archive
+age can't be shorter than either window (see min_archive_age_days).
+"""
+
+import heapq
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.sharding import ledger_db
+from .models import ArchivedTransaction, Transaction
+
+SETTLED_STATUSES = ('completed', 'failed')
+
+# The goal summary's longest deposit window (see summary.py)
+SUMMARY_WINDOW_DAYS = 90
+
+
+def min_archive_age_days():
+    return max(settings.SYNC_TOMBSTONE_RETENTION_DAYS, SUMMARY_WINDOW_DAYS)
+
+
+def archivable(cutoff):
+    return Transaction.objects.filter(status__in=SETTLED_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size, after_id=0):
+    """
+    Moves up to `batch_size` archivable transactions with ids above
+    `after_id` in one database transaction. Returns (moved, last id seen),
+    the latter None once there is nothing left. Each batch commits on its
+    own, so an interrupted run just picks up where it stopped.
+    """
+    ids = list(
+        archivable(cutoff).filter(id__gt=after_id).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0, None
+
+    # The current ledger shard's tables (see core/sharding.py)
+    connection = connections[ledger_db()]
+    with transaction.atomic(using=connection.alias):
+        # Re-check under lock: a late callback may have just touched a row
+        locked = list(
+            archivable(cutoff).select_for_update().filter(id__in=ids).values_list('id', flat=True)
+        )
+        if locked:
+            _copy_to_archive(connection, locked)
+            # Raw DELETE: the rows are moving, not going away, so the
+            # tombstone and cache signals must not fire
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(Transaction._meta.db_table)} "
+                    f"WHERE {connection.ops.quote_name('id')} IN ({', '.join(['%s'] * len(locked))})",
+                    locked,
+                )
+    return len(locked), ids[-1]
+
+
+def _copy_to_archive(connection, ids):
+    quote = connection.ops.quote_name
+    columns = [
+        ArchivedTransaction._meta.get_field(field.name).column
+        for field in Transaction._meta.concrete_fields
+    ]
+    column_list = ", ".join(quote(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(ArchivedTransaction._meta.db_table)} ({column_list}, {quote('archived_at')}) "
+            f"SELECT {column_list}, %s FROM {quote(Transaction._meta.db_table)} "
+            f"WHERE {quote('id')} IN ({', '.join(['%s'] * len(ids))})",
+            [timezone.now(), *ids],
+        )
+
+
+def history_querysets(owner):
+    """The owner's hot and archived transactions, each newest first."""
+    return [
+        Transaction.objects.filter(owner=owner).order_by('-created_at'),
+        ArchivedTransaction.objects.filter(owner=owner).order_by('-created_at'),
+    ]
+
+
+def newest_first(*sources):
+    """Merges transaction sources that are each ordered newest first."""
+    return heapq.merge(*sources, key=attrgetter('created_at'), reverse=True)
+
+
+def recent_history(owner, limit):
+    """The owner's latest `limit` transactions across both tables."""
+    return list(newest_first(*(queryset[:limit] for queryset in history_querysets(owner))))[:limit]
+
+
+def is_archived_reference(checkout_request_id):
+    return ArchivedTransaction.objects.filter(checkout_request_id=checkout_request_id).exists()
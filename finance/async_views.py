@@ -0,0 +1,202 @@
+# backend/finance/async_views.py
+"""
+Async versions of the I/O-bound payment endpoints. Served by an ASGI
+worker (see gunicorn.conf.py), a request waiting on PayHero only holds a
+coroutine, not a thread, so one worker can keep hundreds of STK pushes in
+flight.
+
+They take the same JSON bodies and return the same responses as
+DepositView, RepayView and PaymentCallbackView. DRF views are sync-only,
+so these are plain Django views with JWT authentication done by hand.
+"""
+
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .models import CallbackForward, Goal, Order, Transaction
+from .payhero_utils import initiate_payhero_push_async, payment_reference
+from .throttling import PayHeroThrottle
+from . import velocity
+from .views import PaymentCallbackView
+
+
+def deposit_allowed(user):
+    # DepositView's velocity checks, run off the event loop
+    return not velocity.over_limit('deposit', user) and velocity.hit('deposit_attempt', user)
+
+
+class AsyncJSONView(ABC, View):
+    """
+    Base for the async endpoints: POST only, JSON in and out, and (unless
+    `authenticated = False`) a valid JWT access token. `throttle_classes`
+    are DRF throttles, checked after authentication as DRF would.
+    """
+    http_method_names = ['post']
+    authenticated = True
+    throttle_classes = ()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Like DRF, these are token-authenticated APIs, not forms
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def post(self, request, *args, **kwargs):
+        if self.authenticated:
+            try:
+                result = await sync_to_async(JWTAuthentication().authenticate)(request)
+            except AuthenticationFailed as e:
+                return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+            if result is None:
+                return JsonResponse(
+                    {"detail": "Authentication credentials were not provided."},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            request.user = result[0]
+
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            # Cache round trips; off the event loop
+            if not await sync_to_async(throttle.allow_request, thread_sensitive=False)(request, self):
+                throttled = Throttled(throttle.wait())
+                response = JsonResponse({"detail": str(throttled.detail)}, status=throttled.status_code)
+                response['Retry-After'] = '%d' % throttled.wait
+                return response
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return await self.handle(request, data)
+
+    @abstractmethod
+    async def handle(self, request, data):
+        """The endpoint itself, given the authenticated request and its JSON body."""
+
+
+class AsyncDepositView(AsyncJSONView):
+    throttle_classes = (PayHeroThrottle,)
+
+    async def handle(self, request, data):
+        user = request.user
+        phone_number = user.phone_number
+        amount = data.get('amount')
+        goal_id = data.get('goal_id')
+        if not all([phone_number, amount, goal_id]):
+            return JsonResponse({"error": "Phone number, amount, and goal_id are required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            goal = await Goal.objects.for_user(user).aget(id=goal_id, owner=user)
+        except (Goal.DoesNotExist, ValueError):
+            return JsonResponse({"error": "Goal not found or does not belong to user."}, status=status.HTTP_404_NOT_FOUND)
+        if goal.current_amount >= goal.target_amount:
+            return JsonResponse({"error": "This savings goal is already complete."}, status=status.HTTP_400_BAD_REQUEST)
+        if not await sync_to_async(deposit_allowed, thread_sensitive=False)(user):
+            return JsonResponse({"error": "Too many deposits. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        external_reference = payment_reference('deposit', goal.id, user.id, uuid.uuid4().hex[:6])
+        try:
+            await Transaction.objects.for_user(user).acreate(
+                owner=user,
+                goal=goal,
+                transaction_type='DEPOSIT',
+                amount=Decimal(str(amount)),
+                checkout_request_id=external_reference,
+                status='pending'
+            )
+        except Exception as e:
+            print(f"Error creating pending transaction: {e}")
+            return JsonResponse({"error": "Transaction error."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        payhero_response = await initiate_payhero_push_async(phone_number, amount, external_reference)
+        if not payhero_response:
+            return JsonResponse({"error": "Failed to initiate STK push."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"message": "STK push initiated successfully. Please enter your PIN."}, status=status.HTTP_200_OK)
+
+
+class AsyncRepayView(AsyncJSONView):
+    throttle_classes = (PayHeroThrottle,)
+
+    async def handle(self, request, data):
+        user = request.user
+        phone_number = user.phone_number
+        amount = data.get('amount')
+        order_id = data.get('order_id')
+        if not all([phone_number, amount, order_id]):
+            return JsonResponse({"error": "Phone number, amount, and order_id are required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = await Order.objects.for_user(user).aget(id=order_id, user=user)
+        except (Order.DoesNotExist, ValueError):
+            return JsonResponse({"error": "Order not found or does not belong to user."}, status=status.HTTP_404_NOT_FOUND)
+        if order.status == 'PAID':
+            return JsonResponse({"error": "This order is already fully paid."}, status=status.HTTP_400_BAD_REQUEST)
+        if not await sync_to_async(velocity.hit, thread_sensitive=False)('repay_attempt', user):
+            return JsonResponse({"error": "Too many repayments. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        external_reference = payment_reference('repayment', order.id, user.id, uuid.uuid4().hex[:6])
+        try:
+            await Transaction.objects.for_user(user).acreate(
+                owner=user,
+                order=order,
+                transaction_type='REPAYMENT',
+                amount=Decimal(str(amount)),
+                checkout_request_id=external_reference,
+                status='pending'
+            )
+        except Exception as e:
+            print(f"Error creating pending transaction: {e}")
+            return JsonResponse({"error": "Transaction error."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        payhero_response = await initiate_payhero_push_async(phone_number, amount, external_reference)
+        if not payhero_response:
+            return JsonResponse({"error": "Failed to initiate STK push."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"message": "Repayment STK push initiated. Please enter your PIN."}, status=status.HTTP_200_OK)
+
+
+class AsyncPaymentCallbackView(AsyncJSONView):
+    """
+    Kampus Koin callbacks are applied in a worker thread (they need a DB
+    transaction and send FCM notifications); callbacks for the other app
+    are queued for the forward_callbacks worker.
+    """
+    authenticated = False
+
+    async def handle(self, request, data):
+        print(f"DEBUG: Raw PayHero Payload: {data}")
+
+        callback_data = data.get('response')
+        if not callback_data:
+            callback_data = data
+
+        external_reference = callback_data.get('ExternalReference') or callback_data.get('User_Reference')
+
+        if not external_reference:
+            return JsonResponse({"message": "Invalid callback structure."}, status=status.HTTP_200_OK)
+
+        try:
+            if external_reference.startswith('kampus_koin-'):
+                print(f"Processing Kampus Koin callback: {external_reference}")
+                await sync_to_async(PaymentCallbackView().process_kampus_koin_payment)(callback_data, external_reference)
+            else:
+                print(f"Forwarding callback to other app: {external_reference}")
+                await self.forward_to_other_app(data)
+
+        except Exception as e:
+            print(f"General callback processing error: {e}")
+
+        return JsonResponse({"message": "Callback processed or forwarded"}, status=status.HTTP_200_OK)
+
+    async def forward_to_other_app(self, data):
+        other_app_url = os.getenv('OTHER_APP_CALLBACK_URL')
+        if not other_app_url:
+            return
+        await CallbackForward.objects.acreate(target_url=other_app_url, payload=data)
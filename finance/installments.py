@@ -0,0 +1,105 @@
+# backend/finance/installments.py
+"""
+Repayment schedules.
+
+OrderCreateView splits an order's amount_financed into
+ORDER_INSTALLMENT_COUNT installments, due every
+ORDER_INSTALLMENT_INTERVAL_DAYS from the order date, and bulk-creates them
+with the order. A repayment callback pays them off oldest first with a
+fixed number of UPDATEs, so reminders and overdue checks read the schedule
+through the (due_date, status) index instead of recomputing every order.
+"""
+
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from core.sharding import select_related_across
+from .models import Installment, Order, RepaymentReminder
+
+
+def split_amount(total, count):
+    """`count` amounts adding up to `total`; the last absorbs the rounding."""
+    share = (total / count).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    return [share] * (count - 1) + [total - share * (count - 1)]
+
+
+def build_schedule(order):
+    """
+    Unsaved installments for an order, ready for bulk_create(). Anything
+    already repaid (seeded orders) is applied oldest first.
+    """
+    first_day = timezone.localdate(order.order_date)
+    interval = timedelta(days=settings.ORDER_INSTALLMENT_INTERVAL_DAYS)
+    # A just-created order still holds the field's float default
+    repaid = Decimal(str(order.amount_paid))
+    installments = []
+    for number, amount in enumerate(split_amount(order.amount_financed, settings.ORDER_INSTALLMENT_COUNT), start=1):
+        paid = min(amount, max(repaid, Decimal('0.00')))
+        repaid -= paid
+        installments.append(Installment(
+            order=order, number=number, due_date=first_day + interval * number, amount=amount, amount_paid=paid,
+            status='PAID' if paid == amount else 'PENDING', paid_at=order.updated_at if paid == amount else None,
+        ))
+    return installments
+
+
+def allocate_payment(order, amount, now=None):
+    """
+    Applies a repayment of `amount` to the order's unpaid installments,
+    oldest first: one locking SELECT, then at most two UPDATEs, one for
+    the installments it pays off and one for the installment it only
+    part-pays. Returns the amount left over once the schedule is paid.
+    """
+    now = now or timezone.now()
+    unpaid = (
+        Installment.objects.select_for_update().filter(order=order, status='PENDING')
+        .order_by('number').values_list('id', 'amount', 'amount_paid')
+    )
+
+    paid_off, partial, remaining = [], None, amount
+    for installment_id, installment_amount, amount_paid in unpaid:
+        outstanding = installment_amount - amount_paid
+        if remaining >= outstanding:
+            paid_off.append(installment_id)
+            remaining -= outstanding
+        else:
+            partial = installment_id
+            break
+
+    if paid_off:
+        Installment.objects.filter(id__in=paid_off).update(amount_paid=F('amount'), status='PAID', paid_at=now)
+    if partial is not None and remaining > 0:
+        Installment.objects.filter(id=partial).update(amount_paid=F('amount_paid') + remaining)
+        remaining = Decimal('0.00')
+    return remaining
+
+
+def settle_schedule(order, now=None):
+    """Marks whatever is left of a fully repaid order's schedule as paid."""
+    Installment.objects.filter(order=order, status='PENDING').update(
+        amount_paid=F('amount'), status='PAID', paid_at=now or timezone.now(),
+    )
+
+
+def due_between(start, end):
+    """Unpaid installments due from `start` to `end` (dates, inclusive), as a range scan."""
+    return Installment.objects.filter(due_date__range=(start, end), status='PENDING')
+
+
+def overdue_orders(today):
+    """
+    What send_repayment_reminders streams from each ledger shard: orders in
+    repayment with an installment unpaid past its due date, for users who
+    haven't had today's reminder yet, ordered by user. Users without a
+    device are skipped by the command, as users may be on another database.
+    """
+    overdue = Installment.objects.filter(order=OuterRef('pk'), status='PENDING', due_date__lt=today)
+    reminded = RepaymentReminder.objects.filter(user=OuterRef('user_id'), sent_on=today, status='SENT')
+    return select_related_across(
+        Order.objects.filter(Exists(overdue), status='COMPLETED').exclude(Exists(reminded)),
+        'user', 'product',
+    ).order_by('user_id', 'id')
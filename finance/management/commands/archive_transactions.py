@@ -0,0 +1,66 @@
+# finance/management/commands/archive_transactions.py
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.sharding import ledger_shards, on_shard
+from finance.archive import archivable, archive_batch, min_archive_age_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves completed and failed transactions untouched for --older-than-days into the archive '
+        'table, in batches that each commit on their own. Safe to interrupt and re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows moved per database transaction.')
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to sleep between batches, to go easy on a busy primary (and its replicas).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be moved.')
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        if days < min_archive_age_days():
+            raise CommandError(
+                f"--older-than-days must be at least {min_archive_age_days()}: delta sync and the goal "
+                f"summary only read the hot table for that long."
+            )
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if options['dry_run']:
+            count = 0
+            for alias in ledger_shards():
+                with on_shard(alias):
+                    count += archivable(cutoff).count()
+            self.stdout.write(f"Would archive {count} transactions settled before {cutoff:%Y-%m-%d}")
+            return
+
+        started = time.perf_counter()
+        moved, batches = 0, 0
+        # Each ledger shard archives its own rows
+        for alias in ledger_shards():
+            after_id = 0
+            with on_shard(alias):
+                while True:
+                    count, after_id = archive_batch(cutoff, options['batch_size'], after_id)
+                    if after_id is None:
+                        break
+                    moved += count
+                    batches += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"  batch {batches} ({alias}): {count} rows, up to id {after_id}")
+                    if options['pause']:
+                        time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} transactions settled before {cutoff:%Y-%m-%d} in {batches} batches ({elapsed:.1f}s)"
+        ))
@@ -0,0 +1,118 @@
+# finance/management/commands/benchmark_serialization.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.renderers import FastJSONRenderer
+from finance.views import GoalListCreateView, OrderListView, ProductListView, TransactionListView
+from users.models import User
+
+# endpoint -> (view, the ?fields= a mobile list screen actually needs)
+ENDPOINTS = {
+    'transactions': (TransactionListView, 'id,amount,status,transaction_date'),
+    'goals': (GoalListCreateView, 'id,name,target_amount,current_amount'),
+    'orders': (OrderListView, 'id,status,amount_paid,product.name'),
+    'products': (ProductListView, 'id,name,price,is_unlocked,active_order.status'),
+}
+
+
+# Endpoints with a ValuesSerializer fast path (see core/fast_serializers.py)
+VALUES_ENDPOINTS = ('transactions', 'goals')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures serialization CPU and payload size of the list endpoints for one user: full output '
+        'vs ?fields= sparse output, rendered by DRF\'s stdlib JSONRenderer and by FastJSONRenderer. '
+        'Then compares rows/s of the ModelSerializer and ValuesSerializer paths.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User to serialize for. Defaults to the one with the most transactions.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), action='append', help='Repeatable. Defaults to all.')
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options['email'])
+        iterations = options['iterations']
+        self.stdout.write(f"Serializing as {user.email}, best of {iterations} runs (CPU ms)")
+        self.stdout.write(
+            f"{'endpoint':<14}{'output':<8}{'rows':>7}{'serialize':>11}{'stdlib':>9}{'fast':>9}{'bytes':>11}"
+        )
+
+        for name in options['endpoint'] or ENDPOINTS:
+            view_class, sparse_fields = ENDPOINTS[name]
+            for label, params in (('full', {}), ('sparse', {'fields': sparse_fields})):
+                data, serialize_ms = self.measure(iterations, lambda: self.serialize(view_class, user, params))
+                body, stdlib_ms = self.measure(iterations, lambda: JSONRenderer().render(data))
+                fast_body, fast_ms = self.measure(iterations, lambda: FastJSONRenderer().render(data))
+                if fast_body != body:
+                    raise CommandError(f"FastJSONRenderer output differs from JSONRenderer for {name} ({label}).")
+                self.stdout.write(
+                    f"{name:<14}{label:<8}{len(data):>7}{serialize_ms:>11.2f}{stdlib_ms:>9.2f}{fast_ms:>9.2f}{len(body):>11}"
+                )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<14}{'rows':>7}{'serializer rows/s':>19}{'values rows/s':>15}{'speedup':>9}")
+        for name in options['endpoint'] or VALUES_ENDPOINTS:
+            if name in VALUES_ENDPOINTS:
+                self.compare_values(name, user, iterations)
+
+        self.stdout.write(self.style.SUCCESS("Serialization benchmark finished"))
+
+    def compare_values(self, name, user, iterations):
+        # Both timings include the query: skipping model instances is the point
+        view = self.make_view(ENDPOINTS[name][0], user, {})
+        serializer_class = view.get_serializer_class()
+        expected, serializer_ms = self.measure(
+            iterations, lambda: serializer_class(view.get_queryset(), many=True).data,
+        )
+        actual, values_ms = self.measure(
+            iterations, lambda: view.values_serializer.serialize(view.get_queryset()),
+        )
+        if FastJSONRenderer().render(actual) != FastJSONRenderer().render(expected):
+            raise CommandError(f"ValuesSerializer output differs from {serializer_class.__name__} for {name}.")
+
+        rows = len(actual)
+        serializer_rps = rows / (serializer_ms / 1000) if serializer_ms else 0
+        values_rps = rows / (values_ms / 1000) if values_ms else 0
+        speedup = values_rps / serializer_rps if serializer_rps else 0
+        self.stdout.write(f"{name:<14}{rows:>7}{serializer_rps:>19,.0f}{values_rps:>15,.0f}{speedup:>8.1f}x")
+
+    def pick_user(self, email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {email}.")
+        user = User.objects.annotate(n=Count('transaction')).order_by('-n').first()
+        if user is None:
+            raise CommandError("No users; run seed_data first.")
+        return user
+
+    def make_view(self, view_class, user, params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = view_class()
+        view.setup(request)
+        view.format_kwarg = None
+        return view
+
+    def serialize(self, view_class, user, params):
+        # Straight to list(): no response cache, no authentication
+        view = self.make_view(view_class, user, params)
+        return view.list(view.request).data
+
+    def measure(self, iterations, func):
+        best, result = None, None
+        for _ in range(iterations):
+            started = time.process_time()
+            result = func()
+            elapsed = (time.process_time() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,28 @@
+# finance/management/commands/check_query_plans.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.query_plans import check_hot_querysets
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the hot lookups of the views, serializers and sync (see finance/query_plans.py) '
+        'and fails if any reads a whole table. Run it against seeded data (seed_data); -v 2 prints every plan.'
+    )
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, tables, plan in check_hot_querysets():
+            if tables:
+                failures.append(f"{name}: sequential scan of {', '.join(tables)}")
+                self.stdout.write(self.style.ERROR(f"SEQ SCAN  {name} ({', '.join(tables)})"))
+            else:
+                self.stdout.write(f"ok        {name}")
+            if tables or options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f"            {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot querysets fall back to a sequential scan:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Every hot queryset uses an index"))
@@ -0,0 +1,123 @@
+# finance/management/commands/dispatch_recurring_deposits.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.sharding import ledger_db, ledger_shards, on_shard, select_related_across
+from finance.models import RecurringDeposit, Transaction
+from finance.payhero_utils import initiate_payhero_push, payment_reference
+from finance.response_cache import invalidate_user_responses
+from finance.throttling import payhero_global_bucket
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates pending deposits for due recurring schedules and fires their STK pushes, drawing from the '
+        'same global PayHero bucket as user-initiated pushes (PAYHERO_GLOBAL_THROTTLE_RATE).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent PayHero requests.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Schedules claimed per database round trip.')
+
+    def handle(self, *args, **options):
+        # Shared through the cache with every web worker's PayHeroThrottle
+        limiter = payhero_global_bucket()
+        started = time.monotonic()
+        dispatched = failed = skipped = 0
+
+        # One ledger shard at a time; the rate limit covers all of them
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for alias in ledger_shards():
+                with on_shard(alias):
+                    while True:
+                        pushes, batch_skipped = self.claim_batch(options['batch_size'])
+                        if not pushes and not batch_skipped:
+                            break
+                        skipped += batch_skipped
+
+                        results = pool.map(lambda push: self.push(limiter, *push), pushes)
+                        failed_refs = [push[2] for push, ok in zip(pushes, results) if not ok]
+
+                        if failed_refs:
+                            failed_deposits = Transaction.objects.filter(checkout_request_id__in=failed_refs, status='pending')
+                            owner_ids = set(failed_deposits.values_list('owner_id', flat=True))
+                            failed_deposits.update(status='failed', updated_at=timezone.now())
+                            for owner_id in owner_ids:
+                                invalidate_user_responses(owner_id)
+
+                        dispatched += len(pushes) - len(failed_refs)
+                        failed += len(failed_refs)
+                        self.stdout.write(
+                            f"Batch done: {len(pushes)} pushes, {len(failed_refs)} failed, {batch_skipped} skipped"
+                        )
+
+        elapsed = time.monotonic() - started
+        throughput = (dispatched + failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Dispatched {dispatched} recurring deposits ({failed} failed, {skipped} skipped) "
+            f"in {elapsed:.1f}s ({throughput:.1f} pushes/s)"
+        ))
+
+    def claim_batch(self, batch_size):
+        """
+        Locks a batch of due schedules, creates their pending transactions
+        and moves each schedule to its next run, all in one transaction.
+        Returns the (phone, amount, reference) pushes to fire and how many
+        schedules were skipped.
+        """
+        now = timezone.now()
+
+        with transaction.atomic(using=ledger_db()):
+            schedules = list(
+                select_related_across(
+                    RecurringDeposit.objects
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .filter(is_active=True, next_run_at__lte=now),
+                    'owner', 'goal',
+                )
+                .order_by('next_run_at')[:batch_size]
+            )
+
+            pending, pushes, skipped = [], [], 0
+            for schedule in schedules:
+                schedule.last_run_at = now
+                schedule.next_run_at = schedule.following_run(now)
+
+                goal = schedule.goal
+                phone_number = schedule.owner.phone_number
+                if not phone_number or goal.current_amount >= goal.target_amount:
+                    skipped += 1
+                    continue
+
+                # Same shape as DepositView's reference so the callback can parse it;
+                # the schedule id keeps it unique when several schedules share a goal.
+                external_reference = payment_reference('deposit', goal.id, schedule.owner_id, f"r{schedule.id}")
+                pending.append(Transaction(
+                    owner_id=schedule.owner_id,
+                    goal=goal,
+                    transaction_type='DEPOSIT',
+                    amount=schedule.amount,
+                    checkout_request_id=external_reference,
+                    status='pending',
+                ))
+                pushes.append((phone_number, schedule.amount, external_reference))
+
+            Transaction.objects.bulk_create(pending)
+            for owner_id in {deposit.owner_id for deposit in pending}:
+                invalidate_user_responses(owner_id)
+            RecurringDeposit.objects.bulk_update(schedules, ['next_run_at', 'last_run_at'])
+
+        return pushes, skipped
+
+    def push(self, limiter, phone_number, amount, external_reference):
+        limiter.acquire()
+        try:
+            return bool(initiate_payhero_push(phone_number, amount, external_reference))
+        except Exception as e:
+            print(f"Recurring deposit push error for {external_reference}: {e}")
+            return False
@@ -0,0 +1,135 @@
+# finance/management/commands/forward_callbacks.py
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from core.metrics import track_external_call
+from finance.models import CallbackForward
+
+
+def backoff_seconds(attempts):
+    """
+    Delay before the next attempt after `attempts` failures: exponential,
+    capped, with jitter so a recovering app isn't hit by every retry at once.
+    """
+    delay = min(
+        settings.CALLBACK_FORWARD_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.CALLBACK_FORWARD_MAX_BACKOFF_SECONDS,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued PayHero callbacks to the other app, retrying with backoff and dead-lettering failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent deliveries (and pooled connections).')
+        parser.add_argument('--batch-size', type=int, default=100, help='Forwards claimed per database round trip.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running, polling for new forwards every --interval seconds.',
+        )
+        parser.add_argument('--interval', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=options['workers'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Matches the old inline forward, which skipped verification too
+        self.session.verify = False
+
+        pruned = self.prune()
+        if pruned:
+            self.stdout.write(f"Pruned {pruned} delivered forwards")
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                delivered, retried, dead = self.drain(pool, options['batch_size'])
+                if delivered or retried or dead:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Forwarded {delivered} callbacks ({retried} to retry, {dead} dead-lettered)"
+                    ))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+    def drain(self, pool, batch_size):
+        delivered = retried = dead = 0
+        while True:
+            forwards = self.claim_batch(batch_size)
+            if not forwards:
+                return delivered, retried, dead
+
+            errors = list(pool.map(self.deliver, forwards))
+            now = timezone.now()
+            for forward, error in zip(forwards, errors):
+                if error is None:
+                    forward.status = 'DELIVERED'
+                    forward.delivered_at = now
+                    forward.last_error = ''
+                    delivered += 1
+                elif forward.attempts >= settings.CALLBACK_FORWARD_MAX_ATTEMPTS:
+                    forward.status = 'DEAD'
+                    forward.last_error = error
+                    dead += 1
+                    print(f"Callback forward #{forward.id} dead-lettered after {forward.attempts} attempts: {error}")
+                else:
+                    forward.next_attempt_at = now + timedelta(seconds=backoff_seconds(forward.attempts))
+                    forward.last_error = error
+                    retried += 1
+            CallbackForward.objects.bulk_update(
+                forwards, ['status', 'delivered_at', 'last_error', 'next_attempt_at'],
+            )
+
+    def claim_batch(self, batch_size):
+        """
+        Locks a batch of due forwards and leases them: their next attempt is
+        pushed past the request timeout, so if this worker dies mid-batch
+        they are picked up again instead of staying stuck.
+        """
+        now = timezone.now()
+        lease_until = now + timedelta(seconds=settings.CALLBACK_FORWARD_TIMEOUT * 4 + 60)
+
+        with transaction.atomic():
+            forwards = list(
+                CallbackForward.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='PENDING', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:batch_size]
+            )
+            for forward in forwards:
+                forward.attempts += 1
+                forward.next_attempt_at = lease_until
+            CallbackForward.objects.bulk_update(forwards, ['attempts', 'next_attempt_at'])
+
+        return forwards
+
+    def deliver(self, forward):
+        """
+        Posts one forward. Returns None on success or the error text.
+        """
+        try:
+            with track_external_call('callback_forward'):
+                response = self.session.post(
+                    forward.target_url, json=forward.payload, timeout=settings.CALLBACK_FORWARD_TIMEOUT,
+                )
+            response.raise_for_status()
+            return None
+        except requests.exceptions.RequestException as e:
+            detail = f"{e.response.status_code} {e.response.text[:500]}" if e.response is not None else str(e)
+            return detail[:2000]
+
+    def prune(self):
+        cutoff = timezone.now() - timedelta(days=settings.CALLBACK_FORWARD_RETENTION_DAYS)
+        deleted, _ = CallbackForward.objects.filter(status='DELIVERED', delivered_at__lt=cutoff).delete()
+        return deleted
@@ -0,0 +1,161 @@
+# finance/management/commands/loadtest_payments.py
+
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from finance.models import Goal
+from users.models import User
+
+PATHS = {
+    'sync': '/api/finance/deposit/',
+    'async': '/api/finance/async/deposit/',
+}
+
+# Every request comes from one user, so the target server needs its payment
+# throttles and deposit velocity limits lifted (as core/benchmarks.py does),
+# or all but the first few requests are refused with a 429
+SERVER_ENV = {
+    'PAYHERO_USER_THROTTLE_RATE': '1000/s', 'PAYHERO_USER_THROTTLE_BURST': '100000',
+    'PAYHERO_GLOBAL_THROTTLE_RATE': '1000/s', 'PAYHERO_GLOBAL_THROTTLE_BURST': '100000',
+    'VELOCITY_DEPOSIT_ATTEMPT_LIMIT': '100000/s', 'VELOCITY_DEPOSIT_LIMIT': '100000/s',
+}
+
+
+def _stub_handler(delay):
+    class PayHeroStub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            body = json.dumps({"success": True, "status": "QUEUED"}).encode()
+            self.send_response(201)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return PayHeroStub
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires concurrent deposit requests at a running server and compares the sync (WSGI) '
+        'and async (ASGI) STK push endpoints. Start the server with PAYHERO_API_URL pointing '
+        'at --stub-port so no real pushes are sent, and with the SERVER_ENV settings that lift the '
+        'payment throttles and velocity limits. Every request leaves a pending transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--host', help='Host header to send, e.g. a name in ALLOWED_HOSTS when testing locally.')
+        parser.add_argument('--email', required=True, help='User to send the deposits as (needs a phone number).')
+        parser.add_argument('--goal-id', type=int, help='Defaults to the user\'s first unfinished goal.')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once.')
+        parser.add_argument('--stub-port', type=int, help='Serve a fake PayHero API on this port while the test runs.')
+        parser.add_argument('--stub-delay', type=float, default=0.5, help='Seconds the fake PayHero takes to answer.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}.")
+        goal_id = options['goal_id'] or self.pick_goal(user)
+        token = str(RefreshToken.for_user(user).access_token)
+
+        stub = None
+        if options['stub_port']:
+            stub = ThreadingHTTPServer(('127.0.0.1', options['stub_port']), _stub_handler(options['stub_delay']))
+            stub.daemon_threads = True
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            self.stdout.write(f"PayHero stub on http://127.0.0.1:{options['stub_port']}/ ({options['stub_delay']}s per push)")
+
+        server_env = " ".join(f"{name}={value}" for name, value in SERVER_ENV.items())
+        self.stdout.write(f"The server should run with {server_env}")
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        # Latency and req/s cover accepted requests only; 429s are counted apart
+        self.stdout.write(
+            f"{'mode':<8}{'requests':>10}{'ok':>8}{'429s':>8}{'errors':>8}{'ok/s':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        throttled = 0
+        try:
+            for mode in modes:
+                result = asyncio.run(self.run(
+                    options['base_url'] + PATHS[mode], token, goal_id, options['requests'], options['concurrency'],
+                    options['host'],
+                ))
+                throttled += result['throttled']
+                self.stdout.write(
+                    f"{mode:<8}{result['requests']:>10}{result['ok']:>8}{result['throttled']:>8}{result['errors']:>8}"
+                    f"{result['rps']:>10.1f}{result['p50']:>10.0f}{result['p95']:>10.0f}{result['p99']:>10.0f}"
+                )
+        finally:
+            if stub:
+                stub.shutdown()
+
+        if throttled:
+            self.stdout.write(self.style.WARNING(
+                f"{throttled} requests were throttled; restart the server with {server_env} to compare the endpoints."
+            ))
+        self.stdout.write(self.style.SUCCESS("Load test finished"))
+
+    def pick_goal(self, user):
+        goal = Goal.objects.filter(owner=user).order_by('id').first()
+        if goal is None:
+            raise CommandError("The user has no goals; pass --goal-id.")
+        return goal.id
+
+    async def run(self, url, token, goal_id, total, concurrency, host=None):
+        limit = asyncio.Semaphore(concurrency)
+        latencies, throttled, errors = [], 0, 0
+        headers = {"Authorization": f"Bearer {token}"}
+        if host:
+            headers["Host"] = host
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+            async def one():
+                nonlocal throttled, errors
+                async with limit:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(url, json={'amount': '10', 'goal_id': goal_id}, headers=headers)
+                    except httpx.HTTPError:
+                        errors += 1
+                        return
+                    if response.status_code == 200:
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    elif response.status_code == 429:
+                        throttled += 1
+                    else:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(total)))
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        ok = len(latencies)
+        return {
+            'requests': total,
+            'ok': ok,
+            'throttled': throttled,
+            'errors': errors,
+            'rps': ok / elapsed,
+            'p50': statistics.median(latencies) if ok else 0,
+            'p95': latencies[min(ok - 1, int(ok * 0.95))] if ok else 0,
+            'p99': latencies[min(ok - 1, int(ok * 0.99))] if ok else 0,
+        }
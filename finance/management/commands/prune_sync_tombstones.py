@@ -0,0 +1,18 @@
+# finance/management/commands/prune_sync_tombstones.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from finance.models import SyncTombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} sync tombstones older than {cutoff:%Y-%m-%d}"))
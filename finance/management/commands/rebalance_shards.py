@@ -0,0 +1,110 @@
+# finance/management/commands/rebalance_shards.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from core.sharding import SHARDED_MODELS, ledger_shards, shard_for_user
+from finance.models import (
+    ArchivedTransaction, Goal, Installment, Order, RecurringDeposit, RepaymentReminder, SplitDeposit, Transaction,
+    VendorPayout,
+)
+from finance.response_cache import invalidate_user_responses
+
+# Parents before the rows pointing at them; deleted in reverse
+MOVE_ORDER = [
+    Goal, Order, RecurringDeposit, SplitDeposit, Transaction, ArchivedTransaction, Installment, VendorPayout,
+    RepaymentReminder,
+]
+
+
+def owner_lookup(model):
+    """The filter naming a user's rows of `model` (see SHARDED_MODELS)."""
+    owner = SHARDED_MODELS[model._meta.label_lower]
+    return owner if owner.endswith('_id') else f"{owner}__user_id"
+
+
+def misplaced_users(alias):
+    """Ids of users with ledger rows on `alias` that hash to another shard."""
+    user_ids = set()
+    for model in MOVE_ORDER:
+        lookup = owner_lookup(model)
+        if '__' not in lookup:
+            user_ids.update(model.objects.using(alias).values_list(lookup, flat=True).distinct())
+    return sorted(user_id for user_id in user_ids if shard_for_user(user_id) != alias)
+
+
+def move_user(user_id, source, target):
+    """
+    Copies a user's ledger rows from `source` to `target`, ids and all, and
+    only once that has committed deletes them from `source`. Returns the
+    number of rows moved.
+
+    A failure before the target commits leaves everything on `source`; one
+    after it leaves the rows on both, and a re-run copies them over the
+    earlier copies (source wins) before deleting them.
+    """
+    copied = []
+    # Outer, so the source rows stay locked until they are gone
+    with transaction.atomic(using=source):
+        with transaction.atomic(using=target):
+            for model in MOVE_ORDER:
+                rows = list(model.objects.using(source).select_for_update().filter(**{owner_lookup(model): user_id}))
+                if rows:
+                    model.objects.using(target).bulk_create(
+                        rows, update_conflicts=True, unique_fields=[model._meta.pk.name],
+                        update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key],
+                    )
+                    copied.append((model, [row.pk for row in rows]))
+        delete_rows(connections[source], reversed(copied))
+    return sum(len(ids) for _, ids in copied)
+
+
+def delete_rows(connection, rows):
+    """
+    Deletes (model, ids) pairs with raw DELETEs: the rows are moving, not
+    going away, so the tombstone and cache signals must not fire.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model, ids in rows:
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)} "
+                f"WHERE {quote(model._meta.pk.column)} IN ({', '.join(['%s'] * len(ids))})",
+                ids,
+            )
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves ledger rows to the shard their user hashes to, after a shard is added to DATABASE_SHARD_URLS. "
+        "Each user moves in its own transactions, so it's safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the users that would move.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = rows = 0
+        for source in ledger_shards():
+            user_ids = misplaced_users(source)
+            if options['dry_run']:
+                self.stdout.write(f"Would move {len(user_ids)} users off {source}")
+                continue
+            for user_id in user_ids:
+                target = shard_for_user(user_id)
+                rows += move_user(user_id, source, target)
+                users += 1
+                invalidate_user_responses(user_id)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  user #{user_id}: {source} -> {target}")
+
+        if options['dry_run']:
+            return
+        elapsed = time.perf_counter() - started
+        throughput = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {rows} ledger rows of {users} users in {elapsed:.1f}s ({throughput:.1f} rows/s)"
+        ))
@@ -0,0 +1,28 @@
+# finance/management/commands/replay_callback_forwards.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.models import CallbackForward
+
+
+class Command(BaseCommand):
+    help = 'Re-queues dead-lettered (or specific) callback forwards for the forward_callbacks worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Forward ids to replay, whatever their status.')
+        parser.add_argument('--all-dead', action='store_true', help='Replay every dead-lettered forward.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['ids']:
+            forwards = CallbackForward.objects.filter(id__in=options['ids'])
+        elif options['all_dead']:
+            forwards = CallbackForward.objects.filter(status='DEAD')
+        else:
+            raise CommandError("Pass forward ids or --all-dead.")
+
+        if options['dry_run']:
+            self.stdout.write(f"Would replay {forwards.count()} forwards")
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Re-queued {forwards.replay()} forwards"))
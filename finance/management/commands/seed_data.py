@@ -0,0 +1,211 @@
+# finance/management/commands/seed_data.py
+
+import random
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core.sharding import ledger_shards, shard_for_user
+from finance.installments import build_schedule
+from finance.models import Goal, Installment, Order, Product, Transaction, VendorPayout
+from users.models import User
+
+DEPOSIT_AMOUNTS = [Decimal(amount) for amount in range(50, 5000, 50)]
+# Payment times are drawn on a 5 minute grid over the last year
+TIME_SLOTS = 365 * 24 * 12
+
+
+def by_shard(rows, user_id):
+    """Splits `rows` by the ledger shard of their user, keeping their order."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(shard_for_user(user_id(row)), []).append(row)
+    return groups.items()
+
+
+class Command(BaseCommand):
+    help = 'Generates deterministic synthetic users, goals, transactions, products, orders and payouts at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--goals-per-user', type=int, default=3)
+        parser.add_argument('--transactions-per-goal', type=int, default=10)
+        parser.add_argument('--products', type=int, default=100, help='Catalog size.')
+        parser.add_argument('--orders-per-user', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=42, help='Same seed, same data. Also namespaces emails and references.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per bulk_create.')
+        parser.add_argument('--password', default='password123', help='Password for every generated user (hashed once).')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = f"seed{options['seed']}"
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+
+        if User.objects.filter(email=self.email(0)).exists():
+            raise CommandError(f"Data for --seed {options['seed']} already exists; use another seed.")
+
+        started = time.perf_counter()
+        self.transaction_sql = self.build_transaction_insert()
+        self.transaction_count = 0
+        self.stamps = {}
+        self.adapt_datetime = connection.ops.adapt_datetimefield_value
+        products = self.create_products(options['products'])
+        password = make_password(options['password'])
+
+        counts = {'users': 0, 'goals': 0, 'transactions': 0, 'orders': 0, 'installments': 0, 'payouts': 0}
+        # Size user batches so each one writes roughly chunk_size transactions
+        per_user = max(1, options['goals_per_user'] * options['transactions_per_goal'])
+        users_per_batch = max(1, self.chunk_size // per_user)
+        for first in range(0, options['users'], users_per_batch):
+            last = min(first + users_per_batch, options['users'])
+            # Users on 'default', their ledger rows on their shards
+            with ExitStack() as stack:
+                for alias in ledger_shards():
+                    stack.enter_context(transaction.atomic(using=alias))
+                batch = self.create_user_batch(range(first, last), password, products, options)
+            for key, value in batch.items():
+                counts[key] += value
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{counts['users']} users, {counts['transactions']} transactions "
+                f"({counts['transactions'] / elapsed:,.0f} tx/s)"
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(products)} products, {counts['users']} users, {counts['goals']} goals, "
+            f"{counts['transactions']} transactions, {counts['orders']} orders ({counts['installments']} installments) "
+            f"and {counts['payouts']} payouts in {elapsed:.1f}s"
+        ))
+
+    def build_transaction_insert(self):
+        # Transactions are the bulk of the rows, so they skip model instances
+        # and go straight to executemany. This also lets created_at carry the
+        # historical payment time instead of auto_now_add's "now".
+        fields = [
+            'owner', 'goal', 'transaction_type', 'amount', 'mpesa_receipt_number', 'transaction_date',
+            'checkout_request_id', 'status', 'created_at', 'updated_at',
+        ]
+        columns = ", ".join(connection.ops.quote_name(Transaction._meta.get_field(name).column) for name in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        return f"INSERT INTO {connection.ops.quote_name(Transaction._meta.db_table)} ({columns}) VALUES ({placeholders})"
+
+    def stamp(self, slot):
+        # Memoise the DB-ready value; there are far fewer slots than rows
+        stamp = self.stamps.get(slot)
+        if stamp is None:
+            stamp = self.stamps[slot] = self.adapt_datetime(self.now - timedelta(minutes=5 * slot))
+        return stamp
+
+    @staticmethod
+    def draw_status(roll):
+        if roll < 0.9:
+            return 'completed'
+        return 'pending' if roll < 0.95 else 'failed'
+
+    def email(self, n):
+        return f"{self.prefix}-user{n}@example.test"
+
+    def create_products(self, count):
+        products = [
+            Product(
+                name=f"Product {self.prefix}-{n}",
+                description="Generated by seed_data",
+                price=Decimal(self.rng.randrange(500, 80000, 50)),
+                required_koin_score=self.rng.choice([0, 250, 500, 1000, 2000]),
+                vendor_name=f"Vendor {n % 20}",
+                vendor_location="Main Campus",
+            )
+            for n in range(count)
+        ]
+        return Product.objects.bulk_create(products, batch_size=self.chunk_size)
+
+    def create_user_batch(self, numbers, password, products, options):
+        rng = self.rng
+        users = User.objects.bulk_create([
+            User(
+                username=self.email(n), email=self.email(n), name=f"Student {n}", password=password,
+                adm_no=f"{self.prefix.upper()}/{n:07d}", phone_number=f"07{options['seed'] % 1000:03d}{n:07d}",
+                koin_score=rng.randrange(0, 5000),
+            )
+            for n in numbers
+        ], batch_size=self.chunk_size)
+
+        # Draw every goal's deposits up front so its balance matches its history
+        goals, histories = [], []
+        for user in users:
+            for g in range(options['goals_per_user']):
+                history = [
+                    (rng.choice(DEPOSIT_AMOUNTS), self.draw_status(rng.random()), rng.randrange(TIME_SLOTS))
+                    for _ in range(options['transactions_per_goal'])
+                ]
+                saved = sum((amount for amount, status, _ in history if status == 'completed'), Decimal('0.00'))
+                goals.append(Goal(
+                    owner=user, name=f"Goal {g + 1}",
+                    target_amount=saved + Decimal(rng.randrange(0, 50000, 100)), current_amount=saved,
+                ))
+                histories.append(history)
+        # bulk_create has no instance to route by, so each shard gets its own
+        for alias, shard_goals in by_shard(goals, lambda goal: goal.owner_id):
+            Goal.objects.using(alias).bulk_create(shard_goals, batch_size=self.chunk_size)
+
+        transactions = []
+        for goal, history in zip(goals, histories):
+            for amount, status, slot in history:
+                self.transaction_count += 1
+                reference = f"{self.prefix}-tx{self.transaction_count}"
+                stamp = self.stamp(slot)
+                completed = status == 'completed'
+                transactions.append((
+                    goal.owner_id, goal.id, 'DEPOSIT', amount, reference if completed else None,
+                    stamp if completed else None, reference, status, stamp, stamp,
+                ))
+        for alias, rows in by_shard(transactions, lambda row: row[0]):
+            with connections[alias].cursor() as cursor:
+                for start in range(0, len(rows), self.chunk_size):
+                    cursor.executemany(self.transaction_sql, rows[start:start + self.chunk_size])
+
+        orders = []
+        for user in users:
+            for product in rng.sample(products, min(options['orders_per_user'], len(products))):
+                down_payment = product.price * Decimal('0.25')
+                financed = product.price - down_payment
+                status = rng.choice(('READY_FOR_PICKUP', 'COMPLETED', 'PAID'))
+                if status == 'PAID':
+                    paid = financed
+                elif status == 'COMPLETED':
+                    paid = Decimal(rng.randrange(0, int(financed) + 1))
+                else:
+                    paid = Decimal('0.00')
+                orders.append(Order(
+                    user=user, product=product, total_amount=product.price, down_payment=down_payment,
+                    amount_financed=financed, amount_paid=paid, status=status,
+                    pickup_qr_code=uuid.UUID(int=rng.getrandbits(128)),
+                ))
+        installments = payouts = 0
+        for alias, shard_orders in by_shard(orders, lambda order: order.user_id):
+            Order.objects.using(alias).bulk_create(shard_orders, batch_size=self.chunk_size)
+            installments += len(Installment.objects.using(alias).bulk_create(
+                [installment for order in shard_orders for installment in build_schedule(order)],
+                batch_size=self.chunk_size,
+            ))
+            payouts += len(VendorPayout.objects.using(alias).bulk_create([
+                VendorPayout(
+                    order=order, vendor_name=order.product.vendor_name, amount=order.total_amount,
+                    mpesa_transaction_id=f"PAYOUT-{order.pickup_qr_code.hex[:8].upper()}",
+                )
+                for order in shard_orders if order.status != 'READY_FOR_PICKUP'
+            ], batch_size=self.chunk_size))
+
+        return {
+            'users': len(users), 'goals': len(goals), 'transactions': len(transactions),
+            'orders': len(orders), 'installments': installments, 'payouts': payouts,
+        }
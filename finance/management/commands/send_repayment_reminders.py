@@ -0,0 +1,166 @@
+# finance/management/commands/send_repayment_reminders.py
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.metrics import track_external_call
+from core.sharding import ledger_shards, on_shard
+from finance.installments import overdue_orders
+from finance.models import RepaymentReminder
+# finance.views initializes the Firebase app
+from finance.views import messaging
+
+# Most messages FCM accepts in one send_each() call
+FCM_BATCH_LIMIT = 500
+
+
+def reminder_text(orders):
+    outstanding = sum(order.amount_financed - order.amount_paid for order in orders)
+    if len(orders) == 1:
+        return f"Your repayment for {orders[0].product.name} is overdue. Ksh. {outstanding:,.0f} is still outstanding."
+    return f"Repayments for {len(orders)} orders are overdue. Ksh. {outstanding:,.0f} is still outstanding."
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends one overdue-repayment reminder per user per day, streaming overdue orders and delivering '
+        'in FCM batches. Safe to rerun: users already reminded today are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=FCM_BATCH_LIMIT,
+            help=f'Reminders per FCM request (at most {FCM_BATCH_LIMIT}).',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='FCM requests in flight at once.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, min(options['batch_size'], FCM_BATCH_LIMIT))
+        today = self.today = timezone.localdate()
+        started = time.monotonic()
+        sent = failed = 0
+
+        pruned = self.prune(today)
+        if pruned:
+            self.stdout.write(f"Pruned {pruned} old reminder log entries")
+
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # Each ledger shard holds its users' orders and reminder log
+            for alias in ledger_shards():
+                with on_shard(alias):
+                    for batch in self.batches(today, batch_size):
+                        self.claim(batch, today)
+                        in_flight.append((alias, pool.submit(self.deliver, batch)))
+                        # Bounded: reading ahead stops until the oldest batch lands
+                        if len(in_flight) >= options['workers']:
+                            batch_sent, batch_failed = self.record(*in_flight.popleft())
+                            sent += batch_sent
+                            failed += batch_failed
+            while in_flight:
+                batch_sent, batch_failed = self.record(*in_flight.popleft())
+                sent += batch_sent
+                failed += batch_failed
+
+        elapsed = time.monotonic() - started
+        throughput = (sent + failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {sent} repayment reminders ({failed} failed) in {elapsed:.1f}s ({throughput:.1f} reminders/s)"
+        ))
+
+    def batches(self, today, batch_size):
+        """
+        Streams the current shard's overdue orders and yields lists of
+        (user, orders) of up to `batch_size` users with a device to notify.
+        Rows come ordered by user, so each user's orders are adjacent and
+        only one user's are held at a time.
+        """
+        batch, user, orders = [], None, []
+        for order in overdue_orders(today).iterator(chunk_size=2000):
+            if user is not None and order.user_id != user.id:
+                if user.fcm_token:
+                    batch.append((user, orders))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+                orders = []
+            user = order.user
+            orders.append(order)
+        if user is not None and user.fcm_token:
+            batch.append((user, orders))
+        if batch:
+            yield batch
+
+    def claim(self, batch, today):
+        """
+        Logs the batch's reminders as PENDING before they are sent. Rows a
+        crashed or failed run left behind are reset rather than duplicated.
+        """
+        RepaymentReminder.objects.bulk_create(
+            [RepaymentReminder(user=user, sent_on=today, order_count=len(orders)) for user, orders in batch],
+            update_conflicts=True,
+            unique_fields=['user', 'sent_on'],
+            update_fields=['order_count', 'status', 'error'],
+        )
+
+    def deliver(self, batch):
+        """
+        Sends the batch in one FCM request. Returns (user id, error or None)
+        per reminder.
+        """
+        messages = [
+            messaging.Message(
+                data={
+                    'title': "Repayment Overdue ⏰",
+                    'body': reminder_text(orders),
+                    'type': 'repayment_reminder',
+                    'order_ids': ','.join(str(order.id) for order in orders),
+                },
+                token=user.fcm_token,
+            )
+            for user, orders in batch
+        ]
+        try:
+            with track_external_call('fcm'):
+                response = messaging.send_each(messages)
+        except Exception as e:
+            print(f"Repayment reminder batch of {len(batch)} failed: {e}")
+            return [(user.id, str(e)[:2000]) for user, _ in batch]
+        return [
+            (user.id, None if result.success else str(result.exception)[:2000])
+            for (user, _), result in zip(batch, response.responses)
+        ]
+
+    def record(self, alias, future):
+        """Marks a delivered batch's log rows, on shard `alias`, SENT or FAILED."""
+        results = future.result()
+        sent_ids = [user_id for user_id, error in results if error is None]
+        failures = [(user_id, error) for user_id, error in results if error is not None]
+        for user_id, error in failures:
+            print(f"Repayment reminder for user #{user_id} failed: {error}")
+
+        with on_shard(alias):
+            pending = RepaymentReminder.objects.filter(sent_on=self.today, status='PENDING')
+            if sent_ids:
+                pending.filter(user_id__in=sent_ids).update(status='SENT', sent_at=timezone.now())
+            if failures:
+                errors = dict(failures)
+                reminders = list(pending.filter(user_id__in=errors))
+                for reminder in reminders:
+                    reminder.status = 'FAILED'
+                    reminder.error = errors[reminder.user_id]
+                RepaymentReminder.objects.bulk_update(reminders, ['status', 'error'])
+        return len(sent_ids), len(failures)
+
+    def prune(self, today):
+        cutoff = today - timedelta(days=settings.REPAYMENT_REMINDER_RETENTION_DAYS)
+        deleted = 0
+        for alias in ledger_shards():
+            deleted += RepaymentReminder.objects.using(alias).filter(sent_on__lt=cutoff).delete()[0]
+        return deleted
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_recurringdeposit'),
+        ('users', '0004_user_profile_picture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSavingsStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='savings_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_deposited', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('deposit_count', models.IntegerField(default=0)),
+                ('deposits_last_90d', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('savings_streak_weeks', models.IntegerField(default=0)),
+                ('consistency_score', models.FloatField(default=0)),
+                ('projected_koin_score', models.IntegerField(default=0)),
+                ('last_deposit_date', models.DateField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
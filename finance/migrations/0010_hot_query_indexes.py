@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_admin_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recurringdeposit',
+            name='recurring_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'product'], name='order_user_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringdeposit',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_run_at'], name='recurring_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', '-created_at'], name='transaction_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:31
+
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_schedules(apps, schema_editor):
+    # Existing orders get the schedule they would have been created with,
+    # with what they have repaid so far applied oldest first. Kept separate
+    # from finance/installments.py so later changes there don't alter history.
+    Order = apps.get_model('finance', 'Order')
+    Installment = apps.get_model('finance', 'Installment')
+    count = settings.ORDER_INSTALLMENT_COUNT
+    interval = timedelta(days=settings.ORDER_INSTALLMENT_INTERVAL_DAYS)
+
+    batch = []
+    for order in Order.objects.order_by('id').iterator(chunk_size=2000):
+        share = (order.amount_financed / count).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        amounts = [share] * (count - 1) + [order.amount_financed - share * (count - 1)]
+        first_day = timezone.localdate(order.order_date)
+        repaid = order.amount_financed if order.status == 'PAID' else order.amount_paid
+        for number, amount in enumerate(amounts, start=1):
+            paid = min(amount, max(repaid, Decimal('0.00')))
+            repaid -= paid
+            batch.append(Installment(
+                order_id=order.id, number=number, due_date=first_day + interval * number, amount=amount,
+                amount_paid=paid, status='PAID' if paid == amount else 'PENDING',
+                paid_at=order.updated_at if paid == amount else None,
+            ))
+        if len(batch) >= 5000:
+            Installment.objects.bulk_create(batch)
+            batch = []
+    Installment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_splitdeposit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Installment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid')], default='PENDING', max_length=10)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='finance.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_date', 'status'], name='installment_due_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'number'), name='installment_order_number_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_schedules, migrations.RunPython.noop),
+    ]
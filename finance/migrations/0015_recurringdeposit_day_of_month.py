@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:12
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay
+
+
+def backfill_day_of_month(apps, schema_editor):
+    # The best anchor left for existing schedules is their next run; one
+    # already clamped to a short month keeps that day
+    RecurringDeposit = apps.get_model('finance', 'RecurringDeposit')
+    RecurringDeposit.objects.using(schema_editor.connection.alias).update(day_of_month=ExtractDay('next_run_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0014_ledger_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringdeposit',
+            name='day_of_month',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        # Runs on every ledger shard (see LedgerShardRouter.allow_migrate)
+        migrations.RunPython(
+            backfill_day_of_month, migrations.RunPython.noop, hints={'model_name': 'recurringdeposit'},
+        ),
+        migrations.AlterField(
+            model_name='recurringdeposit',
+            name='day_of_month',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+    ]
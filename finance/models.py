@@ -1,10 +1,18 @@
 # finance/models.py
+import calendar
 import uuid
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
 from django.db import models
+from django.utils import timezone
+
+from core.sharding import LedgerQuerySet
 from users.models import User 
 
 class Goal(models.Model):
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='goals')
+    # No database constraint on foreign keys to users and products: ledger
+    # rows may sit on a shard without those tables (see core/sharding.py)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='goals', db_constraint=False)
 
     # The name of the goal, e.g., "New Laptop"
     name = models.CharField(max_length=255)
@@ -16,6 +24,15 @@ class Goal(models.Model):
 
     # Automatically records when the goal was created.
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save; the sync endpoint diffs against it.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'updated_at'], name='goal_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.owner.email})"
@@ -25,7 +42,7 @@ class Transaction(models.Model):
         ('DEPOSIT', 'Goal Deposit'),
         ('REPAYMENT', 'Order Repayment'),
     ]
-    owner = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    owner = models.ForeignKey('users.User', on_delete=models.CASCADE, db_constraint=False)
     goal = models.ForeignKey('Goal', on_delete=models.CASCADE, null=True, blank=True)
     # Add a new optional field for the order
     order = models.ForeignKey('Order', on_delete=models.CASCADE, null=True, blank=True)
@@ -47,10 +64,101 @@ class Transaction(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending') # Default is now pending
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'updated_at'], name='transaction_owner_updated_idx'),
+            # The transaction list, newest first, without a sort
+            models.Index(fields=['owner', '-created_at'], name='transaction_owner_created_idx'),
+            # The admin's status/date filters and its stale-pending action
+            models.Index(fields=['status', 'created_at'], name='transaction_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.mpesa_receipt_number or self.checkout_request_id}"
 
+class ArchivedTransaction(models.Model):
+    """
+    Completed and failed transactions moved out of the hot table by the
+    archive_transactions command. Same columns and ids as Transaction, so
+    TransactionSerializer renders either; readers that need the whole
+    history (the transactions list, full sync, savings stats) merge both.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    goal = models.ForeignKey('Goal', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    order = models.ForeignKey('Order', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    mpesa_receipt_number = models.CharField(max_length=50, null=True, blank=True)
+    transaction_date = models.DateTimeField(null=True, blank=True)
+    # Still unique, so a very late duplicate callback can be recognised
+    checkout_request_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=Transaction.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='archived_tx_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mpesa_receipt_number or self.checkout_request_id} (archived)"
+
+class SplitDeposit(models.Model):
+    """
+    One STK push paying into several of a user's goals. Each goal still gets
+    an ordinary DEPOSIT Transaction (referenced `<checkout_request_id>-<goal
+    id>`), so history, sync and stats see plain deposits; the callback for
+    this reference settles them all at once.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='split_deposits', db_constraint=False)
+    # Sent to PayHero; the callback is matched on it
+    checkout_request_id = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # [[goal id, "amount"], ...] in the order the user gave them
+    allocations = models.JSONField()
+    status = models.CharField(max_length=20, choices=Transaction.STATUS_CHOICES, default='pending')
+    # The per-goal transactions can't share the (unique) receipt, so it's kept here
+    mpesa_receipt_number = models.CharField(max_length=50, null=True, blank=True, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    def goal_reference(self, goal_id):
+        return f"{self.checkout_request_id}-{goal_id}"
+
+    def references(self):
+        return [self.goal_reference(goal_id) for goal_id, _ in self.allocations]
+
+    def shares(self, paid):
+        """
+        {goal id: amount} for a payment of `paid`: the requested split, or
+        the same proportions if PayHero reports a different amount (the
+        rounding remainder goes to the last goal).
+        """
+        shares = {int(goal_id): Decimal(amount) for goal_id, amount in self.allocations}
+        if paid == self.amount:
+            return shares
+        shares = {
+            goal_id: (amount * paid / self.amount).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+            for goal_id, amount in shares.items()
+        }
+        last = list(shares)[-1]
+        shares[last] += paid - sum(shares.values())
+        return shares
+
+    def __str__(self):
+        return f"{self.mpesa_receipt_number or self.checkout_request_id} (split)"
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
@@ -70,9 +178,9 @@ class Order(models.Model):
     ]
 
     # The user who made the order
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', db_constraint=False)
     # The product that was ordered
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_constraint=False)
 
     # Financial details at the time of the order
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -83,10 +191,91 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='READY_FOR_PICKUP')
     order_date = models.DateTimeField(auto_now_add=True)
     pickup_qr_code = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='order_user_updated_idx'),
+            # "Has this user already ordered this product?"
+            models.Index(fields=['user', 'product'], name='order_user_product_idx'),
+            # The admin's status/date filters
+            models.Index(fields=['status', 'order_date'], name='order_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.product.name} for {self.user.email}"
     
+class Installment(models.Model):
+    """
+    One slice of an order's repayment schedule, created with the order (see
+    installments.py). Repayments pay installments off oldest first; one is
+    overdue while it's PENDING past its due date.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PAID', 'Paid'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='installments')
+    # 1-based position in the schedule
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'number'], name='installment_order_number_uniq'),
+        ]
+        indexes = [
+            # "Due (or overdue) between these dates" across all orders
+            models.Index(fields=['due_date', 'status'], name='installment_due_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Installment {self.number} of order #{self.order_id}"
+
+class RepaymentReminder(models.Model):
+    """
+    One user's overdue-repayment reminder for a day, written by
+    send_repayment_reminders before it sends. The (user, sent_on) constraint
+    keeps it to one per user per day; a run that crashed leaves PENDING rows,
+    which the next run sends.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='repayment_reminders', db_constraint=False)
+    sent_on = models.DateField()
+    # Overdue orders the reminder covered
+    order_count = models.IntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'sent_on'], name='reminder_user_day_uniq'),
+        ]
+        indexes = [
+            # Pruning by age
+            models.Index(fields=['sent_on'], name='reminder_sent_on_idx'),
+        ]
+
+    def __str__(self):
+        return f"Repayment reminder for user #{self.user_id} on {self.sent_on}"
+
 class VendorPayout(models.Model):
     order = models.OneToOneField(Order, on_delete=models.CASCADE)
     vendor_name = models.CharField(max_length=255)
@@ -94,6 +283,171 @@ class VendorPayout(models.Model):
     mpesa_transaction_id = models.CharField(max_length=50, blank=True, null=True) # For the B2C receipt
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LedgerQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Payout for {self.order.product.name} to {self.vendor_name}"
+
+class RecurringDeposit(models.Model):
+    FREQUENCY_CHOICES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_deposits', db_constraint=False)
+    goal = models.ForeignKey(Goal, on_delete=models.CASCADE, related_name='recurring_deposits')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='MONTHLY')
+
+    # When the next STK push is due. The dispatcher selects on this.
+    next_run_at = models.DateTimeField()
+    # The day of month monthly runs fall on, taken from next_run_at when it
+    # is set; short months clamp a run, not the schedule
+    day_of_month = models.PositiveSmallIntegerField(editable=False)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The dispatcher's "active and due" range scan. Partial, because
+            # SQLite can't match a bare boolean test to an index column.
+            models.Index(fields=['next_run_at'], condition=models.Q(is_active=True), name='recurring_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} Ksh. {self.amount} to goal #{self.goal_id}"
+
+    def save(self, *args, **kwargs):
+        if self.day_of_month is None:
+            self.day_of_month = self.next_run_at.day
+        super().save(*args, **kwargs)
+
+    def following_run(self, after):
+        """
+        Returns the first run time after `after`, stepping from the current
+        next_run_at so a schedule that fell behind doesn't fire repeatedly.
+        Monthly schedules keep their day of month, clamped to short months.
+        """
+        run_at = self.next_run_at
+        while run_at <= after:
+            if self.frequency == 'DAILY':
+                run_at += timedelta(days=1)
+            elif self.frequency == 'WEEKLY':
+                run_at += timedelta(weeks=1)
+            else:
+                year = run_at.year + run_at.month // 12
+                month = run_at.month % 12 + 1
+                day = min(self.day_of_month, calendar.monthrange(year, month)[1])
+                run_at = run_at.replace(year=year, month=month, day=day)
+        return run_at
+
+class UserSavingsStats(models.Model):
+    # Rebuilt nightly by the compute_savings_stats command
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='savings_stats')
+
+    total_deposited = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    deposit_count = models.IntegerField(default=0)
+    deposits_last_90d = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    # Consecutive weeks with at least one deposit, ending this week or last week
+    savings_streak_weeks = models.IntegerField(default=0)
+    # Share of the last 12 weeks with a deposit, 0-100
+    consistency_score = models.FloatField(default=0)
+    # Current koin score plus a month of deposit bonus at the 90 day pace
+    projected_koin_score = models.IntegerField(default=0)
+
+    last_deposit_date = models.DateField(null=True, blank=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Savings stats for user #{self.user_id}"
+
+class SyncTombstone(models.Model):
+    """
+    Records a deleted goal, order or transaction so the sync endpoint can
+    tell clients to drop their local copy.
+    """
+    KIND_CHOICES = [
+        ('goal', 'Goal'),
+        ('order', 'Order'),
+        ('transaction', 'Transaction'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'deleted_at'], name='tombstone_owner_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} #{self.object_id}"
+
+class ProfileReport(models.Model):
+    # Written by core.profiling.ProfilingMiddleware; capped at PROFILE_REPORT_LIMIT rows
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=255, blank=True)
+    status_code = models.IntegerField()
+    profiler = models.CharField(max_length=20)
+
+    duration_ms = models.FloatField()
+    query_count = models.IntegerField()
+    db_ms = models.FloatField()
+
+    profile = models.TextField()
+    # [{"sql": ..., "ms": ...}, ...] in execution order
+    queries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+class CallbackForwardQuerySet(models.QuerySet):
+    def replay(self):
+        """Puts these forwards back in the queue with a fresh attempt budget."""
+        return self.update(status='PENDING', attempts=0, next_attempt_at=timezone.now(), last_error='')
+
+
+class CallbackForward(models.Model):
+    """
+    A PayHero callback for the other app, queued by PaymentCallbackView and
+    delivered by the forward_callbacks worker.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DELIVERED', 'Delivered'),
+        ('DEAD', 'Dead-lettered'),
+    ]
+
+    target_url = models.URLField(max_length=500)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    # Due time for the next attempt; also pushed forward while a worker holds the row
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CallbackForwardQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The worker's "pending and due" range scan
+            models.Index(fields=['status', 'next_attempt_at'], name='forward_due_idx'),
+        ]
+
     def __str__(self):
-        return f"Payout for {self.order.product.name} to {self.vendor_name}"   
-         
\ No newline at end of file
+        return f"Callback forward #{self.id} ({self.status})"
@@ -1,20 +1,27 @@
 # backend/finance/payhero_utils.py
 
+import asyncio
 import os
+
+import httpx
 import requests
 from django.utils import timezone
 from urllib3.exceptions import InsecureRequestWarning # <-- 1. Import the exception
 import urllib3 # <-- 2. Import urllib3
+from core.metrics import track_external_call
 
 # 3. Suppress the warning
 urllib3.disable_warnings(InsecureRequestWarning)
 
-def initiate_payhero_push(phone_number, amount, external_reference):
-    """
-    Initiates an STK Push request using the PayHero API.
-    """
-    api_url = "https://backend.payhero.co.ke/api/v2/payments"
-    
+PAYHERO_API_URL = os.getenv('PAYHERO_API_URL', "https://backend.payhero.co.ke/api/v2/payments")
+
+# One pooled client per event loop (per ASGI worker), so concurrent STK
+# pushes reuse TLS connections instead of opening one each.
+_async_client = None
+_async_client_loop = None
+
+
+def _build_payhero_request(phone_number, amount, external_reference):
     auth_header = os.getenv('PAYHERO_BASIC_AUTH')
     channel_id = os.getenv('PAYHERO_CHANNEL_ID')
     
@@ -36,16 +43,87 @@ def initiate_payhero_push(phone_number, amount, external_reference):
         "callback_url": callback_url,
         "customer_name": "Kampus Koin User"
     }
+    return payload, headers
+
+
+def initiate_payhero_push(phone_number, amount, external_reference):
+    """
+    Initiates an STK Push request using the PayHero API.
+    """
+    payload, headers = _build_payhero_request(phone_number, amount, external_reference)
 
     try:
         # We use verify=False to match your 'rejectUnauthorized: false'
         # This is a security risk in production, but is often
         # required for these third-party APIs.
-        response = requests.post(api_url, json=payload, headers=headers, verify=False)
+        with track_external_call('payhero'):
+            response = requests.post(PAYHERO_API_URL, json=payload, headers=headers, verify=False)
         response.raise_for_status() # Raise an exception for bad status codes
         
         return response.json()
         
     except requests.exceptions.RequestException as e:
         print(f"PayHero initiation error: {e.response.text if e.response else e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def get_async_client():
+    """
+    Shared httpx.AsyncClient for the running event loop.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            verify=False,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv('PAYHERO_MAX_CONNECTIONS', 200)),
+                max_keepalive_connections=int(os.getenv('PAYHERO_MAX_KEEPALIVE', 50)),
+            ),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def initiate_payhero_push_async(phone_number, amount, external_reference):
+    """
+    Async version of initiate_payhero_push for the ASGI payment views.
+    """
+    payload, headers = _build_payhero_request(phone_number, amount, external_reference)
+    # requests silently drops None headers; httpx rejects them
+    headers = {name: value for name, value in headers.items() if value is not None}
+
+    try:
+        with track_external_call('payhero'):
+            response = await get_async_client().post(PAYHERO_API_URL, json=payload, headers=headers)
+        response.raise_for_status()
+
+        return response.json()
+
+    except httpx.HTTPStatusError as e:
+        print(f"PayHero initiation error: {e.response.text}")
+        return None
+    except httpx.HTTPError as e:
+        print(f"PayHero initiation error: {e}")
+        return None
+
+
+# --- EXTERNAL REFERENCES ---
+# kampus_koin-<deposit|repayment>-<goal or order id>-u<user id>-<timestamp>-<tail>,
+# and kampus_koin-split-<user id>-<timestamp>-<tail> for split deposits.
+# The callback has nothing else to go on, so they name the user, whose
+# ledger shard holds the rows (core/sharding.py). Older references don't.
+
+def payment_reference(kind, object_id, user_id, tail):
+    return f"kampus_koin-{kind}-{object_id}-u{user_id}-{int(timezone.now().timestamp())}-{tail}"
+
+
+def reference_owner_id(external_reference):
+    """The user id in a Kampus Koin reference, or None for an older one."""
+    parts = external_reference.split('-')
+    if len(parts) > 2 and parts[1] == 'split' and parts[2].isdigit():
+        return int(parts[2])
+    if len(parts) > 3 and parts[3][:1] == 'u' and parts[3][1:].isdigit():
+        return int(parts[3][1:])
+    return None
@@ -0,0 +1,135 @@
+# backend/finance/query_plans.py
+"""
+Query-plan checks for the hot lookups.
+
+HOT_QUERYSETS rebuilds, by name, the querysets the views, serializers and
+sync run on every request (the same filters and ordering, with sample
+values), and sequential_scans() runs EXPLAIN on each to find any table it
+reads in full. The check_query_plans command and QueryPlanTests fail on
+any such scan, so dropping or never adding the index a lookup relies on
+shows up before production does.
+
+PostgreSQL is checked with enable_seqscan off: on a small seeded table a
+sequential scan is cheapest even when a good index exists, but with it
+off the planner only picks one when there is no index it can use. SQLite
+never prefers a scan over a usable index. Other backends aren't supported.
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.db import connections
+from django.utils import timezone
+
+from users.models import User
+from .installments import due_between, overdue_orders
+from .models import (
+    ArchivedTransaction, CallbackForward, Goal, Installment, Order, Product, RecurringDeposit, SplitDeposit,
+    SyncTombstone, Transaction,
+)
+
+# name -> function of the sample values returning the queryset
+HOT_QUERYSETS = {
+    # PaymentCallbackView: plain, archived and split deposit references
+    'callback transaction': lambda s: Transaction.objects.filter(checkout_request_id=s.checkout_request_id),
+    'callback archived reference': lambda s: ArchivedTransaction.objects.filter(checkout_request_id=s.checkout_request_id),
+    'callback split deposit': lambda s: SplitDeposit.objects.filter(checkout_request_id=s.checkout_request_id),
+    'split deposit transactions': lambda s: Transaction.objects.filter(
+        checkout_request_id__in=[f"{s.checkout_request_id}-1", f"{s.checkout_request_id}-2"], status='pending',
+    ),
+    # VerifyPickupView
+    'pickup by QR code': lambda s: Order.objects.filter(pickup_qr_code=s.pickup_qr_code),
+    # Goal list, bootstrap, summary; DepositView's ownership check
+    'goals of user': lambda s: Goal.objects.filter(owner=s.user),
+    'goal of user': lambda s: Goal.objects.filter(id=s.goal.id, owner=s.user),
+    # OrderCreateView's goal selection
+    'funded goals of user': lambda s: Goal.objects.filter(owner=s.user, current_amount__gt=0).order_by('created_at'),
+    # OrderCreateView's duplicate check; ProductSerializer without a prefetched index
+    'order for user and product': lambda s: Order.objects.filter(user=s.user, product=s.product),
+    # Order list, bootstrap and sync
+    'orders of user': lambda s: Order.objects.filter(user=s.user).order_by('-order_date'),
+    'order of user': lambda s: Order.objects.filter(id=s.order.id, user=s.user),
+    # Repayment callbacks (installments.allocate_payment)
+    'unpaid installments of order': lambda s: Installment.objects.filter(order=s.order, status='PENDING').order_by('number'),
+    # installments.due_between: what's due this week across all orders
+    'installments due this week': lambda s: due_between(s.today, s.today + timedelta(days=7)),
+    # Transaction list (both tables)
+    'transactions of user': lambda s: Transaction.objects.filter(owner=s.user).order_by('-created_at'),
+    'archived transactions of user': lambda s: ArchivedTransaction.objects.filter(owner=s.user).order_by('-created_at'),
+    # Delta sync
+    'goals changed since': lambda s: Goal.objects.filter(owner=s.user, updated_at__gte=s.since),
+    'orders changed since': lambda s: Order.objects.filter(user=s.user, updated_at__gte=s.since),
+    'transactions changed since': lambda s: Transaction.objects.filter(owner=s.user, updated_at__gte=s.since),
+    'tombstones since': lambda s: SyncTombstone.objects.filter(owner=s.user, deleted_at__gte=s.since),
+    'recurring deposits of user': lambda s: RecurringDeposit.objects.filter(owner=s.user).order_by('next_run_at'),
+    # UserSerializer's unique phone number check
+    'user by phone number': lambda s: User.objects.filter(phone_number=s.phone_number),
+    # Workers: dispatch_recurring_deposits, send_repayment_reminders, forward_callbacks; the admin's stale-pending action
+    'due recurring deposits': lambda s: RecurringDeposit.objects.filter(is_active=True, next_run_at__lte=s.now),
+    'overdue orders to remind': lambda s: overdue_orders(s.today),
+    'due callback forwards': lambda s: CallbackForward.objects.filter(status='PENDING', next_attempt_at__lte=s.now),
+    'stale pending transactions': lambda s: Transaction.objects.filter(status='pending', created_at__lt=s.since),
+}
+
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\S+)')
+# "SCAN <table>" with no "USING ... INDEX" after it reads the whole table
+SQLITE_SEQ_SCAN = re.compile(r'\bSCAN (\S+)(?: AS \S+)?$')
+
+
+def sample_values():
+    """
+    Values to fill the lookups with, taken from the seeded rows where
+    there are any. Plans don't depend on them much, but real ones keep
+    PostgreSQL's estimates honest.
+    """
+    order = Order.objects.select_related('user', 'product').order_by('id').first()
+    user = order.user if order else User.objects.order_by('id').first() or User(id=0)
+    transaction = Transaction.objects.order_by('id').first()
+    now = timezone.now()
+    return SimpleNamespace(
+        user=user,
+        order=order or Order(id=0),
+        product=order.product if order else Product(id=0),
+        goal=Goal.objects.filter(owner=user).order_by('id').first() or Goal(id=0),
+        checkout_request_id=transaction.checkout_request_id if transaction else 'kampus_koin-deposit-0-0',
+        pickup_qr_code=order.pickup_qr_code if order else '00000000-0000-0000-0000-000000000000',
+        phone_number=user.phone_number or '0700000000',
+        now=now,
+        today=timezone.localdate(now),
+        since=now - timedelta(days=1),
+    )
+
+
+@contextmanager
+def _planner(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+    elif connection.vendor == 'sqlite':
+        yield
+    else:
+        raise NotImplementedError(f"Query plan checks don't support {connection.vendor}.")
+
+
+def sequential_scans(queryset):
+    """(tables read by a sequential scan, the plan) for `queryset`."""
+    connection = connections[queryset.db]
+    with _planner(connection):
+        plan = queryset.explain()
+    pattern = POSTGRES_SEQ_SCAN if connection.vendor == 'postgresql' else SQLITE_SEQ_SCAN
+    tables = sorted({match.group(1) for line in plan.splitlines() if (match := pattern.search(line.strip()))})
+    return tables, plan
+
+
+def check_hot_querysets(samples=None):
+    """Yields (name, seq-scanned tables, plan) for every hot queryset."""
+    samples = samples or sample_values()
+    for name, build in HOT_QUERYSETS.items():
+        yield (name, *sequential_scans(build(samples)))
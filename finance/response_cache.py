@@ -0,0 +1,156 @@
+# backend/finance/response_cache.py
+"""
+Per-user cached list responses.
+
+Each user has a version counter in the cache, bumped (on commit) whenever
+one of their goals, orders, transactions or their own profile changes;
+see signals.py. Cached responses and ETags are keyed by that version, so
+nothing is ever deleted: a bump simply makes the old entries unreachable.
+Shared data (the product catalog, which order lists nest) has its own
+counter.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from core.sharding import ledger_db
+from users.models import User
+
+VERSION_KEY = "resp_ver:{scope}"
+RESPONSE_KEY = "resp:{view}:{user_id}:{digest}"
+ACTIVE_KEY = "resp_active:{user_id}:{version}"
+
+
+def _user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1, so a counter that was evicted
+        # never repeats a version (and ETag) that clients already hold.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _after_commit(func, using):
+    """
+    Runs `func` once the transactions open on `using` and on 'default' have
+    both committed (at once where neither is open). Ledger rows may be
+    written to a shard while their user is on 'default'.
+    """
+    if using == 'default':
+        transaction.on_commit(func)
+    else:
+        transaction.on_commit(lambda: transaction.on_commit(func), using=using)
+
+
+def invalidate_user_responses(user_id, using=None):
+    """
+    Makes every cached list response for this user stale once the current
+    transaction commits (immediately outside one): the one on `using`, the
+    database the change was written to (by default the current ledger
+    shard), and on 'default'. Bumping earlier would let a concurrent read
+    re-cache the old rows under the new version.
+    """
+    _after_commit(lambda: bump_version(_user_scope(user_id)), using or ledger_db())
+
+
+def invalidate_shared_responses(scope):
+    _after_commit(lambda: bump_version(scope), 'default')
+
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match header lists `etag` (weak or strong) or is '*'."""
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+class CachedListMixin:
+    """
+    For per-user list views. GET responses are cached per user and query
+    string and carry an ETag; a matching If-None-Match gets a 304. Both
+    the 304 and a cache hit are answered from the cache alone: for GETs
+    the JWT is verified without loading the user, who is only fetched
+    when the list has to be rebuilt or their active flag isn't cached for
+    the current version.
+
+    `response_cache_scopes` names shared counters the response also
+    depends on, e.g. 'product' for lists that nest product details.
+    """
+    response_cache_scopes = ()
+
+    def get_authenticators(self):
+        # self.request is still the Django request here
+        if self.request.method in SAFE_METHODS:
+            return [JWTStatelessUserAuthentication()]
+        return super().get_authenticators()
+
+    def get(self, request, *args, **kwargs):
+        user_id = request.user.id
+        versions = [get_version(_user_scope(user_id))]
+        self.check_active(request, versions[0])
+        versions += [get_version(scope) for scope in self.response_cache_scopes]
+        view = type(self).__name__
+        digest = hashlib.sha1(
+            f"{view}:{user_id}:{versions}:{request.GET.urlencode()}".encode()
+        ).hexdigest()
+        etag = f'"{digest}"'
+
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = RESPONSE_KEY.format(view=view, user_id=user_id, digest=digest)
+            data = cache.get(key)
+            if data is None:
+                self.load_user(request)
+                response = super().get(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        # Per-user data: browsers may keep it, shared caches must not
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def check_active(self, request, version):
+        # The stateless JWT says nothing about is_active. The answer is kept
+        # until the user's version moves, which saving or deleting them does.
+        key = ACTIVE_KEY.format(user_id=request.user.id, version=version)
+        if cache.get(key) is None:
+            self.load_user(request)
+            cache.set(key, 1, settings.RESPONSE_CACHE_TIMEOUT)
+
+    def load_user(self, request):
+        if isinstance(request.user, User):
+            return
+        try:
+            user = User.objects.get(pk=request.user.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        request.user = user
@@ -1,11 +1,18 @@
 # backend/finance/serializers.py
 
+from decimal import Decimal
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Goal, Transaction, Product, Order
+from core.serializers import SparseFieldsetsMixin
+from users.serializers import UserSerializer
+from .models import Goal, Transaction, Product, Order, RecurringDeposit
 
 # --- SERIALIZER FOR LISTING GOALS (FIXED) ---
 # We removed 'read_only_fields' so current_amount is always sent
-class GoalSerializer(serializers.ModelSerializer):
+class GoalSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    expandable_fields = {'owner': (UserSerializer, {})}
+
     class Meta:
         model = Goal
         fields = ['id', 'owner', 'name', 'target_amount', 'current_amount', 'created_at']
@@ -17,7 +24,9 @@ class GoalCreateSerializer(serializers.ModelSerializer):
         fields = ['name', 'target_amount']
 
 # --- TRANSACTION SERIALIZER (FIXED) ---
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    expandable_fields = {'goal': (GoalSerializer, {})}
+
     class Meta:
         model = Transaction
         # Added 'order' and 'transaction_type'
@@ -27,7 +36,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         ]
 
 # --- PRODUCT SERIALIZER (Correct) ---
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     is_unlocked = serializers.SerializerMethodField()
     is_already_unlocked = serializers.SerializerMethodField()
     active_order = serializers.SerializerMethodField()
@@ -47,6 +56,11 @@ class ProductSerializer(serializers.ModelSerializer):
         return user.koin_score >= obj.required_koin_score
 
     def get_is_already_unlocked(self, obj):
+        # Preloaded by views that serialize many products (see index_orders_by_product)
+        orders_by_product = self.context.get('orders_by_product')
+        if orders_by_product is not None:
+            return obj.id in orders_by_product
+
         # Local import to avoid circular error
         from .models import Order 
         user = self.context['request'].user
@@ -67,16 +81,27 @@ class ProductSerializer(serializers.ModelSerializer):
         if not user or not user.is_authenticated:
             return None
 
-        order = Order.objects.filter(user=user, product=obj).first()
+        orders_by_product = self.context.get('orders_by_product')
+        if orders_by_product is not None:
+            order = orders_by_product.get(obj.id)
+        else:
+            order = Order.objects.filter(user=user, product=obj).first()
         
         if order:
             # 2. Create a context that says "Don't fetch active_order again"
             nested_context = self.context.copy()
             nested_context['skip_active_order'] = True
-            
+            # Lets ?fields=active_order.product.name reach the nested product
+            nested_context['sparse_path'] = self.sparse_path() + ['active_order', 'product']
+
             # 3. Serialize the nested product fully using THIS serializer
             # This ensures 'id', 'price', 'vendor_name' etc are all present and correct.
-            product_data = ProductSerializer(obj, context=nested_context).data
+            # (Skipped when ?fields= asks for active_order without its product.)
+            only, _ = self._sparse_specs()
+            if only and only.get('active_order') and 'product' not in only['active_order']:
+                product_data = None
+            else:
+                product_data = ProductSerializer(obj, context=nested_context).data
 
             return {
                 'id': order.id,
@@ -91,9 +116,39 @@ class ProductSerializer(serializers.ModelSerializer):
             }
         return None
     
+def index_orders_by_product(orders):
+    """
+    Maps product id -> the user's order for it, for the 'orders_by_product'
+    serializer context. Lets ProductSerializer (and OrderSerializer, which
+    nests it) answer is_already_unlocked/active_order without a query per
+    product. Like the per-product lookup, the oldest order wins.
+    """
+    orders_by_product = {}
+    for order in sorted(orders, key=lambda order: order.id):
+        orders_by_product.setdefault(order.product_id, order)
+    return orders_by_product
+
 class FCMTokenSerializer(serializers.Serializer):
     fcm_token = serializers.CharField(max_length=255)    
 
+# --- SPLIT DEPOSIT SERIALIZERS ---
+class DepositAllocationSerializer(serializers.Serializer):
+    goal_id = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('1.00'))
+
+
+class SplitDepositSerializer(serializers.Serializer):
+    allocations = DepositAllocationSerializer(many=True)
+
+    def validate_allocations(self, value):
+        if len(value) < 2:
+            raise serializers.ValidationError("Split a deposit across at least two goals.")
+        if len(value) > settings.SPLIT_DEPOSIT_MAX_GOALS:
+            raise serializers.ValidationError(f"A deposit can be split across at most {settings.SPLIT_DEPOSIT_MAX_GOALS} goals.")
+        if len({allocation['goal_id'] for allocation in value}) != len(value):
+            raise serializers.ValidationError("Each goal can only appear once.")
+        return value
+
 # --- ORDER CREATE SERIALIZER (Correct) ---
 class OrderCreateSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
@@ -104,12 +159,37 @@ class OrderCreateSerializer(serializers.Serializer):
         return value
 
 # --- ORDER SERIALIZER (Correct) ---
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     product = ProductSerializer()
+    expandable_fields = {'user': (UserSerializer, {})}
   
     class Meta:
         model = Order
         fields = [
             'id', 'user', 'product', 'total_amount', 'down_payment', 
             'amount_financed','amount_paid', 'status', 'order_date','pickup_qr_code'
-        ]
\ No newline at end of file
+        ]
+
+# --- RECURRING DEPOSIT SERIALIZER ---
+class RecurringDepositSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = RecurringDeposit
+        fields = ['id', 'goal', 'amount', 'frequency', 'next_run_at', 'last_run_at', 'is_active', 'created_at']
+        read_only_fields = ['last_run_at', 'created_at']
+
+    def validate_goal(self, value):
+        user = self.context['request'].user
+        if value.owner_id != user.id:
+            raise serializers.ValidationError("Goal not found or does not belong to user.")
+        return value
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be greater than zero.")
+        return value
+
+    def update(self, instance, validated_data):
+        if 'next_run_at' in validated_data:
+            # A new start date moves the day monthly runs fall on (see save())
+            instance.day_of_month = None
+        return super().update(instance, validated_data)
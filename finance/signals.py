@@ -0,0 +1,81 @@
+# backend/finance/signals.py
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from core.sharding import is_sharded, ledger_shards, reserve_id_range
+from .models import ArchivedTransaction, Goal, Order, Product, SyncTombstone, Transaction, User
+from .response_cache import invalidate_shared_responses, invalidate_user_responses
+
+
+# --- SYNC TOMBSTONES ---
+# These also fire for cascaded deletes (e.g. a goal taking its transactions
+# with it), so the client hears about every row it should drop.
+
+def _deleting_user(origin):
+    # When the user account itself is going, there's no client left to sync
+    # and the tombstone would point at a user row that is about to vanish.
+    if isinstance(origin, QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+def _record_tombstone(owner_id, kind, object_id, origin):
+    if _deleting_user(origin):
+        return
+    SyncTombstone.objects.create(owner_id=owner_id, kind=kind, object_id=object_id)
+
+
+@receiver(post_delete, sender=Goal)
+def record_goal_tombstone(sender, instance, origin=None, **kwargs):
+    _record_tombstone(instance.owner_id, 'goal', instance.pk, origin)
+
+
+@receiver(post_delete, sender=Order)
+def record_order_tombstone(sender, instance, origin=None, **kwargs):
+    _record_tombstone(instance.user_id, 'order', instance.pk, origin)
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=ArchivedTransaction)
+def record_transaction_tombstone(sender, instance, origin=None, **kwargs):
+    _record_tombstone(instance.owner_id, 'transaction', instance.pk, origin)
+
+
+# --- CACHED LIST RESPONSES (see response_cache.py) ---
+# Queryset .update() and bulk_create() skip these; code that uses them
+# calls invalidate_user_responses itself. (Archiving skips them on purpose:
+# moving a row to ArchivedTransaction doesn't change any response.)
+
+@receiver([post_save, post_delete], sender=Goal)
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver(post_delete, sender=ArchivedTransaction)
+def invalidate_owner_responses(sender, instance, using, **kwargs):
+    invalidate_user_responses(instance.owner_id, using)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_order_user_responses(sender, instance, using, **kwargs):
+    invalidate_user_responses(instance.user_id, using)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_profile_responses(sender, instance, using, **kwargs):
+    # Product entries nested in orders depend on the user's koin score, and
+    # cached responses are only served to active users (check_active)
+    invalidate_user_responses(instance.pk, using)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    invalidate_shared_responses('product')
+
+
+# --- LEDGER SHARDS (see core/sharding.py) ---
+
+@receiver(post_migrate)
+def reserve_shard_id_ranges(sender, using, **kwargs):
+    # Every shard hands out its own ids, so rows can move between shards
+    if sender.name == 'finance' and using in ledger_shards():
+        reserve_id_range(using, [model for model in sender.get_models() if is_sharded(model)])
@@ -0,0 +1,138 @@
+# backend/finance/summary.py
+
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Goal
+
+SUMMARY_CACHE_KEY = "goal_summary:{user_id}"
+CENTS = Decimal('0.01')
+
+
+def _summary_cache_key(user_id):
+    return SUMMARY_CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_goal_summary(user_id):
+    """
+    Drops the cached dashboard for a user. Call this whenever their goals
+    or completed deposits change.
+    """
+    cache.delete(_summary_cache_key(user_id))
+
+
+def _project_completion(remaining, deposited_30d, deposited_90d, today):
+    """
+    Projects when `remaining` will be saved at the user's recent pace.
+    Prefers the last 30 days; falls back to the 90 day pace if there were
+    no deposits in the last month. Returns None if there is no pace at all.
+    """
+    if remaining <= 0:
+        return None
+
+    if deposited_30d > 0:
+        daily_rate = deposited_30d / 30
+    elif deposited_90d > 0:
+        daily_rate = deposited_90d / 90
+    else:
+        return None
+
+    days_left = int((remaining / daily_rate).to_integral_value(rounding=ROUND_CEILING))
+    return (today + timedelta(days=days_left)).isoformat()
+
+
+def _money(value):
+    # Match the 2dp strings DRF returns for DecimalFields
+    return str(value.quantize(CENTS))
+
+
+def _progress(current, target):
+    if target <= 0:
+        return 100.0
+    return round(float(min(current / target, Decimal('1')) * 100), 2)
+
+
+def build_goal_summary(user):
+    """
+    Builds the savings dashboard for a user with a single aggregate query:
+    every goal row is annotated with its completed deposits in the last
+    30 and 90 days, and the totals are folded up in Python.
+    """
+    now = timezone.now()
+    deposits = Q(transaction__status='completed', transaction__transaction_type='DEPOSIT')
+
+    rows = (
+        Goal.objects.filter(owner=user)
+        .annotate(
+            deposited_30d=Sum(
+                'transaction__amount',
+                filter=deposits & Q(transaction__transaction_date__gte=now - timedelta(days=30)),
+            ),
+            deposited_90d=Sum(
+                'transaction__amount',
+                filter=deposits & Q(transaction__transaction_date__gte=now - timedelta(days=90)),
+            ),
+        )
+        .order_by('created_at')
+        .values('id', 'name', 'target_amount', 'current_amount', 'deposited_30d', 'deposited_90d')
+    )
+
+    today = now.date()
+    zero = Decimal('0.00')
+    total_saved = total_target = total_30d = total_90d = zero
+    goals = []
+
+    for row in rows:
+        current = row['current_amount']
+        target = row['target_amount']
+        deposited_30d = row['deposited_30d'] or zero
+        deposited_90d = row['deposited_90d'] or zero
+
+        total_saved += current
+        total_target += target
+        total_30d += deposited_30d
+        total_90d += deposited_90d
+
+        goals.append({
+            'id': row['id'],
+            'name': row['name'],
+            'target_amount': _money(target),
+            'current_amount': _money(current),
+            'progress': _progress(current, target),
+            'deposited_30d': _money(deposited_30d),
+            'deposited_90d': _money(deposited_90d),
+            'projected_completion_date': _project_completion(
+                target - current, deposited_30d, deposited_90d, today
+            ),
+        })
+
+    return {
+        'total_saved': _money(total_saved),
+        'total_target': _money(total_target),
+        'overall_progress': _progress(total_saved, total_target),
+        'deposit_velocity': {
+            'last_30_days': _money(total_30d),
+            'last_90_days': _money(total_90d),
+        },
+        'projected_completion_date': _project_completion(
+            total_target - total_saved, total_30d, total_90d, today
+        ),
+        'goals': goals,
+    }
+
+
+def get_goal_summary(user):
+    """
+    Returns the cached dashboard for a user, building it on a cache miss.
+    """
+    key = _summary_cache_key(user.id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_goal_summary(user)
+        cache.set(key, summary, settings.GOAL_SUMMARY_CACHE_TIMEOUT)
+    return summary
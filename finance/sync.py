@@ -0,0 +1,76 @@
+# backend/finance/sync.py
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.sharding import select_related_across
+from .archive import history_querysets, newest_first
+from .models import Goal, Order, SyncTombstone
+from .serializers import GoalSerializer, OrderSerializer, TransactionSerializer, index_orders_by_product
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_sync_token(moment):
+    # Opaque to the client: microseconds since the epoch
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_sync_token(token):
+    try:
+        return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise InvalidSyncToken(token)
+
+
+def build_sync_payload(request, token=None):
+    """
+    Returns the goals, orders and transactions that changed since `token`,
+    plus the ids of any that were deleted. With no token, or one older than
+    the tombstone retention window, everything is returned with `full` set
+    so the client replaces its local copy instead of merging.
+
+    The next token is taken slightly before "now" so rows committed by
+    in-flight requests are not missed; the client may see a few rows twice
+    and should upsert by id.
+    """
+    user = request.user
+    now = timezone.now()
+
+    since = decode_sync_token(token) if token else None
+    if since and since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        since = None
+
+    goals = Goal.objects.filter(owner=user).order_by('created_at')
+    orders = select_related_across(Order.objects.filter(user=user), 'product').order_by('-order_date')
+    hot_transactions, archived_transactions = history_querysets(user)
+    deleted = {'goals': [], 'orders': [], 'transactions': []}
+
+    if since:
+        goals = goals.filter(updated_at__gte=since)
+        orders = orders.filter(updated_at__gte=since)
+        # Archived rows are older than any accepted token (see archive.py)
+        transactions = hot_transactions.filter(updated_at__gte=since)
+
+        tombstones = SyncTombstone.objects.filter(owner=user, deleted_at__gte=since)
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            deleted[f"{kind}s"].append(object_id)
+    else:
+        transactions = list(newest_first(hot_transactions, archived_transactions))
+
+    # Each product has at most one order per user, so the orders being sent
+    # are enough to answer the nested products' active_order lookups.
+    orders = list(orders)
+    context = {'request': request, 'orders_by_product': index_orders_by_product(orders)}
+    return {
+        'sync_token': encode_sync_token(now - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)),
+        'full': since is None,
+        'goals': GoalSerializer(goals, many=True, context=context).data,
+        'orders': OrderSerializer(orders, many=True, context=context).data,
+        'transactions': TransactionSerializer(transactions, many=True, context=context).data,
+        'deleted': deleted,
+    }
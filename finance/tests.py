@@ -1,3 +1,1833 @@
-from django.test import TestCase
+import runpy
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import db_router, sharding, warmup
+from core.checks import check_shared_cache
+from core.benchmarks import RUN_BENCHMARKS, Scenario, check_scenarios, seed_benchmark_data, uncovered_url_names
+from core.fast_serializers import ValuesSerializer
+from core.pagination import EstimatedCountPaginator
+from core.renderers import FastJSONRenderer
+from users.models import User
+from .models import (
+    ArchivedTransaction, CallbackForward, Goal, Installment, Order, Product, ProfileReport, RecurringDeposit,
+    RepaymentReminder, SplitDeposit, SyncTombstone, Transaction, VendorPayout,
+)
+from .analytics import compute_savings_stats
+from .async_views import AsyncJSONView
+from .installments import due_between, split_amount
+from .management.commands.dispatch_recurring_deposits import Command as DispatchRecurringDepositsCommand
+from .management.commands.rebalance_shards import move_user
+from .payhero_utils import payment_reference, reference_owner_id
+from .serializers import GoalSerializer, ProductSerializer, TransactionSerializer
+from .sync import decode_sync_token, encode_sync_token
+from .query_plans import check_hot_querysets, sequential_scans
+from .response_cache import get_version, invalidate_user_responses
+from .throttling import PayHeroThrottle, TokenBucketThrottle
+from .velocity import SlidingWindowCounter
+from .urls import urlpatterns
+from .views import GoalListCreateView, GoalSummaryView, OrderListView, SyncView, TransactionListView
+
+
+def make_user(email='student@example.com', **extra):
+    return User.objects.create_user(username=email, email=email, password='pass1234', name='Student', **extra)
+
+
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+class BootstrapViewTests(TestCase):
+    # Read-only views may be routed to the replica (core/db_router.py)
+    databases = '__all__'
+
+    # auth user, orders (with products), goals, products, recent transactions
+    # (hot and archived)
+    QUERY_BUDGET = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(koin_score=5000)
+        cls.products = [
+            Product.objects.create(name=f"Item {i}", description="", price=Decimal('1000.00'), vendor_name="Vendor")
+            for i in range(8)
+        ]
+        for product in cls.products[:3]:
+            Order.objects.create(
+                user=cls.user, product=product, total_amount=product.price,
+                down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+            )
+        goals = [
+            Goal.objects.create(owner=cls.user, name=f"Goal {i}", target_amount=Decimal('5000.00'))
+            for i in range(4)
+        ]
+        for i in range(30):
+            Transaction.objects.create(
+                owner=cls.user, goal=goals[i % 4], amount=Decimal('100.00'), checkout_request_id=f"ref-{i}",
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def test_query_budget_is_fixed(self):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get('/api/finance/bootstrap/')
+        self.assertEqual(response.status_code, 200)
+
+        # More products and orders must not cost more queries
+        for product in self.products[3:6]:
+            Order.objects.create(
+                user=self.user, product=product, total_amount=product.price,
+                down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+            )
+        Product.objects.create(name="Extra", description="", price=Decimal('10.00'))
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            self.client.get('/api/finance/bootstrap/')
+
+    @override_settings(BOOTSTRAP_RECENT_TRANSACTIONS=10)
+    def test_recent_transactions_are_capped(self):
+        data = self.client.get('/api/finance/bootstrap/').json()
+        self.assertEqual(len(data['transactions']), 10)
+        self.assertEqual(data['transactions'][0]['id'], Transaction.objects.latest('created_at').id)
+
+    def test_matches_individual_endpoints(self):
+        data = self.client.get('/api/finance/bootstrap/').json()
+
+        self.assertEqual(data['user'], self.client.get('/api/users/me/').json())
+        self.assertEqual(data['goals'], self.client.get('/api/finance/goals/').json())
+        self.assertEqual(data['orders'], self.client.get('/api/finance/orders/').json())
+        self.assertEqual(data['products'], self.client.get('/api/finance/products/').json())
+
+
+class ResponseCacheTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(koin_score=5000)
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+        cls.product = Product.objects.create(name="Phone", description="", price=Decimal('1000.00'), vendor_name="Vendor")
+        Order.objects.create(
+            user=cls.user, product=cls.product, total_amount=cls.product.price,
+            down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def test_repeat_requests_skip_the_database(self):
+        for url in ('/api/finance/goals/', '/api/finance/orders/', '/api/finance/transactions/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(cached.json(), first.json())
+            self.assertEqual(cached['ETag'], first['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+
+    def test_etags_are_per_user(self):
+        other = make_user('other@example.com')
+        mine = self.client.get('/api/finance/goals/')
+        theirs = jwt_client(other).get('/api/finance/goals/', HTTP_IF_NONE_MATCH=mine['ETag'])
+        self.assertEqual(theirs.status_code, 200)
+        self.assertEqual(theirs.json(), [])
+
+    def test_if_none_match_compares_whole_tags(self):
+        etag = self.client.get('/api/finance/goals/')['ETag']
+        for header, expected in [
+            (etag, 304), (f'"other", W/{etag}', 304), ('*', 304),
+            (f'"x{etag[1:-1]}x"', 200), (f'"{etag}"', 200),
+        ]:
+            self.assertEqual(self.client.get('/api/finance/goals/', HTTP_IF_NONE_MATCH=header).status_code, expected, header)
+
+    def test_deactivated_user_gets_no_cached_responses(self):
+        etag = self.client.get('/api/finance/goals/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(id=self.user.id)
+            user.is_active = False
+            user.save()
+        self.assertEqual(self.client.get('/api/finance/goals/').status_code, 401)
+        self.assertEqual(self.client.get('/api/finance/goals/', HTTP_IF_NONE_MATCH=etag).status_code, 401)
+
+    def test_writes_invalidate(self):
+        etag = self.client.get('/api/finance/goals/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/finance/goals/', {'name': "Bike", 'target_amount': '800.00'}, format='json')
+
+        response = self.client.get('/api/finance/goals/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_payment_callback_invalidates_transactions(self):
+        Transaction.objects.create(
+            owner=self.user, goal=self.goal, amount=Decimal('100.00'), checkout_request_id="kampus_koin-deposit-1-cb",
+        )
+        self.assertEqual(self.client.get('/api/finance/transactions/').json()[0]['status'], 'pending')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/api/finance/payment-callback/', {'response': {
+                'ExternalReference': f"kampus_koin-deposit-{self.goal.id}-cb", 'ResultCode': 0, 'Status': 'Success',
+                'Amount': 100, 'MpesaReceiptNumber': "CACHE1",
+            }}, format='json')
+        self.assertEqual(self.client.get('/api/finance/transactions/').json()[0]['status'], 'completed')
+
+    def test_product_changes_invalidate_orders(self):
+        self.client.get('/api/finance/orders/')
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(id=self.product.id)
+            product.name = "Phone 2"
+            product.save()
+        self.assertEqual(self.client.get('/api/finance/orders/').json()[0]['product']['name'], "Phone 2")
+
+
+class SparseFieldsetTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(koin_score=5000)
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+        cls.product = Product.objects.create(name="Phone", description="", price=Decimal('1000.00'), vendor_name="Vendor")
+        order = Order.objects.create(
+            user=cls.user, product=cls.product, total_amount=cls.product.price,
+            down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+        )
+        Transaction.objects.create(
+            owner=cls.user, goal=cls.goal, order=order, amount=Decimal('250.00'), status='COMPLETED',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def test_fields_limit_output(self):
+        goals = self.client.get('/api/finance/goals/?fields=id,name').json()
+        self.assertEqual(goals, [{'id': self.goal.id, 'name': "Laptop"}])
+
+    def test_dotted_fields_reach_nested_objects(self):
+        products = self.client.get('/api/finance/products/?fields=id,active_order.status,active_order.product.name').json()
+        self.assertEqual(products, [{
+            'id': self.product.id,
+            'active_order': {'status': Order.objects.get().status, 'product': {'name': "Phone"}},
+        }])
+
+        orders = self.client.get('/api/finance/orders/?fields=product.price').json()
+        self.assertEqual(orders, [{'product': {'price': '1000.00'}}])
+
+    def test_expand_replaces_ids(self):
+        with self.assertNumQueries(3):  # the user, transactions and archived ones, each with goal and owner
+            transactions = self.client.get('/api/finance/transactions/?expand=goal.owner&fields=goal').json()
+        goal = transactions[0]['goal']
+        self.assertEqual(goal['name'], "Laptop")
+        self.assertEqual(goal['owner']['email'], self.user.email)
+        self.assertNotIn('password', goal['owner'])
+
+    def test_unchanged_without_parameters(self):
+        full = self.client.get('/api/finance/transactions/').json()
+        self.assertEqual(full[0]['goal'], self.goal.id)
+        self.assertEqual(self.client.get('/api/finance/transactions/?fields=nonsense').json(), [{}])
+
+    def test_bootstrap_sections(self):
+        payload = self.client.get('/api/finance/bootstrap/?fields=goals.name,user.email').json()
+        self.assertEqual(payload, {'user': {'email': self.user.email}, 'goals': [{'name': "Laptop"}]})
+
+    def test_fast_renderer_matches_drf(self):
+        data = {
+            'when': timezone.now(),
+            'day': timezone.now().date(),
+            'amount': Decimal('12.50'),
+            'text': "Jos\u00e9 \u2028 \U0001f600",
+            'id': uuid.uuid4(),
+            'nested': [{'a': None, 'b': True, 'c': 1.5}],
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class ValuesSerializerTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.goal = Goal.objects.create(
+            owner=cls.user, name="Fees \u2028 \u00e9", target_amount=Decimal('5000'), current_amount=Decimal('12.5'),
+        )
+        Goal.objects.create(owner=cls.user, name="Empty", target_amount=Decimal('0.01'))
+        Transaction.objects.create(
+            owner=cls.user, goal=cls.goal, amount=Decimal('250.00'), status='completed',
+            mpesa_receipt_number='ABC123', transaction_date=timezone.now(), checkout_request_id='values-1',
+        )
+        # Pending: nulls everywhere
+        Transaction.objects.create(owner=cls.user, transaction_type='REPAYMENT', checkout_request_id='values-2')
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def assert_same_bytes(self, serializer_class, queryset, fields=None):
+        expected = serializer_class(queryset, many=True).data
+        if fields is not None:
+            expected = [{name: row[name] for name in row if name in fields} for row in expected]
+        actual = ValuesSerializer(serializer_class).serialize(queryset, fields=fields)
+        self.assertEqual(FastJSONRenderer().render(actual), FastJSONRenderer().render(expected))
+
+    def test_matches_model_serializers(self):
+        self.assert_same_bytes(GoalSerializer, Goal.objects.order_by('id'))
+        self.assert_same_bytes(TransactionSerializer, Transaction.objects.order_by('id'))
+        self.assert_same_bytes(TransactionSerializer, Transaction.objects.order_by('id'), fields={'amount', 'id'})
+        with timezone.override('Africa/Nairobi'):
+            self.assert_same_bytes(TransactionSerializer, Transaction.objects.order_by('id'))
+
+    def test_rejects_computed_fields(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(ProductSerializer).compile()
+
+    def test_list_views_skip_model_instances(self):
+        # The user, then the list (transactions also read the archive)
+        for url, queries in (('/api/finance/goals/', 2), ('/api/finance/transactions/', 3)):
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_expand_falls_back_to_serializer(self):
+        response = self.client.get('/api/finance/transactions/?expand=goal&fields=goal.name')
+        self.assertCountEqual(response.json(), [{'goal': {'name': self.goal.name}}, {'goal': None}])
+
+
+class TransactionArchiveTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+        now = timezone.now()
+        cls.old = now - timedelta(days=400)
+
+        def tx(ref, status, created_at):
+            return Transaction.objects.create(
+                owner=cls.user, goal=cls.goal, amount=Decimal('100.00'), status=status,
+                checkout_request_id=ref, mpesa_receipt_number=ref if status == 'completed' else None,
+                transaction_date=created_at,
+            )
+
+        cls.settled = [tx(f'kampus_koin-deposit-{cls.goal.id}-old{i}', 'completed', cls.old) for i in range(3)]
+        cls.failed = tx('old-failed', 'failed', cls.old)
+        cls.stale_pending = tx('old-pending', 'pending', cls.old)
+        cls.recent = tx('recent', 'completed', now)
+        # Created and last touched long ago, but interleaved in time
+        for offset, row in enumerate([*cls.settled, cls.failed, cls.stale_pending]):
+            stamp = cls.old + timedelta(days=offset)
+            Transaction.objects.filter(pk=row.pk).update(created_at=stamp, updated_at=stamp)
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_transactions', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_only_old_settled_rows(self):
+        self.assertIn("Archived 4 transactions", self.archive('--batch-size', '2'))
+
+        self.assertCountEqual(
+            Transaction.objects.values_list('checkout_request_id', flat=True), ['old-pending', 'recent'],
+        )
+        archived = ArchivedTransaction.objects.get(checkout_request_id='old-failed')
+        self.assertEqual((archived.id, archived.status), (self.failed.id, 'failed'))
+        # Moving isn't deleting: clients must not be told to drop anything
+        self.assertFalse(SyncTombstone.objects.exists())
+        self.assertIn("Archived 0 transactions", self.archive())
+
+    def test_history_reads_look_the_same(self):
+        before = {
+            url: self.client.get(url).content
+            for url in ('/api/finance/transactions/', '/api/finance/transactions/?expand=goal')
+        }
+        full_sync = self.client.get('/api/finance/sync/').json()['transactions']
+
+        self.archive()
+        cache.clear()
+
+        for url, content in before.items():
+            self.assertEqual(self.client.get(url).content, content)
+        self.assertEqual(self.client.get('/api/finance/sync/').json()['transactions'], full_sync)
+        recent = self.client.get('/api/finance/bootstrap/?fields=transactions').json()['transactions']
+        self.assertEqual(len(recent), 6)
+
+    def test_refuses_ages_inside_the_sync_window(self):
+        with self.assertRaises(CommandError):
+            self.archive('--older-than-days', '7')
+
+    def test_late_callback_for_archived_reference_is_ignored(self):
+        self.archive()
+        reference = self.settled[0].checkout_request_id
+        APIClient().post('/api/finance/payment-callback/', {
+            'response': {'ExternalReference': reference, 'ResultCode': 0, 'Status': 'Success',
+                         'Amount': 100, 'MpesaReceiptNumber': reference},
+        }, format='json')
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.current_amount, Decimal('0.00'))
+        self.assertFalse(Transaction.objects.filter(checkout_request_id=reference).exists())
+
+    def test_deleting_goal_tombstones_archived_rows(self):
+        self.archive()
+        self.goal.delete()
+        self.assertEqual(SyncTombstone.objects.filter(kind='transaction').count(), 6)
+
+
+# The admin only browses the ledger rows on 'default'
+@override_settings(LEDGER_SHARDS=['default'])
+class AdminTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='pass1234', name='Admin',
+        )
+        cls.product = Product.objects.create(name="Laptop", description="x", price=Decimal('1000.00'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin_user)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            user = make_user(f'{uuid.uuid4().hex[:8]}@example.com')
+            goal = Goal.objects.create(owner=user, name="Laptop", target_amount=Decimal('500.00'))
+            order = Order.objects.create(
+                user=user, product=self.product, total_amount=Decimal('1000.00'),
+                down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+            )
+            VendorPayout.objects.create(order=order, vendor_name="Campus Store", amount=Decimal('1000.00'))
+            Transaction.objects.create(owner=user, goal=goal, checkout_request_id=uuid.uuid4().hex)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [
+            '/admin/finance/goal/', '/admin/finance/transaction/', '/admin/finance/order/',
+            '/admin/finance/vendorpayout/', '/admin/finance/transaction/?status__exact=pending&stale=yes',
+        ]
+        self.add_rows(2)
+        few = [self.changelist_queries(url) for url in urls]
+        self.add_rows(8)
+        self.assertEqual([self.changelist_queries(url) for url in urls], few)
+
+    def test_change_form_uses_autocomplete(self):
+        self.add_rows(1)
+        tx = Transaction.objects.get()
+        response = self.client.get(f'/admin/finance/transaction/{tx.id}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-field-name="goal"')
+
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'finance', 'model_name': 'transaction', 'field_name': 'goal', 'term': 'Laptop',
+        })
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_fail_stale_pending_action(self):
+        user = make_user()
+        old = timezone.now() - timedelta(hours=3)
+        stale = Transaction.objects.create(owner=user, checkout_request_id='stale')
+        fresh = Transaction.objects.create(owner=user, checkout_request_id='fresh')
+        done = Transaction.objects.create(owner=user, checkout_request_id='done', status='completed')
+        Transaction.objects.filter(id__in=[stale.id, done.id]).update(created_at=old, updated_at=old)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/finance/transaction/', {
+                'action': 'fail_stale_pending', '_selected_action': [stale.id, fresh.id, done.id],
+            })
+        self.assertEqual(response.status_code, 302)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        # Picked up by the next delta sync
+        self.assertGreater(stale.updated_at, old)
+        self.assertEqual(Transaction.objects.get(id=fresh.id).status, 'pending')
+        self.assertEqual(Transaction.objects.get(id=done.id).status, 'completed')
+
+        response = self.client.get('/admin/finance/transaction/', {'stale': 'yes'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_estimated_count_only_above_limit(self):
+        self.add_rows(3)
+        queryset = Transaction.objects.order_by('id')
+        with mock.patch('core.pagination.estimated_count', return_value=50000):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 50000)
+        with mock.patch('core.pagination.estimated_count', return_value=40):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 3)
+        # SQLite has no planner estimate
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 3)
+
+
+class HealthCheckTests(TestCase):
+    databases = '__all__'
+
+    def test_healthz(self):
+        response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_warms_up_first(self):
+        with mock.patch.object(warmup, '_warm', threading.Event()) as warm:
+            response = self.client.get('/readyz')
+            self.assertTrue(warm.is_set())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ready'})
+
+    def test_readyz_fails_without_database(self):
+        broken = mock.MagicMock()
+        broken.__getitem__.return_value.cursor.side_effect = OperationalError("connection refused")
+        with mock.patch.object(warmup, 'connections', broken):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(LEDGER_SHARDS=['default', 'shard1'])
+    def test_readyz_fails_without_a_shard(self):
+        working = mock.MagicMock()
+        broken = mock.MagicMock()
+        broken.cursor.side_effect = OperationalError("connection refused")
+        databases = mock.MagicMock()
+        databases.__getitem__.side_effect = lambda alias: broken if alias == 'shard1' else working
+        warm = threading.Event()
+        warm.set()
+        with mock.patch.object(warmup, '_warm', warm), mock.patch.object(warmup, 'connections', databases):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual([call.args[0] for call in databases.__getitem__.call_args_list], ['default', 'shard1'])
+
+    def test_failing_step_does_not_stop_warmup(self):
+        steps = [('broken', mock.Mock(side_effect=RuntimeError)), ('ok', mock.Mock())]
+        with mock.patch.object(warmup, '_warm', threading.Event()) as warm, \
+                mock.patch.object(warmup, 'WARMUP_STEPS', steps):
+            warmup.warm_up()
+        steps[1][1].assert_called_once()
+        self.assertTrue(warm.is_set())
+
+
+class MetricsTests(TestCase):
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_exposition(self):
+        self.client.get('/healthz')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version='))
+        body = response.content.decode()
+        self.assertIn('kampus_request_duration_seconds_count{method="GET",status="200",view="healthz"}', body)
+        self.assertIn('kampus_request_db_queries_bucket{le="0.0",view="healthz"}', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True)
+    def test_open_in_debug_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('staff@example.com', is_staff=True)
+
+    def test_staff_only(self):
+        response = jwt_client(make_user()).get('/api/finance/goals/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Report', response)
+        self.assertFalse(ProfileReport.objects.exists())
+
+        response = APIClient().get('/api/finance/goals/', HTTP_X_PROFILE='return')
+        self.assertEqual(response.status_code, 401)
+
+    def test_staff_report_is_stored(self):
+        response = jwt_client(self.staff).get('/api/finance/goals/', HTTP_X_PROFILE='1')
+        report = ProfileReport.objects.get()
+        self.assertEqual(response['X-Profile-Report'], str(report.id))
+        self.assertEqual(
+            (report.method, report.path, report.view, report.status_code, report.profiler),
+            ('GET', '/api/finance/goals/', 'GoalListCreateView', 200, 'cProfile'),
+        )
+        self.assertEqual(report.user_id, self.staff.id)
+        self.assertEqual(report.query_count, len(report.queries))
+
+    def test_return_mode_replies_with_report(self):
+        response = jwt_client(self.staff).get('/api/finance/goals/?profile=return')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertTrue(response.content.decode().startswith('GET /api/finance/goals/?profile=return -> 200'))
+        self.assertFalse(ProfileReport.objects.exists())
+
+    @override_settings(PROFILE_REPORT_LIMIT=2)
+    def test_reports_are_capped(self):
+        client = jwt_client(self.staff)
+        ids = [int(client.get('/api/finance/goals/', HTTP_X_PROFILE='1')['X-Profile-Report']) for _ in range(3)]
+        self.assertEqual(sorted(ProfileReport.objects.values_list('id', flat=True)), ids[1:])
+
+
+class QueryPlanTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        user = make_user(phone_number='0712345678')
+        product = Product.objects.create(name="Laptop", description="x", price=Decimal('1000.00'))
+        goal = Goal.objects.create(owner=user, name="Laptop", target_amount=Decimal('500.00'))
+        Order.objects.create(
+            user=user, product=product, total_amount=Decimal('1000.00'),
+            down_payment=Decimal('250.00'), amount_financed=Decimal('750.00'),
+        )
+        Transaction.objects.create(owner=user, goal=goal, checkout_request_id='plan-check')
+
+    def test_hot_querysets_use_indexes(self):
+        scans = {name: tables for name, tables, _ in check_hot_querysets() if tables}
+        self.assertEqual(scans, {})
+
+    def test_detects_sequential_scan(self):
+        tables, plan = sequential_scans(Goal.objects.filter(name="Laptop"))
+        self.assertEqual(tables, ['finance_goal'], plan)
+
+    def test_command_fails_on_sequential_scan(self):
+        hot = {'goals by name': lambda samples: Goal.objects.filter(name="Laptop")}
+        with mock.patch.dict('finance.query_plans.HOT_QUERYSETS', hot, clear=True):
+            with self.assertRaisesMessage(CommandError, 'goals by name: sequential scan of finance_goal'):
+                call_command('check_query_plans', stdout=StringIO())
+
+
+@mock.patch('finance.views.initiate_payhero_push', return_value={'success': True})
+class SplitDepositTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678')
+        cls.goals = [
+            Goal.objects.create(owner=cls.user, name=f"Goal {i}", target_amount=Decimal('5000.00'))
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def split(self, *amounts):
+        allocations = [{'goal_id': goal.id, 'amount': amount} for goal, amount in zip(self.goals, amounts)]
+        return self.client.post('/api/finance/deposit/split/', {'allocations': allocations}, format='json')
+
+    def callback(self, reference, amount, result_code=0, receipt='SPLIT123'):
+        payload = {'response': {
+            'ExternalReference': reference, 'ResultCode': result_code, 'Status': 'Success' if result_code == 0 else 'Failed',
+            'Amount': amount, 'MpesaReceiptNumber': receipt,
+        }}
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post('/api/finance/payment-callback/', payload, format='json')
+
+    def test_one_push_for_all_goals(self, push):
+        response = self.split('300', '200')
+        self.assertEqual(response.status_code, 200)
+
+        split = SplitDeposit.objects.get()
+        push.assert_called_once_with('0712345678', Decimal('500.00'), split.checkout_request_id)
+        pending = Transaction.objects.filter(status='pending').order_by('goal_id')
+        self.assertEqual(
+            [(tx.goal_id, tx.amount, tx.checkout_request_id) for tx in pending],
+            [(self.goals[0].id, Decimal('300.00'), f"{split.checkout_request_id}-{self.goals[0].id}"),
+             (self.goals[1].id, Decimal('200.00'), f"{split.checkout_request_id}-{self.goals[1].id}")],
+        )
+
+    def test_rejects_bad_allocations(self, push):
+        self.assertEqual(self.split('300').status_code, 400)
+        duplicate = [{'goal_id': self.goals[0].id, 'amount': '100'}] * 2
+        response = self.client.post('/api/finance/deposit/split/', {'allocations': duplicate}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other_goal = Goal.objects.create(owner=make_user('other@example.com'), name="Theirs", target_amount=Decimal('100.00'))
+        allocations = [{'goal_id': self.goals[0].id, 'amount': '100'}, {'goal_id': other_goal.id, 'amount': '100'}]
+        response = self.client.post('/api/finance/deposit/split/', {'allocations': allocations}, format='json')
+        self.assertEqual(response.status_code, 404)
+        push.assert_not_called()
+        self.assertFalse(SplitDeposit.objects.exists())
+
+    def test_callback_applies_allocation_once(self, push):
+        self.split('300', '200')
+        split = SplitDeposit.objects.get()
+        self.callback(split.checkout_request_id, 500)
+        self.callback(split.checkout_request_id, 500)
+
+        self.assertEqual(
+            [goal.current_amount for goal in Goal.objects.filter(id__in=[self.goals[0].id, self.goals[1].id]).order_by('id')],
+            [Decimal('300.00'), Decimal('200.00')],
+        )
+        self.assertEqual(Transaction.objects.filter(status='completed').count(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.koin_score, 75)
+        split.refresh_from_db()
+        self.assertEqual((split.status, split.mpesa_receipt_number), ('completed', 'SPLIT123'))
+
+    def test_callback_queries_do_not_grow_with_goals(self, push):
+        counts = []
+        for amounts in (('100', '100'), ('100',) * 5):
+            self.split(*amounts)
+            split = SplitDeposit.objects.latest('id')
+            with CaptureQueriesContext(connection) as queries:
+                self.callback(split.checkout_request_id, 100 * len(amounts), receipt=f"SPLIT{len(amounts)}")
+            self.assertEqual(Transaction.objects.filter(status='completed').count(), len(counts) * 2 + len(amounts))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_failed_callback_fails_every_share(self, push):
+        self.split('300', '200')
+        split = SplitDeposit.objects.get()
+        self.callback(split.checkout_request_id, 500, result_code=1)
+
+        self.assertEqual(set(Transaction.objects.values_list('status', flat=True)), {'failed'})
+        self.assertEqual(SplitDeposit.objects.get().status, 'failed')
+        self.assertEqual(Goal.objects.get(id=self.goals[0].id).current_amount, Decimal('0.00'))
+
+    def test_shares_scale_to_amount_paid(self, push):
+        split = SplitDeposit(amount=Decimal('300.00'), allocations=[[1, '100.00'], [2, '200.00']])
+        self.assertEqual(split.shares(Decimal('300.00')), {1: Decimal('100.00'), 2: Decimal('200.00')})
+        self.assertEqual(split.shares(Decimal('100.00')), {1: Decimal('33.33'), 2: Decimal('66.67')})
+
+
+@override_settings(ORDER_INSTALLMENT_COUNT=3, ORDER_INSTALLMENT_INTERVAL_DAYS=30)
+class InstallmentTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678', koin_score=5000)
+        cls.product = Product.objects.create(
+            name="Laptop", description="x", price=Decimal('1000.00'), required_koin_score=1000,
+        )
+        Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'), current_amount=Decimal('500.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def create_order(self):
+        response = jwt_client(self.user).post('/api/finance/orders/unlock/', {'product_id': self.product.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(id=response.json()['id'])
+
+    def repay(self, order, amount, tag):
+        payload = {'response': {
+            'ExternalReference': f"kampus_koin-repayment-{order.id}-{tag}", 'ResultCode': 0, 'Status': 'Success',
+            'Amount': amount, 'MpesaReceiptNumber': f"REPAY{tag}",
+        }}
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().post('/api/finance/payment-callback/', payload, format='json')
+        return len(queries)
+
+    def schedule(self, order):
+        return list(order.installments.order_by('number').values_list('amount', 'amount_paid', 'status'))
+
+    def test_order_gets_schedule(self):
+        order = self.create_order()
+        first_day = timezone.localdate(order.order_date)
+        self.assertEqual(
+            list(order.installments.order_by('number').values_list('number', 'due_date', 'amount', 'status')),
+            [(n, first_day + timedelta(days=30 * n), Decimal('250.00'), 'PENDING') for n in (1, 2, 3)],
+        )
+
+    def test_repayments_pay_oldest_first(self):
+        order = self.create_order()
+        self.repay(order, 300, 'a')
+        self.assertEqual(self.schedule(order), [
+            (Decimal('250.00'), Decimal('250.00'), 'PAID'),
+            (Decimal('250.00'), Decimal('50.00'), 'PENDING'),
+            (Decimal('250.00'), Decimal('0.00'), 'PENDING'),
+        ])
+        self.repay(order, 450, 'b')
+        self.assertEqual({status for _, _, status in self.schedule(order)}, {'PAID'})
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'PAID')
+
+    def test_repayment_queries_do_not_grow_with_installments(self):
+        first = self.create_order()
+        one = self.repay(first, 250, 'one')
+
+        with override_settings(ORDER_INSTALLMENT_COUNT=6):
+            Order.objects.filter(id=first.id).delete()
+            second = self.create_order()
+        self.assertEqual(self.repay(second, 500, 'many'), one)
+        self.assertEqual([status for _, _, status in self.schedule(second)], ['PAID'] * 4 + ['PENDING'] * 2)
+
+    def test_due_between(self):
+        order = self.create_order()
+        first_due = timezone.localdate(order.order_date) + timedelta(days=30)
+        self.assertEqual(list(due_between(first_due, first_due + timedelta(days=7)).values_list('number', flat=True)), [1])
+        self.repay(order, 250, 'a')
+        self.assertFalse(due_between(first_due, first_due + timedelta(days=7)).exists())
+
+    def test_split_amount(self):
+        self.assertEqual(split_amount(Decimal('100.00'), 3), [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+
+
+@mock.patch('finance.views.messaging.send_each')
+class RepaymentReminderTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Laptop", description="x", price=Decimal('1000.00'))
+        late = timezone.localdate() - timedelta(days=3)
+        cls.users = {}
+        for name, token, overdue_orders in [('two', 'tok-two', 2), ('one', 'tok-one', 1), ('silent', None, 1), ('current', 'tok-cur', 0)]:
+            user = cls.users[name] = make_user(f"{name}@example.com", phone_number=None, fcm_token=token)
+            for _ in range(max(overdue_orders, 1)):
+                order = Order.objects.create(
+                    user=user, product=product, total_amount=Decimal('1000.00'), down_payment=Decimal('250.00'),
+                    amount_financed=Decimal('750.00'), amount_paid=Decimal('100.00'), status='COMPLETED',
+                )
+                Installment.objects.create(
+                    order=order, number=1, amount=Decimal('250.00'),
+                    due_date=late if overdue_orders else late + timedelta(days=30),
+                )
+
+    @staticmethod
+    def delivered(*failed_tokens):
+        def send_each(messages):
+            return SimpleNamespace(responses=[
+                SimpleNamespace(success=m.token not in failed_tokens, exception=None if m.token not in failed_tokens else 'Unregistered')
+                for m in messages
+            ])
+        return send_each
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('send_repayment_reminders', *args, stdout=out)
+        return out.getvalue()
+
+    @staticmethod
+    def sent(send_each):
+        # One call per batch, and batches don't span ledger shards
+        return {m.token: m for call in send_each.call_args_list for m in call.args[0]}
+
+    def statuses(self):
+        emails = {user.id: user.email for user in self.users.values()}
+        return {
+            emails[user_id]: status
+            for reminders in sharding.across_shards(RepaymentReminder.objects.all())
+            for user_id, status in reminders.values_list('user_id', 'status')
+        }
+
+    def test_one_reminder_per_user(self, send_each):
+        send_each.side_effect = self.delivered()
+        self.assertIn("Sent 2 repayment reminders (0 failed)", self.run_command())
+
+        messages = self.sent(send_each)
+        self.assertEqual(set(messages), {'tok-two', 'tok-one'})
+        self.assertEqual(
+            messages['tok-two'].data['body'], "Repayments for 2 orders are overdue. Ksh. 1,300 is still outstanding.",
+        )
+        self.assertEqual(self.statuses(), {'two@example.com': 'SENT', 'one@example.com': 'SENT'})
+
+        # A second run the same day has nobody left to remind
+        calls = send_each.call_count
+        self.assertIn("Sent 0 repayment reminders", self.run_command())
+        self.assertEqual(send_each.call_count, calls)
+
+    def test_batches(self, send_each):
+        send_each.side_effect = self.delivered()
+        self.run_command('--batch-size', '1', '--workers', '2')
+        self.assertEqual([len(call.args[0]) for call in send_each.call_args_list], [1, 1])
+
+    def test_failures_are_retried_on_rerun(self, send_each):
+        send_each.side_effect = self.delivered('tok-one')
+        self.assertIn("Sent 1 repayment reminders (1 failed)", self.run_command())
+        reminder = RepaymentReminder.objects.for_user(self.users['one']).get(user=self.users['one'])
+        self.assertEqual((reminder.status, reminder.error), ('FAILED', 'Unregistered'))
+
+        send_each.reset_mock()
+        send_each.side_effect = self.delivered()
+        self.run_command()
+        self.assertEqual(set(self.sent(send_each)), {'tok-one'})
+        self.assertEqual(set(self.statuses().values()), {'SENT'})
+
+    def test_resumes_after_crash(self, send_each):
+        send_each.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_command()
+        self.assertEqual(set(self.statuses().values()), {'PENDING'})
+
+        send_each.side_effect = self.delivered()
+        self.run_command()
+        self.assertEqual(self.statuses(), {'two@example.com': 'SENT', 'one@example.com': 'SENT'})
+
+    @override_settings(REPAYMENT_REMINDER_RETENTION_DAYS=30)
+    def test_prunes_old_log(self, send_each):
+        send_each.side_effect = self.delivered()
+        RepaymentReminder.objects.create(user=self.users['current'], sent_on=timezone.localdate() - timedelta(days=31))
+        self.assertIn("Pruned 1 old reminder log entries", self.run_command())
+
+
+class LedgerShardingTests(TestCase):
+    databases = '__all__'
+    TWO_SHARDS = override_settings(LEDGER_SHARDS=['default', 'shard1'])
+
+    def setUp(self):
+        cache.clear()
+        self.router = sharding.LedgerShardRouter()
+
+    def test_settings_refuse_unsupported_shard_databases(self):
+        settings_file = Path(settings.BASE_DIR) / 'core' / 'settings.py'
+        with mock.patch.dict('os.environ', DATABASE_SHARD_URLS='mysql://kampus@localhost/ledger'):
+            with self.assertRaisesMessage(ImproperlyConfigured, "shard1 uses django.db.backends.mysql"):
+                runpy.run_path(str(settings_file))
+        with mock.patch.dict('os.environ', DATABASE_SHARD_URLS='postgres://kampus@localhost/ledger'):
+            self.assertEqual(runpy.run_path(str(settings_file))['LEDGER_SHARDS'], ['default', 'shard1'])
+
+    def test_jump_hash_is_stable_and_spreads(self):
+        self.assertEqual([sharding.jump_hash(key, 10) for key in range(5)], [0, 6, 6, 8, 1])
+        counts = [0] * 4
+        for key in range(4000):
+            counts[sharding.jump_hash(key * 7919, 4)] += 1
+        self.assertTrue(all(800 < count < 1200 for count in counts), counts)
+
+    def test_adding_a_shard_only_moves_users_to_it(self):
+        for user_id in range(1, 500):
+            with self.TWO_SHARDS:
+                before = sharding.shard_for_user(user_id)
+            with override_settings(LEDGER_SHARDS=['default', 'shard1', 'shard2']):
+                after = sharding.shard_for_user(user_id)
+            self.assertIn(after, {before, 'shard2'})
+
+    def test_single_shard_changes_nothing(self):
+        with override_settings(LEDGER_SHARDS=['default']):
+            self.assertEqual(sharding.shard_for_user(7), 'default')
+            self.assertIsNone(self.router.db_for_write(Goal, instance=Goal(owner_id=7)))
+            self.assertIsNone(self.router.db_for_read(Transaction))
+            self.assertIsNone(self.router.allow_migrate('default', 'finance', 'goal'))
+
+    def test_routes_by_owner_and_current_shard(self):
+        with self.TWO_SHARDS:
+            user_id = next(user_id for user_id in range(1, 100) if sharding.shard_for_user(user_id) == 'shard1')
+            self.assertEqual(self.router.db_for_write(Goal, instance=Goal(owner_id=user_id)), 'shard1')
+            self.assertEqual(self.router.db_for_read(Goal, instance=User(id=user_id)), 'shard1')
+            self.assertIsNone(self.router.db_for_read(Goal))
+            with sharding.on_user_shard(user_id):
+                self.assertEqual(self.router.db_for_read(Order), 'shard1')
+                # Users and products never leave 'default'
+                self.assertIsNone(self.router.db_for_read(Product))
+            order = Order(user_id=user_id)
+            order._state.db = 'shard1'
+            self.assertEqual(self.router.db_for_read(User, instance=order), 'default')
+            self.assertEqual(self.router.db_for_write(Installment, instance=Installment(order=order)), 'shard1')
+
+    def test_other_shards_only_migrate_ledger_tables(self):
+        with self.TWO_SHARDS:
+            self.assertTrue(self.router.allow_migrate('shard1', 'finance', 'transaction'))
+            self.assertFalse(self.router.allow_migrate('shard1', 'finance', 'product'))
+            self.assertFalse(self.router.allow_migrate('shard1', 'users', 'user'))
+            self.assertFalse(self.router.allow_migrate('shard1', 'finance'))
+            self.assertIsNone(self.router.allow_migrate('default', 'finance', 'product'))
+
+    def test_reference_names_its_owner(self):
+        reference = payment_reference('deposit', 12, 34, 'abc123')
+        self.assertRegex(reference, r'^kampus_koin-deposit-12-u34-\d+-abc123$')
+        self.assertEqual(reference_owner_id(reference), 34)
+        self.assertEqual(reference_owner_id('kampus_koin-split-34-1792399555-22af8b'), 34)
+        self.assertIsNone(reference_owner_id('kampus_koin-deposit-1-1792399555'))
+        self.assertIsNone(reference_owner_id('unknown'))
+
+    def test_select_related_across_prefetches_off_default(self):
+        self.assertEqual(sharding.select_related_across(Order.objects.all(), 'user').query.select_related, {'user': {}})
+        with self.TWO_SHARDS:
+            queryset = sharding.select_related_across(Order.objects.using('shard1'), 'user')
+        self.assertFalse(queryset.query.select_related)
+        self.assertEqual(queryset._prefetch_related_lookups, ('user',))
+
+
+@skipUnless(len(settings.LEDGER_SHARDS) > 1, "set DATABASE_SHARD_URLS to test across ledger shards")
+@mock.patch('finance.views.initiate_payhero_push', return_value={'success': True})
+class MultiShardTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [make_user(f"student{i}@example.com", phone_number=f"07000000{i:02d}") for i in range(40)]
+        cls.user = next(user for user in users if sharding.shard_for_user(user.id) != 'default')
+        cls.shard = sharding.shard_for_user(cls.user.id)
+        cls.product = Product.objects.create(name="Laptop", description="x", price=Decimal('1000.00'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def callback(self, reference, amount, receipt='SHARD123'):
+        payload = {'response': {
+            'ExternalReference': reference, 'ResultCode': 0, 'Status': 'Success',
+            'Amount': amount, 'MpesaReceiptNumber': receipt,
+        }}
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post('/api/finance/payment-callback/', payload, format='json')
+
+    def test_deposit_lands_on_users_shard(self, push):
+        response = self.client.post('/api/finance/goals/', {'name': "Laptop", 'target_amount': '500.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        goal = Goal.objects.for_user(self.user).get()
+        self.assertGreaterEqual(goal.id, sharding.SHARD_ID_SPACING)
+        self.assertFalse(Goal.objects.using('default').exists())
+
+        self.client.post('/api/finance/deposit/', {'amount': '200', 'goal_id': goal.id}, format='json')
+        reference = Transaction.objects.for_user(self.user).get().checkout_request_id
+        self.assertEqual(self.callback(reference, 200).status_code, 200)
+
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_amount, Decimal('200.00'))
+        self.assertEqual(Transaction.objects.for_user(self.user).get().status, 'completed')
+        self.assertEqual(self.client.get('/api/finance/goals/').json()[0]['id'], goal.id)
+
+    def test_response_versions_bump_after_the_shard_commits(self, push):
+        version = get_version(f"user:{self.user.id}")
+        # The shard's hook hands over to 'default', which then bumps
+        with self.captureOnCommitCallbacks(execute=True) as default_callbacks:
+            with self.captureOnCommitCallbacks(using=self.shard, execute=True) as shard_callbacks:
+                with sharding.on_shard(self.shard), transaction.atomic(using=self.shard):
+                    invalidate_user_responses(self.user.id)
+            self.assertEqual(get_version(f"user:{self.user.id}"), version)
+        self.assertEqual((len(shard_callbacks), len(default_callbacks)), (1, 1))
+        self.assertNotEqual(get_version(f"user:{self.user.id}"), version)
+
+    def test_pickup_finds_order_on_any_shard(self, push):
+        order = Order.objects.create(
+            user=self.user, product=self.product, total_amount=Decimal('1000.00'), down_payment=Decimal('250.00'),
+            amount_financed=Decimal('750.00'), status='READY_FOR_PICKUP',
+        )
+        self.assertEqual(order._state.db, self.shard)
+        response = APIClient().post(
+            '/api/finance/orders/verify-pickup/', {'pickup_qr_code': str(order.pickup_qr_code)}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(VendorPayout.objects.using(self.shard).get().order_id, order.id)
+
+    def test_rebalance_moves_misplaced_rows(self, push):
+        # Rows left on 'default' from before a shard was added
+        goal = Goal.objects.using('default').create(owner_id=self.user.id, name="Laptop", target_amount=Decimal('500.00'))
+        Transaction.objects.using('default').create(owner_id=self.user.id, goal_id=goal.id, checkout_request_id='moved-1')
+
+        out = StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('Moved 2 ledger rows of 1 users', out.getvalue())
+        self.assertFalse(Goal.objects.using('default').exists())
+        self.assertEqual(Transaction.objects.for_user(self.user).get().goal_id, goal.id)
+        self.assertFalse(SyncTombstone.objects.exists())
+
+        out = StringIO()
+        call_command('rebalance_shards', '--dry-run', stdout=out)
+        self.assertNotIn('Would move 1', out.getvalue())
+
+    def misplaced_rows(self):
+        goal = Goal.objects.using('default').create(owner_id=self.user.id, name="Laptop", target_amount=Decimal('500.00'))
+        Transaction.objects.using('default').create(owner_id=self.user.id, goal_id=goal.id, checkout_request_id='moved-1')
+        return goal
+
+    def test_callback_finds_rows_not_yet_rebalanced(self, push):
+        goal = self.misplaced_rows()
+        reference = payment_reference('deposit', goal.id, self.user.id, 'abc123')
+        Transaction.objects.using('default').create(
+            owner_id=self.user.id, goal_id=goal.id, amount=Decimal('200.00'), checkout_request_id=reference,
+        )
+        self.assertEqual(self.callback(reference, 200).status_code, 200)
+        self.assertEqual(Goal.objects.using('default').get(id=goal.id).current_amount, Decimal('200.00'))
+        self.assertEqual(Transaction.objects.using('default').get(checkout_request_id=reference).status, 'completed')
+        self.assertFalse(Transaction.objects.using(self.shard).exists())
+
+    def test_rebalance_keeps_rows_when_target_fails(self, push):
+        self.misplaced_rows()
+        with mock.patch('core.sharding.LedgerQuerySet.bulk_create', side_effect=OperationalError('disk full')):
+            with self.assertRaises(OperationalError):
+                move_user(self.user.id, 'default', self.shard)
+        self.assertEqual(Transaction.objects.using('default').count(), 1)
+        self.assertFalse(Goal.objects.using(self.shard).exists())
+
+    def test_rebalance_reconciles_after_failed_delete(self, push):
+        goal = self.misplaced_rows()
+        with mock.patch('finance.management.commands.rebalance_shards.delete_rows', side_effect=OperationalError('gone')):
+            with self.assertRaises(OperationalError):
+                move_user(self.user.id, 'default', self.shard)
+        # Copied but not deleted: both databases hold the rows
+        self.assertTrue(Goal.objects.using('default').exists())
+        Goal.objects.using('default').filter(id=goal.id).update(current_amount=Decimal('50.00'))
+
+        call_command('rebalance_shards', stdout=StringIO())
+        self.assertFalse(Goal.objects.using('default').exists())
+        self.assertEqual(Goal.objects.using(self.shard).get(id=goal.id).current_amount, Decimal('50.00'))
+        self.assertEqual(Transaction.objects.using(self.shard).count(), 1)
+
+
+    def test_seed_data_writes_to_user_shards(self, push):
+        call_command('seed_data', users=6, goals_per_user=1, transactions_per_goal=2, products=2, seed=9, stdout=StringIO())
+        user_ids = list(User.objects.filter(email__startswith='seed9-').values_list('id', flat=True))
+        for model, owner in [(Goal, 'owner_id'), (Transaction, 'owner_id'), (Order, 'user_id'), (Installment, 'order__user_id')]:
+            for alias in settings.LEDGER_SHARDS:
+                owners = set(model.objects.using(alias).filter(**{f"{owner}__in": user_ids}).values_list(owner, flat=True))
+                self.assertTrue(all(sharding.shard_for_user(user_id) == alias for user_id in owners), (model, alias))
+        self.assertEqual(sum(Transaction.objects.using(alias).count() for alias in settings.LEDGER_SHARDS), 12)
+
+
+@mock.patch('finance.views.initiate_payhero_push', return_value={'success': True})
+@override_settings(PAYHERO_USER_THROTTLE_RATE='1000/s', PAYHERO_USER_THROTTLE_BURST=1000)
+class VelocityTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678', koin_score=5000)
+        cls.goal = Goal.objects.create(
+            owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'), current_amount=Decimal('1000.00'),
+        )
+        cls.products = [
+            Product.objects.create(name=f"Item {i}", description="x", price=Decimal('400.00'), required_koin_score=0)
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+        # Early in a window, so nothing slides out mid-test
+        clock = mock.patch('finance.velocity.time.time', return_value=1_000_010.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def deposit(self):
+        return self.client.post('/api/finance/deposit/', {'amount': '100', 'goal_id': self.goal.id}, format='json')
+
+    def unlock(self, product):
+        return self.client.post('/api/finance/orders/unlock/', {'product_id': product.id}, format='json')
+
+    def test_counts_slide_out_of_the_window(self, push):
+        counter = SlidingWindowCounter('test', 60)
+        for _ in range(3):
+            counter.hit(now=6010)
+        self.assertEqual(counter.count(now=6030), 3)
+        # 10s into the next window, 5/6 of the previous one still counts
+        self.assertEqual(counter.hit(now=6070), 1 + 3 * 5 / 6)
+        self.assertEqual(counter.count(now=6130), 1 * 5 / 6)
+        self.assertEqual(counter.count(now=6200), 0)
+
+    @override_settings(VELOCITY_DEPOSIT_ATTEMPT_LIMIT='2/min')
+    def test_deposit_attempts(self, push):
+        self.assertEqual([self.deposit().status_code for _ in range(3)], [200, 200, 429])
+        self.assertEqual(push.call_count, 2)
+        self.assertEqual(Transaction.objects.count(), 2)
+        # Counted per phone number as well as per user
+        self.assertEqual(SlidingWindowCounter('deposit_attempt:phone:0712345678', 60).count(), 3)
+
+    @override_settings(VELOCITY_DEPOSIT_LIMIT='1/hour')
+    def test_completed_deposits_block_more(self, push):
+        self.assertEqual(self.deposit().status_code, 200)
+        reference = Transaction.objects.get().checkout_request_id
+        payload = {'response': {
+            'ExternalReference': reference, 'ResultCode': 0, 'Status': 'Success', 'Amount': 100,
+            'MpesaReceiptNumber': 'VEL1',
+        }}
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/api/finance/payment-callback/', payload, format='json')
+        self.assertEqual(self.deposit().status_code, 429)
+
+    @override_settings(VELOCITY_ORDER_CYCLE_LIMIT='1/hour')
+    def test_unlock_cycles(self, push):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.unlock(self.products[0]).status_code, 201)
+        response = self.unlock(self.products[1])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(VELOCITY_REPAY_ATTEMPT_LIMIT='1/min')
+    def test_repay_attempts(self, push):
+        order = Order.objects.create(
+            user=self.user, product=self.products[0], total_amount=Decimal('400.00'),
+            down_payment=Decimal('100.00'), amount_financed=Decimal('300.00'),
+        )
+        repay = lambda: self.client.post('/api/finance/repay/', {'amount': '100', 'order_id': order.id}, format='json')
+        self.assertEqual([repay().status_code, repay().status_code], [200, 429])
+        self.assertEqual(push.call_count, 1)
+
+
+class SharedCacheCheckTests(TestCase):
+    def test_warns_about_a_per_process_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['core.W001'])
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class RecurringDepositTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678')
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def schedule(self, next_run_at, frequency='MONTHLY'):
+        return RecurringDeposit.objects.create(
+            owner=self.user, goal=self.goal, amount=Decimal('100.00'), frequency=frequency, next_run_at=next_run_at,
+        )
+
+    def test_month_end_schedule_survives_february(self):
+        schedule = self.schedule(datetime(2027, 1, 31, 9, tzinfo=dt_timezone.utc))
+        runs = []
+        for _ in range(4):
+            schedule.next_run_at = schedule.following_run(schedule.next_run_at)
+            runs.append(schedule.next_run_at.date())
+        self.assertEqual(runs, [date(2027, 2, 28), date(2027, 3, 31), date(2027, 4, 30), date(2027, 5, 31)])
+
+    def test_catches_up_without_firing_repeatedly(self):
+        schedule = self.schedule(datetime(2027, 1, 1, 9, tzinfo=dt_timezone.utc), frequency='WEEKLY')
+        after = datetime(2027, 1, 20, 12, tzinfo=dt_timezone.utc)
+        self.assertEqual(schedule.following_run(after), datetime(2027, 1, 22, 9, tzinfo=dt_timezone.utc))
+
+    def test_claim_creates_pending_deposits_once(self):
+        now = timezone.now()
+        due = self.schedule(now - timedelta(hours=1))
+        self.schedule(now + timedelta(days=1))
+        done_goal = Goal.objects.create(
+            owner=self.user, name="Done", target_amount=Decimal('100.00'), current_amount=Decimal('100.00'),
+        )
+        RecurringDeposit.objects.create(
+            owner=self.user, goal=done_goal, amount=Decimal('50.00'), next_run_at=now - timedelta(hours=1),
+        )
+
+        command = DispatchRecurringDepositsCommand()
+        pushes, skipped = command.claim_batch(10)
+        self.assertEqual(skipped, 1)
+        self.assertEqual([(phone, amount) for phone, amount, _ in pushes], [('0712345678', Decimal('100.00'))])
+        deposit = Transaction.objects.get()
+        self.assertEqual((deposit.checkout_request_id, deposit.status), (pushes[0][2], 'pending'))
+        due.refresh_from_db()
+        self.assertGreater(due.next_run_at, now)
+        # Claimed schedules moved on, so a second worker finds nothing
+        self.assertEqual(command.claim_batch(10), ([], 0))
+
+    @skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... FOR UPDATE SKIP LOCKED")
+    def test_claim_skips_locked_schedules(self):
+        self.schedule(timezone.now() - timedelta(hours=1))
+        with CaptureQueriesContext(connection) as queries:
+            DispatchRecurringDepositsCommand().claim_batch(10)
+        self.assertTrue(any('SKIP LOCKED' in query['sql'] for query in queries), queries.captured_queries)
+
+    def test_new_start_date_moves_the_anchor(self):
+        schedule = self.schedule(timezone.now() + timedelta(days=1))
+        response = jwt_client(self.user).patch(
+            f'/api/finance/deposit/recurring/{schedule.id}/', {'next_run_at': '2027-03-30T09:00:00Z'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.day_of_month, 30)
+
+
+class GoalSummaryTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        now = timezone.now()
+        cls.laptop = Goal.objects.create(
+            owner=cls.user, name="Laptop", target_amount=Decimal('1000.00'), current_amount=Decimal('400.00'),
+        )
+        cls.bike = Goal.objects.create(
+            owner=cls.user, name="Bike", target_amount=Decimal('600.00'), current_amount=Decimal('600.00'),
+        )
+        for goal, amount, days_ago, status, tag in [
+            (cls.laptop, '300.00', 5, 'completed', 'a'),
+            (cls.laptop, '100.00', 1, 'pending', 'b'),
+            (cls.bike, '200.00', 60, 'completed', 'c'),
+            (cls.bike, '400.00', 120, 'completed', 'd'),
+        ]:
+            Transaction.objects.create(
+                owner=cls.user, goal=goal, amount=Decimal(amount), status=status,
+                checkout_request_id=f"kampus_koin-deposit-{goal.id}-{tag}",
+                transaction_date=now - timedelta(days=days_ago),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def test_totals_velocity_and_projection(self):
+        summary = self.client.get('/api/finance/goals/summary/').json()
+        # 300 in the last 30 days is 10 a day; 600 still to go
+        in_60_days = (timezone.now().date() + timedelta(days=60)).isoformat()
+        self.assertEqual(
+            {key: summary[key] for key in ('total_saved', 'total_target', 'overall_progress', 'deposit_velocity',
+                                           'projected_completion_date')},
+            {
+                'total_saved': '1000.00', 'total_target': '1600.00', 'overall_progress': 62.5,
+                'deposit_velocity': {'last_30_days': '300.00', 'last_90_days': '500.00'},
+                'projected_completion_date': in_60_days,
+            },
+        )
+        laptop, bike = summary['goals']
+        self.assertEqual(
+            (laptop['progress'], laptop['deposited_30d'], laptop['deposited_90d'], laptop['projected_completion_date']),
+            (40.0, '300.00', '300.00', in_60_days),
+        )
+        self.assertEqual(
+            (bike['progress'], bike['deposited_30d'], bike['deposited_90d'], bike['projected_completion_date']),
+            (100.0, '0.00', '200.00', None),
+        )
+
+    def test_deposit_callback_invalidates(self):
+        self.assertEqual(self.client.get('/api/finance/goals/summary/').json()['total_saved'], '1000.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/api/finance/payment-callback/', {'response': {
+                'ExternalReference': f"kampus_koin-deposit-{self.laptop.id}-b", 'ResultCode': 0, 'Status': 'Success', 'Amount': 100,
+                'MpesaReceiptNumber': 'SUM2',
+            }}, format='json')
+        summary = self.client.get('/api/finance/goals/summary/').json()
+        self.assertEqual(
+            (summary['total_saved'], summary['deposit_velocity']['last_30_days']), ('1100.00', '400.00'),
+        )
+
+
+class SavingsStatsTests(TestCase):
+    databases = '__all__'
+
+    def test_vectorized_stats(self):
+        # Day 700 is in week 100
+        stats = compute_savings_stats(
+            user_ids=[1, 2, 3], koin_scores=[100, 0, 50],
+            tx_user_ids=[1, 1, 1, 1, 2, 9], tx_days=[700, 693, 686, 672, 500, 700],
+            tx_amounts=[100, 200, 300, 400, 500, 999], today=700,
+        )
+        self.assertEqual({name: values.tolist() for name, values in stats.items()}, {
+            'total_deposited': [1000.0, 500.0, 0.0],
+            'deposit_count': [4, 1, 0],
+            'deposits_last_90d': [1000.0, 0.0, 0.0],
+            # Weeks 98-100 in a row; week 96 is cut off by the gap
+            'savings_streak_weeks': [3, 0, 0],
+            'consistency_score': [33.33, 0.0, 0.0],
+            # A month at the 90 day pace: 1000 / 3 * 0.15 koin
+            'projected_koin_score': [149, 0, 50],
+            'last_deposit_day': [700, 500, -1],
+        })
+
+    def test_command_writes_stats(self):
+        user = make_user(koin_score=10)
+        idle = make_user('idle@example.com')
+        goal = Goal.objects.create(owner=user, name="Laptop", target_amount=Decimal('5000.00'))
+        deposit = Transaction.objects.create(
+            owner=user, goal=goal, amount=Decimal('200.00'), status='completed', checkout_request_id='stats-1',
+            transaction_date=timezone.now() - timedelta(hours=1),
+        )
+        Transaction.objects.create(owner=user, goal=goal, amount=Decimal('900.00'), checkout_request_id='stats-2')
+
+        call_command('compute_savings_stats', stdout=StringIO())
+        stats = user.savings_stats
+        self.assertEqual(
+            (stats.total_deposited, stats.deposit_count, stats.deposits_last_90d, stats.projected_koin_score),
+            (Decimal('200.00'), 1, Decimal('200.00'), 20),
+        )
+        self.assertEqual(stats.last_deposit_date, timezone.localdate(deposit.transaction_date))
+        self.assertEqual((idle.savings_stats.deposit_count, idle.savings_stats.last_deposit_date), (0, None))
+
+
+class SyncTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+
+    def sync(self, since=None):
+        return self.client.get('/api/finance/sync/', {'since': since} if since else {})
+
+    def test_first_sync_is_full(self):
+        goal = Goal.objects.create(owner=self.user, name="Laptop", target_amount=Decimal('5000.00'))
+        payload = self.sync().json()
+        self.assertTrue(payload['full'])
+        self.assertEqual([row['id'] for row in payload['goals']], [goal.id])
+
+    def test_since_returns_changes_and_tombstones(self):
+        since = timezone.now() - timedelta(minutes=1)
+        unchanged = Goal.objects.create(owner=self.user, name="Laptop", target_amount=Decimal('5000.00'))
+        Goal.objects.filter(pk=unchanged.pk).update(updated_at=since - timedelta(minutes=1))
+        changed = Goal.objects.create(owner=self.user, name="Phone", target_amount=Decimal('2000.00'))
+        deleted = Goal.objects.create(owner=self.user, name="Bike", target_amount=Decimal('800.00'))
+        deleted_id = deleted.id
+        deleted.delete()
+
+        payload = self.sync(encode_sync_token(since)).json()
+        self.assertFalse(payload['full'])
+        self.assertEqual([row['id'] for row in payload['goals']], [changed.id])
+        self.assertEqual(payload['deleted'], {'goals': [deleted_id], 'orders': [], 'transactions': []})
+
+    @override_settings(SYNC_OVERLAP_SECONDS=5)
+    def test_token_overlaps_in_flight_writes(self):
+        synced_at = timezone.now() - timedelta(minutes=1)
+        with mock.patch('finance.sync.timezone.now', return_value=synced_at):
+            token = self.sync().json()['sync_token']
+        self.assertEqual(decode_sync_token(token), synced_at - timedelta(seconds=5))
+
+        # Committed by a request still running when the last sync read
+        goal = Goal.objects.create(owner=self.user, name="Laptop", target_amount=Decimal('5000.00'))
+        Goal.objects.filter(pk=goal.pk).update(updated_at=synced_at - timedelta(seconds=2))
+        self.assertEqual([row['id'] for row in self.sync(token).json()['goals']], [goal.id])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_token_older_than_tombstones_resyncs(self):
+        token = encode_sync_token(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.sync(token).json()['full'])
+
+    def test_invalid_token(self):
+        response = self.sync('yesterday')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Invalid sync token.'}))
+
+
+class SeedDataTests(TestCase):
+    databases = '__all__'
+
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_data', seed=7, users=3, goals_per_user=2, transactions_per_goal=4, products=5,
+                     orders_per_user=2, stdout=out, **options)
+        return out.getvalue()
+
+    @staticmethod
+    def ledger_rows(model, **filters):
+        return [row for rows in sharding.across_shards(model.objects.filter(**filters)) for row in rows]
+
+    def test_row_counts(self):
+        output = self.seed(chunk_size=5)
+        user_ids = list(User.objects.filter(email__startswith='seed7-').values_list('id', flat=True))
+        orders = self.ledger_rows(Order, user_id__in=user_ids)
+        order_ids = [order.id for order in orders]
+        self.assertEqual(
+            (len(user_ids), len(self.ledger_rows(Goal, owner_id__in=user_ids)),
+             len(self.ledger_rows(Transaction, owner_id__in=user_ids)),
+             Product.objects.filter(name__startswith='Product seed7-').count(), len(orders)),
+            (3, 6, 24, 5, 6),
+        )
+        self.assertEqual(len(self.ledger_rows(Installment, order_id__in=order_ids)), 6 * settings.ORDER_INSTALLMENT_COUNT)
+        self.assertEqual(
+            len(self.ledger_rows(VendorPayout, order_id__in=order_ids)),
+            len([order for order in orders if order.status != 'READY_FOR_PICKUP']),
+        )
+        self.assertIn("3 users, 6 goals, 24 transactions, 6 orders", output)
+
+    def test_balances_agree(self):
+        self.seed()
+        user_ids = list(User.objects.filter(email__startswith='seed7-').values_list('id', flat=True))
+        for goal in self.ledger_rows(Goal, owner_id__in=user_ids):
+            completed = Transaction.objects.for_user(goal.owner_id).filter(goal=goal, status='completed')
+            self.assertEqual(goal.current_amount, sum(tx.amount for tx in completed))
+            self.assertEqual(completed.filter(mpesa_receipt_number__isnull=True).count(), 0)
+        for order in self.ledger_rows(Order, user_id__in=user_ids):
+            installments = list(order.installments.all())
+            self.assertEqual(sum(i.amount for i in installments), order.amount_financed)
+            self.assertEqual(sum(i.amount_paid for i in installments), order.amount_paid)
+            self.assertEqual(all(i.status == 'PAID' for i in installments), order.amount_paid == order.amount_financed)
+
+    def test_same_seed_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+class ReplicaRoutingTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        with mock.patch('core.db_router.replica_configured', return_value=True):
+            self.assertIsNone(self.router.db_for_read(Goal))
+            with db_router.read_from_replica():
+                self.assertEqual(self.router.db_for_read(Goal), db_router.REPLICA)
+            self.assertIsNone(self.router.db_for_read(Goal))
+
+    def test_no_replica_configured(self):
+        with db_router.read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Goal))
+
+    def test_writes_always_use_primary(self):
+        with mock.patch('core.db_router.replica_configured', return_value=True), db_router.read_from_replica():
+            self.assertEqual(self.router.db_for_write(Goal), 'default')
+
+    def test_cached_and_sync_views_stay_on_primary(self):
+        # A lagging replica would be cached under a fresh version, or skipped by the next sync token
+        for view in (GoalListCreateView, GoalSummaryView, OrderListView, TransactionListView, SyncView):
+            self.assertFalse(issubclass(view, db_router.ReplicaReadMixin), view.__name__)
+
+    def test_successful_write_pins_user_to_primary(self):
+        user = make_user()
+        with mock.patch('core.db_router.replica_configured', return_value=True):
+            response = jwt_client(user).post(
+                '/api/finance/goals/', {'name': "Laptop", 'target_amount': '500.00'}, format='json',
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertTrue(db_router.is_pinned(user.id))
+
+
+class LoadTestCommandTests(TestCase):
+    databases = '__all__'
+
+    def test_throttled_requests_are_reported_apart(self):
+        user = make_user(phone_number='0712345678')
+        Goal.objects.create(owner=user, name="Laptop", target_amount=Decimal('5000.00'))
+        statuses = iter([200, 200, 429, 429, 500])
+        transport = httpx.MockTransport(lambda request: httpx.Response(next(statuses), json={}))
+        async_client = httpx.AsyncClient
+        client = lambda **kwargs: async_client(transport=transport, **kwargs)
+
+        out = StringIO()
+        with mock.patch('finance.management.commands.loadtest_payments.httpx.AsyncClient', client):
+            call_command('loadtest_payments', email=user.email, mode='sync', requests=5, concurrency=1, stdout=out)
+        row = next(line for line in out.getvalue().splitlines() if line.startswith('sync'))
+        self.assertEqual(row.split()[:5], ['sync', '5', '2', '2', '1'])
+        self.assertIn("2 requests were throttled; restart the server with PAYHERO_USER_THROTTLE_RATE=", out.getvalue())
+        self.assertIn("VELOCITY_DEPOSIT_ATTEMPT_LIMIT=100000/s", out.getvalue())
+
+
+class AsyncPaymentViewTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678')
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+
+    def setUp(self):
+        # Fresh throttle buckets
+        cache.clear()
+
+    def test_views_must_implement_handle(self):
+        class NoHandle(AsyncJSONView):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoHandle()
+
+    @mock.patch('finance.async_views.initiate_payhero_push_async', return_value={'success': True})
+    def test_deposit_matches_sync_view(self, push):
+        response = jwt_client(self.user).post(
+            '/api/finance/async/deposit/', {'amount': '150', 'goal_id': self.goal.id}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "STK push initiated successfully. Please enter your PIN."})
+        pending = Transaction.objects.get(goal=self.goal)
+        self.assertEqual((pending.status, pending.amount), ('pending', Decimal('150.00')))
+        push.assert_awaited_once_with('0712345678', '150', pending.checkout_request_id)
+
+    def test_requires_token(self):
+        response = APIClient().post('/api/finance/async/deposit/', {'amount': '150', 'goal_id': self.goal.id}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_goal(self):
+        response = jwt_client(self.user).post('/api/finance/async/deposit/', {'amount': '150', 'goal_id': 999}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch('finance.async_views.initiate_payhero_push_async', return_value={'success': True})
+    def test_callback_completes_deposit(self, push):
+        jwt_client(self.user).post('/api/finance/async/deposit/', {'amount': '150', 'goal_id': self.goal.id}, format='json')
+        reference = Transaction.objects.get(goal=self.goal).checkout_request_id
+
+        response = APIClient().post('/api/finance/async/payment-callback/', {
+            'response': {'ExternalReference': reference, 'ResultCode': 0, 'Status': 'Success',
+                         'Amount': 150, 'MpesaReceiptNumber': "ASYNC1"},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.current_amount, Decimal('150.00'))
+        self.assertEqual(Transaction.objects.get(checkout_request_id=reference).status, 'completed')
+
+    @mock.patch.dict('os.environ', {'OTHER_APP_CALLBACK_URL': 'https://other.example/callback'})
+    def test_callback_for_other_app_is_queued(self):
+        payload = {'response': {'ExternalReference': 'other-123', 'ResultCode': 0}}
+
+        response = APIClient().post('/api/finance/async/payment-callback/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        forward = CallbackForward.objects.get()
+        self.assertEqual((forward.target_url, forward.payload), ('https://other.example/callback', payload))
+
+
+@override_settings(
+    PAYHERO_USER_THROTTLE_RATE='6/min', PAYHERO_USER_THROTTLE_BURST=2,
+    PAYHERO_GLOBAL_THROTTLE_RATE='30/s', PAYHERO_GLOBAL_THROTTLE_BURST=60,
+)
+@mock.patch('finance.views.initiate_payhero_push', return_value={'success': True})
+class PaymentThrottleTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user(phone_number='0712345678')
+        cls.goal = Goal.objects.create(owner=cls.user, name="Laptop", target_amount=Decimal('5000.00'))
+        cls.other = make_user('other@example.com', phone_number='0712345679')
+        cls.other_goal = Goal.objects.create(owner=cls.other, name="Bike", target_amount=Decimal('800.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def deposit(self, user, goal):
+        return jwt_client(user).post('/api/finance/deposit/', {'amount': '100', 'goal_id': goal.id}, format='json')
+
+    def test_burst_then_429_with_retry_after(self, push):
+        self.assertEqual([self.deposit(self.user, self.goal).status_code for _ in range(2)], [200, 200])
+        response = self.deposit(self.user, self.goal)
+        self.assertEqual(response.status_code, 429)
+        # 6/min is a token every 10 seconds
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(push.call_count, 2)
+
+        # Buckets are per user
+        self.assertEqual(self.deposit(self.other, self.other_goal).status_code, 200)
+
+    def test_tokens_refill(self, push):
+        with mock.patch('finance.throttling.time.time', return_value=1_000_000.0):
+            self.deposit(self.user, self.goal)
+            self.deposit(self.user, self.goal)
+            self.assertEqual(self.deposit(self.user, self.goal).status_code, 429)
+        with mock.patch('finance.throttling.time.time', return_value=1_000_010.0):
+            self.assertEqual(self.deposit(self.user, self.goal).status_code, 200)
+            self.assertEqual(self.deposit(self.user, self.goal).status_code, 429)
+
+    def test_global_bucket_refunds_the_user_token(self, push):
+        with override_settings(PAYHERO_GLOBAL_THROTTLE_RATE='1/min', PAYHERO_GLOBAL_THROTTLE_BURST=1):
+            self.assertEqual(self.deposit(self.other, self.other_goal).status_code, 200)
+            response = self.deposit(self.user, self.goal)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+        # The global refusal didn't use up the user's own burst
+        cache.delete('throttle:payhero:global')
+        self.assertEqual([self.deposit(self.user, self.goal).status_code for _ in range(3)], [200, 200, 429])
+
+    @mock.patch('finance.management.commands.dispatch_recurring_deposits.initiate_payhero_push', return_value={'success': True})
+    def test_recurring_pushes_share_the_global_bucket(self, recurring_push, push):
+        RecurringDeposit.objects.create(
+            owner=self.other, goal=self.other_goal, amount=Decimal('100.00'),
+            next_run_at=timezone.now() - timedelta(minutes=1),
+        )
+        with override_settings(PAYHERO_GLOBAL_THROTTLE_RATE='1/min', PAYHERO_GLOBAL_THROTTLE_BURST=1):
+            call_command('dispatch_recurring_deposits', stdout=StringIO())
+            recurring_push.assert_called_once()
+            response = self.deposit(self.user, self.goal)
+        self.assertEqual(response.status_code, 429)
+        push.assert_not_called()
+
+    def test_throttles_must_name_their_buckets(self, push):
+        with self.assertRaises(TypeError):
+            TokenBucketThrottle()
+
+    def test_async_endpoints_share_the_buckets(self, push):
+        self.deposit(self.user, self.goal)
+        self.deposit(self.user, self.goal)
+        response = jwt_client(self.user).post(
+            '/api/finance/async/deposit/', {'amount': '100', 'goal_id': self.goal.id}, format='json',
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+
+    @skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to measure latency")
+    def test_check_is_cheap(self, push):
+        request = SimpleNamespace(user=self.user, META={})
+        with override_settings(PAYHERO_USER_THROTTLE_RATE='100000/s', PAYHERO_USER_THROTTLE_BURST=100000,
+                               PAYHERO_GLOBAL_THROTTLE_RATE='100000/s', PAYHERO_GLOBAL_THROTTLE_BURST=100000):
+            started = time.perf_counter()
+            for _ in range(2000):
+                self.assertTrue(PayHeroThrottle().allow_request(request, None))
+            per_check_ms = (time.perf_counter() - started) / 2000 * 1000
+        print(f"\nPayHeroThrottle: {per_check_ms * 1000:.0f} µs per check")
+        self.assertLess(per_check_ms, 0.5)
+
+
+@override_settings(CALLBACK_FORWARD_MAX_ATTEMPTS=3)
+class CallbackForwardingTests(TestCase):
+    databases = '__all__'
+    payload = {'response': {'ExternalReference': 'other-123', 'ResultCode': 0}}
+
+    @mock.patch.dict('os.environ', {'OTHER_APP_CALLBACK_URL': 'https://other.example/callback'})
+    def test_callback_queues_without_calling_downstream(self):
+        with mock.patch('requests.Session.post') as post:
+            response = APIClient().post('/api/finance/payment-callback/', self.payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        post.assert_not_called()
+        self.assertEqual(CallbackForward.objects.get().status, 'PENDING')
+
+    def forward(self, **fields):
+        return CallbackForward.objects.create(target_url='https://other.example/callback', payload=self.payload, **fields)
+
+    def drain(self, post):
+        with mock.patch('requests.Session.post', side_effect=post) as session_post:
+            call_command('forward_callbacks', stdout=StringIO())
+        return session_post
+
+    def test_delivers_pending_forwards(self):
+        forwards = [self.forward() for _ in range(3)]
+        session_post = self.drain(lambda *args, **kwargs: mock.Mock(raise_for_status=mock.Mock()))
+
+        self.assertEqual(session_post.call_count, 3)
+        session_post.assert_called_with('https://other.example/callback', json=self.payload, timeout=5.0)
+        for forward in forwards:
+            forward.refresh_from_db()
+            self.assertEqual((forward.status, forward.attempts), ('DELIVERED', 1))
+
+    def test_failures_back_off_then_dead_letter(self):
+        forward = self.forward()
+
+        def down(*args, **kwargs):
+            raise requests.ConnectionError("connection refused")
+
+        self.drain(down)
+        forward.refresh_from_db()
+        self.assertEqual((forward.status, forward.attempts), ('PENDING', 1))
+        self.assertGreater(forward.next_attempt_at, timezone.now())
+        self.assertIn("connection refused", forward.last_error)
+
+        # Not due yet, so another run leaves it alone
+        self.assertEqual(self.drain(down).call_count, 0)
+
+        for _ in range(2):
+            CallbackForward.objects.filter(id=forward.id).update(next_attempt_at=timezone.now())
+            self.drain(down)
+        forward.refresh_from_db()
+        self.assertEqual((forward.status, forward.attempts), ('DEAD', 3))
+
+    def test_replay_requeues_dead_forwards(self):
+        dead = self.forward(status='DEAD', attempts=3, last_error="503")
+        delivered = self.forward(status='DELIVERED', attempts=1)
+
+        call_command('replay_callback_forwards', '--all-dead', stdout=StringIO())
+        dead.refresh_from_db()
+        delivered.refresh_from_db()
+        self.assertEqual((dead.status, dead.attempts, dead.last_error), ('PENDING', 0, ''))
+        self.assertEqual(delivered.status, 'DELIVERED')
+
+
+# --- ENDPOINT BENCHMARKS (see core/benchmarks.py) ---
+
+def _new_product(data, i):
+    data.product = Product.objects.create(
+        name=f"Fresh {i}", description="", price=Decimal('400.00'), required_koin_score=0, vendor_name="Bench Vendor",
+    )
+
+
+def _new_pickup(data, i):
+    _new_product(data, i)
+    data.pickup = Order.objects.create(
+        user=data.user, product=data.product, total_amount=data.product.price,
+        down_payment=Decimal('100.00'), amount_financed=Decimal('300.00'),
+    )
+
+
+def _pending_deposit(data, i, tag='bench'):
+    data.reference = f"kampus_koin-deposit-{data.goals[0].id}-{tag}{i}"
+    Transaction.objects.create(
+        owner=data.user, goal=data.goals[0], amount=Decimal('100.00'), checkout_request_id=data.reference,
+    )
+
+
+FINANCE_SCENARIOS = [
+    Scenario('goal-list-create', 'GET', '/api/finance/goals/'),
+    Scenario('goal-list-create', 'POST', '/api/finance/goals/', {'name': "Bench goal", 'target_amount': '500.00'}, status=201),
+    Scenario('goal-summary', 'GET', '/api/finance/goals/summary/', setup=lambda data, i: cache.clear()),
+    Scenario('goal-detail', 'GET', lambda data, i: f"/api/finance/goals/{data.goals[0].id}/"),
+    Scenario('goal-detail', 'PATCH', lambda data, i: f"/api/finance/goals/{data.goals[0].id}/", {'name': "Renamed"}),
+    Scenario('deposit', 'POST', '/api/finance/deposit/',
+             lambda data, i: {'amount': '100', 'goal_id': data.goals[i % len(data.goals)].id}),
+    Scenario('split-deposit', 'POST', '/api/finance/deposit/split/',
+             lambda data, i: {'allocations': [{'goal_id': goal.id, 'amount': '100'} for goal in data.goals[:3]]}),
+    Scenario('recurring-deposit-list-create', 'GET', '/api/finance/deposit/recurring/'),
+    Scenario('recurring-deposit-list-create', 'POST', '/api/finance/deposit/recurring/',
+             lambda data, i: {'goal': data.goals[0].id, 'amount': '50.00', 'frequency': 'WEEKLY',
+                              'next_run_at': (timezone.now() + timedelta(days=7)).isoformat()},
+             status=201),
+    Scenario('recurring-deposit-detail', 'GET', lambda data, i: f"/api/finance/deposit/recurring/{data.recurring[0].id}/"),
+    Scenario('payment-callback', 'POST', '/api/finance/payment-callback/',
+             lambda data, i: {'response': {'ExternalReference': data.reference, 'ResultCode': 0, 'Status': 'Success',
+                                           'Amount': 100, 'MpesaReceiptNumber': f"BENCHCB{i}"}},
+             setup=_pending_deposit, auth=False),
+    Scenario('transaction-list', 'GET', '/api/finance/transactions/'),
+    Scenario('sync', 'GET', '/api/finance/sync/'),
+    Scenario('bootstrap', 'GET', '/api/finance/bootstrap/'),
+    Scenario('product-list', 'GET', '/api/finance/products/'),
+    Scenario('order-create', 'POST', '/api/finance/orders/unlock/',
+             lambda data, i: {'product_id': data.product.id}, setup=_new_product, status=201),
+    Scenario('repay', 'POST', '/api/finance/repay/', lambda data, i: {'amount': '100', 'order_id': data.orders[0].id}),
+    Scenario('order-list', 'GET', '/api/finance/orders/'),
+    Scenario('verify-pickup', 'POST', '/api/finance/orders/verify-pickup/',
+             lambda data, i: {'pickup_qr_code': str(data.pickup.pickup_qr_code)}, setup=_new_pickup, auth=False),
+    Scenario('update-fcm-token', 'POST', '/api/finance/users/fcm-token/', {'fcm_token': "bench-token"}),
+    Scenario('async-deposit', 'POST', '/api/finance/async/deposit/',
+             lambda data, i: {'amount': '100', 'goal_id': data.goals[i % len(data.goals)].id}),
+    Scenario('async-repay', 'POST', '/api/finance/async/repay/', lambda data, i: {'amount': '100', 'order_id': data.orders[0].id}),
+    Scenario('async-payment-callback', 'POST', '/api/finance/async/payment-callback/',
+             lambda data, i: {'response': {'ExternalReference': data.reference, 'ResultCode': 0, 'Status': 'Success',
+                                           'Amount': 100, 'MpesaReceiptNumber': f"BENCHACB{i}"}},
+             setup=lambda data, i: _pending_deposit(data, i, tag='async'), auth=False),
+]
+
+
+class FinanceEndpointBenchmarkTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_benchmark_data()
+
+    def test_every_endpoint_has_a_scenario(self):
+        self.assertEqual(uncovered_url_names(urlpatterns, FINANCE_SCENARIOS), [])
+
+    def test_query_counts_within_baseline(self):
+        check_scenarios(self, FINANCE_SCENARIOS, self.data)
+
+    @skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to measure latency")
+    def test_latency_within_baseline(self):
+        check_scenarios(self, FINANCE_SCENARIOS, self.data, measure_latency=True)
@@ -0,0 +1,139 @@
+# backend/finance/throttling.py
+"""
+Token-bucket throttles kept in the shared cache, so every worker draws from
+the same buckets.
+
+A bucket is one integer in the cache: the time (ms) at which it would be
+full again, moved forward by `cost` for every token taken. A request is let
+through while that time is no more than `burst` tokens ahead of the clock.
+Only add/incr/decr are used, which are atomic on Redis and LocMem, so there
+is no read-modify-write race; the common case is a single incr.
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+# Buckets refill long before this; it only stops idle ones lingering forever
+BUCKET_TIMEOUT = 24 * 60 * 60
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> tokens per second (DRF's rate syntax)."""
+    num, period = rate.split('/')
+    return int(num) / PERIODS[period[0]]
+
+
+class TokenBucket:
+
+    def __init__(self, key, rate, burst):
+        self.key = f"throttle:{key}"
+        # Milliseconds per token, and how far ahead of the clock we may run
+        self.cost = max(1, round(1000 / parse_rate(rate)))
+        self.tolerance = self.cost * burst
+
+    def take(self):
+        """
+        Takes a token. Returns 0 if one was available, otherwise the seconds
+        until there will be one (and nothing is taken).
+        """
+        now = int(time.time() * 1000)
+        try:
+            full_at = cache.incr(self.key, self.cost)
+        except ValueError:
+            if cache.add(self.key, now + self.cost, BUCKET_TIMEOUT):
+                return 0
+            full_at = cache.incr(self.key, self.cost)
+
+        previous = full_at - self.cost
+        if previous < now:
+            # The bucket was already full; catch the counter up to the clock.
+            # Two requests racing here both add the gap, which only makes the
+            # bucket briefly stricter, never looser.
+            full_at = cache.incr(self.key, now - previous)
+
+        over = full_at - now - self.tolerance
+        if over > 0:
+            self.refund()
+            return over / 1000
+        return 0
+
+    def acquire(self):
+        """Takes a token, sleeping until one is available (for workers)."""
+        while wait := self.take():
+            time.sleep(wait)
+
+    def refund(self):
+        try:
+            cache.decr(self.key, self.cost)
+        except ValueError:
+            pass
+
+
+def payhero_global_bucket():
+    """What all STK pushes together may send, from requests and workers alike."""
+    return TokenBucket("payhero:global", settings.PAYHERO_GLOBAL_THROTTLE_RATE, settings.PAYHERO_GLOBAL_THROTTLE_BURST)
+
+
+class TokenBucketThrottle(ABC, BaseThrottle):
+    """
+    Takes a token from each bucket returned by get_buckets(); if any is
+    empty, the tokens already taken are handed back and the request is
+    throttled (429 with Retry-After).
+    """
+
+    @abstractmethod
+    def get_buckets(self, request, view):
+        """The TokenBuckets a request draws from, in order."""
+
+    def user_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        taken = []
+        for bucket in self.get_buckets(request, view):
+            wait = bucket.take()
+            if wait:
+                for earlier in taken:
+                    earlier.refund()
+                self.retry_after = wait
+                return False
+            taken.append(bucket)
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class PayHeroThrottle(TokenBucketThrottle):
+    """
+    For endpoints that send an STK push: a bucket per user, so one client's
+    retry loop can't hog the service, and a global one that caps what all
+    users together send to PayHero.
+    """
+
+    def get_buckets(self, request, view):
+        return [
+            TokenBucket(
+                f"payhero:{self.user_key(request)}",
+                settings.PAYHERO_USER_THROTTLE_RATE, settings.PAYHERO_USER_THROTTLE_BURST,
+            ),
+            payhero_global_bucket(),
+        ]
+
+
+class OrderCreateThrottle(TokenBucketThrottle):
+    # Orders are paid from savings, so there's no PayHero call to cap globally
+    def get_buckets(self, request, view):
+        return [TokenBucket(
+            f"order_create:{self.user_key(request)}",
+            settings.ORDER_CREATE_THROTTLE_RATE, settings.ORDER_CREATE_THROTTLE_BURST,
+        )]
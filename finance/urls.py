@@ -1,18 +1,30 @@
 # finance/urls.py
 
 from django.urls import path
-from .views import GoalDetailView, GoalListCreateView, DepositView, OrderListView, PaymentCallbackView, RepayView, TransactionListView, ProductListView,OrderCreateView, UpdateFCMTokenView,VerifyPickupView
+from .async_views import AsyncDepositView, AsyncRepayView, AsyncPaymentCallbackView
+from .views import GoalDetailView, GoalListCreateView, GoalSummaryView, DepositView, OrderListView, PaymentCallbackView, RepayView, TransactionListView, ProductListView,OrderCreateView, UpdateFCMTokenView,VerifyPickupView, RecurringDepositListCreateView, RecurringDepositDetailView, SyncView, BootstrapView, SplitDepositView
 
 urlpatterns = [
     path('goals/', GoalListCreateView.as_view(), name='goal-list-create'),
+    path('goals/summary/', GoalSummaryView.as_view(), name='goal-summary'),
     path('goals/<int:pk>/', GoalDetailView.as_view(), name='goal-detail'),
     path('deposit/', DepositView.as_view(), name='deposit'),
+    path('deposit/split/', SplitDepositView.as_view(), name='split-deposit'),
+    path('deposit/recurring/', RecurringDepositListCreateView.as_view(), name='recurring-deposit-list-create'),
+    path('deposit/recurring/<int:pk>/', RecurringDepositDetailView.as_view(), name='recurring-deposit-detail'),
     path('payment-callback/', PaymentCallbackView.as_view(), name='payment-callback'),
     path('transactions/', TransactionListView.as_view(), name='transaction-list'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
     path('products/', ProductListView.as_view(), name='product-list'),
     path('orders/unlock/', OrderCreateView.as_view(), name='order-create'),
     path('repay/', RepayView.as_view(), name='repay'),
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('orders/verify-pickup/', VerifyPickupView.as_view(), name='verify-pickup'),
     path('users/fcm-token/', UpdateFCMTokenView.as_view(), name='update-fcm-token'),
+
+    # Async variants of the payment endpoints, for ASGI workers (see async_views.py)
+    path('async/deposit/', AsyncDepositView.as_view(), name='async-deposit'),
+    path('async/repay/', AsyncRepayView.as_view(), name='async-repay'),
+    path('async/payment-callback/', AsyncPaymentCallbackView.as_view(), name='async-payment-callback'),
 ]
\ No newline at end of file
@@ -0,0 +1,108 @@
+# backend/finance/velocity.py
+"""
+Sliding-window velocity counters for spotting payment abuse: bursts of STK
+pushes from one user or phone number, and deposit or unlock/repay cycles
+run only to farm koin_score.
+
+A counter is two integers in the shared cache, the counts for the current
+fixed window and the one before it. The sliding count is the current one
+plus the previous one weighted by how much of it still lies inside the
+window, so recording an event is a single incr and reading a count a single
+get_many, however many events there were. Each key expires two windows
+after its own window starts.
+
+Events are counted per user and per phone number, so one phone behind
+several accounts adds up too. Limits are settings in DRF's rate syntax
+('20/min'), read as "at most 20 in any sliding minute".
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .throttling import PERIODS
+
+# event -> setting holding its limit
+LIMITS = {
+    # STK pushes asked for, including refused ones (deposits and split deposits)
+    'deposit_attempt': 'VELOCITY_DEPOSIT_ATTEMPT_LIMIT',
+    'repay_attempt': 'VELOCITY_REPAY_ATTEMPT_LIMIT',
+    # Completed deposits, each of which earns koin
+    'deposit': 'VELOCITY_DEPOSIT_LIMIT',
+    # Unlocks plus completed repayments
+    'order_cycle': 'VELOCITY_ORDER_CYCLE_LIMIT',
+}
+
+
+def parse_limit(limit):
+    """'20/min' -> (20, 60): events allowed, and the window in seconds."""
+    num, period = limit.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class SlidingWindowCounter:
+
+    def __init__(self, key, window):
+        self.key = f"velocity:{key}"
+        self.window = window
+
+    def _keys(self, now):
+        index = int(now // self.window)
+        weight = 1 - (now % self.window) / self.window
+        return f"{self.key}:{index}", f"{self.key}:{index - 1}", weight
+
+    def hit(self, now=None):
+        """Counts an event; returns the sliding count including it."""
+        now = time.time() if now is None else now
+        current, previous, weight = self._keys(now)
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            if cache.add(current, 1, 2 * self.window):
+                count = 1
+            else:
+                count = cache.incr(current)
+        return count + (cache.get(previous) or 0) * weight
+
+    def count(self, now=None):
+        now = time.time() if now is None else now
+        current, previous, weight = self._keys(now)
+        counts = cache.get_many([current, previous])
+        return counts.get(current, 0) + counts.get(previous, 0) * weight
+
+
+def counters(event, user):
+    """(limit, counters) for `event`: one per user, one per phone number."""
+    limit, window = parse_limit(getattr(settings, LIMITS[event]))
+    subjects = [f"user:{user.pk}"]
+    if user.phone_number:
+        subjects.append(f"phone:{user.phone_number}")
+    return limit, [SlidingWindowCounter(f"{event}:{subject}", window) for subject in subjects]
+
+
+def record(event, user):
+    """Counts an event that has happened (a settled payment, a new order)."""
+    for counter in counters(event, user)[1]:
+        counter.hit()
+
+
+def hit(event, user):
+    """
+    Counts an attempt and returns whether it is within the limit. Refused
+    attempts count as well, so a client that keeps hammering stays refused.
+    """
+    limit, event_counters = counters(event, user)
+    over = [counter.key for counter in event_counters if counter.hit() > limit]
+    if over:
+        print(f"Velocity limit hit for user #{user.pk}: {', '.join(over)}")
+    return not over
+
+
+def over_limit(event, user):
+    """Whether `user` has already reached the limit for `event`."""
+    limit, event_counters = counters(event, user)
+    over = [counter.key for counter in event_counters if counter.count() >= limit]
+    if over:
+        print(f"Velocity limit hit for user #{user.pk}: {', '.join(over)}")
+    return bool(over)
@@ -10,18 +10,38 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.db import transaction
 from django.db.models import F, Sum
 from django.utils import timezone
 from decimal import Decimal
-import requests
 
-from .models import Goal, Transaction, Product, User, Order, VendorPayout
+from core.db_router import ReplicaReadMixin, pin_to_primary
+from core.sharding import (
+    UserShardMixin, across_shards, ledger_atomic, ledger_db, ledger_shards, on_shard, select_related_across,
+    shard_for_user,
+)
+from core.fast_serializers import ValuesListMixin, ValuesSerializer
+from core.metrics import track_external_call
+from core.serializers import parse_field_spec, requested_expansions
+from .models import (
+    Goal, Transaction, ArchivedTransaction, SplitDeposit, Product, User, Order, Installment, VendorPayout,
+    RecurringDeposit, CallbackForward,
+)
+from .archive import is_archived_reference, newest_first, recent_history
+from .installments import allocate_payment, build_schedule, settle_schedule
 from .serializers import (
     GoalSerializer, GoalCreateSerializer, TransactionSerializer, ProductSerializer, 
-    OrderCreateSerializer, OrderSerializer, FCMTokenSerializer
+    OrderCreateSerializer, OrderSerializer, FCMTokenSerializer, RecurringDepositSerializer, SplitDepositSerializer,
+    index_orders_by_product
 )
-from .payhero_utils import initiate_payhero_push
+from users.serializers import UserSerializer
+from .payhero_utils import initiate_payhero_push, payment_reference, reference_owner_id
+from .response_cache import CachedListMixin, invalidate_user_responses
+from .throttling import OrderCreateThrottle, PayHeroThrottle
+from . import velocity
+from .summary import get_goal_summary, invalidate_goal_summary
+from .sync import build_sync_payload, InvalidSyncToken
 
 # --- 1. FIREBASE INITIALIZATION ---
 if not firebase_admin._apps:
@@ -60,7 +80,8 @@ def send_fcm_notification(user, title, body, data=None):
             data=data_payload,
             token=user.fcm_token,
         )
-        response = messaging.send(message)
+        with track_external_call('fcm'):
+            response = messaging.send(message)
         print('Successfully sent Data message:', response)
     except Exception as e:
         print('Error sending message:', e)
@@ -79,15 +100,19 @@ class UpdateFCMTokenView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # --- EXISTING VIEWS ---
-class GoalListCreateView(ListCreateAPIView):
+class GoalListCreateView(UserShardMixin, CachedListMixin, ValuesListMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = GoalSerializer 
+    # GETs skip model instances; see core/fast_serializers.py
+    values_serializer = ValuesSerializer(GoalSerializer)
 
     def get_queryset(self):
-        return Goal.objects.filter(owner=self.request.user)
+        expand = requested_expansions(self.request) & {'owner'}
+        return select_related_across(Goal.objects.filter(owner=self.request.user), *expand)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+        invalidate_goal_summary(self.request.user.id)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -102,19 +127,71 @@ class GoalListCreateView(ListCreateAPIView):
         headers = self.get_success_headers(response_serializer.data)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class GoalDetailView(RetrieveUpdateDestroyAPIView):
+class GoalDetailView(UserShardMixin, RetrieveUpdateDestroyAPIView):
     queryset = Goal.objects.all()
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated, IsOwner]
 
-class OrderListView(ListAPIView):
+    def perform_update(self, serializer):
+        goal = serializer.save()
+        invalidate_goal_summary(goal.owner_id)
+
+    def perform_destroy(self, instance):
+        owner_id = instance.owner_id
+        instance.delete()
+        invalidate_goal_summary(owner_id)
+
+class GoalSummaryView(UserShardMixin, APIView):
+    """
+    Savings dashboard: totals, per-goal progress, deposit velocity and
+    projected completion dates, built from one aggregate query and cached
+    per user until the next deposit callback.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_goal_summary(request.user), status=status.HTTP_200_OK)
+
+class RecurringDepositListCreateView(UserShardMixin, ListCreateAPIView):
+    serializer_class = RecurringDepositSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringDeposit.objects.filter(owner=self.request.user).order_by('next_run_at')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+class RecurringDepositDetailView(UserShardMixin, RetrieveUpdateDestroyAPIView):
+    serializer_class = RecurringDepositSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringDeposit.objects.filter(owner=self.request.user)
+
+class OrderListView(UserShardMixin, CachedListMixin, ListAPIView):
+    # Orders nest their product's details
+    response_cache_scopes = ('product',)
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-order_date')
+        expand = requested_expansions(self.request) & {'user'}
+        return (
+            select_related_across(Order.objects.filter(user=self.request.user), 'product', *expand)
+            .order_by('-order_date')
+        )
+
+    def list(self, request, *args, **kwargs):
+        # These are all of the user's orders, so they double as the nested
+        # product serializers' order lookup (no query per order).
+        orders = list(self.get_queryset())
+        context = self.get_serializer_context()
+        context['orders_by_product'] = index_orders_by_product(orders)
+        return Response(OrderSerializer(orders, many=True, context=context).data)
 
-class DepositView(APIView):
+class DepositView(UserShardMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PayHeroThrottle]
     def post(self, request, *args, **kwargs):
         user = request.user
         phone_number = user.phone_number
@@ -128,7 +205,10 @@ class DepositView(APIView):
             return Response({"error": "Goal not found or does not belong to user."}, status=status.HTTP_404_NOT_FOUND)
         if goal.current_amount >= goal.target_amount:
             return Response({"error": "This savings goal is already complete."}, status=status.HTTP_400_BAD_REQUEST)
-        external_reference = f"kampus_koin-deposit-{goal.id}-{int(timezone.now().timestamp())}"
+        if velocity.over_limit('deposit', user) or not velocity.hit('deposit_attempt', user):
+            return Response({"error": "Too many deposits. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        # The random tail keeps two taps in the same second from colliding on checkout_request_id
+        external_reference = payment_reference('deposit', goal.id, user.id, uuid.uuid4().hex[:6])
         try:
             Transaction.objects.create(
                 owner=user,
@@ -146,8 +226,62 @@ class DepositView(APIView):
             return Response({"error": "Failed to initiate STK push."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response({"message": "STK push initiated successfully. Please enter your PIN."}, status=status.HTTP_200_OK)
 
-class RepayView(APIView):
+class SplitDepositView(UserShardMixin, APIView):
+    """
+    One STK push for deposits into several goals:
+    {"allocations": [{"goal_id": 1, "amount": "300"}, {"goal_id": 2, "amount": "200"}]}.
+    """
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PayHeroThrottle]
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        if not user.phone_number:
+            return Response({"error": "Phone number is required."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = SplitDepositSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        allocations = serializer.validated_data['allocations']
+
+        goals = Goal.objects.in_bulk([allocation['goal_id'] for allocation in allocations])
+        if len(goals) != len(allocations) or any(goal.owner_id != user.id for goal in goals.values()):
+            return Response({"error": "Goal not found or does not belong to user."}, status=status.HTTP_404_NOT_FOUND)
+        complete = [goal.name for goal in goals.values() if goal.current_amount >= goal.target_amount]
+        if complete:
+            return Response(
+                {"error": f"These savings goals are already complete: {', '.join(complete)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if velocity.over_limit('deposit', user) or not velocity.hit('deposit_attempt', user):
+            return Response({"error": "Too many deposits. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        total = sum(allocation['amount'] for allocation in allocations)
+        external_reference = f"kampus_koin-split-{user.id}-{int(timezone.now().timestamp())}-{uuid.uuid4().hex[:6]}"
+        try:
+            with ledger_atomic():
+                split = SplitDeposit.objects.create(
+                    owner=user, checkout_request_id=external_reference, amount=total,
+                    allocations=[[allocation['goal_id'], str(allocation['amount'])] for allocation in allocations],
+                )
+                Transaction.objects.bulk_create([
+                    Transaction(
+                        owner=user, goal_id=allocation['goal_id'], transaction_type='DEPOSIT',
+                        amount=allocation['amount'], checkout_request_id=split.goal_reference(allocation['goal_id']),
+                        status='pending',
+                    )
+                    for allocation in allocations
+                ])
+                invalidate_user_responses(user.id)
+        except Exception as e:
+            print(f"Error creating pending split deposit: {e}")
+            return Response({"error": "Transaction error."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        payhero_response = initiate_payhero_push(user.phone_number, total, external_reference)
+        if not payhero_response:
+            return Response({"error": "Failed to initiate STK push."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"message": "STK push initiated successfully. Please enter your PIN."}, status=status.HTTP_200_OK)
+
+class RepayView(UserShardMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [PayHeroThrottle]
     def post(self, request, *args, **kwargs):
         user = request.user
         phone_number = user.phone_number
@@ -161,7 +295,9 @@ class RepayView(APIView):
             return Response({"error": "Order not found or does not belong to user."}, status=status.HTTP_404_NOT_FOUND)
         if order.status == 'PAID':
             return Response({"error": "This order is already fully paid."}, status=status.HTTP_400_BAD_REQUEST)
-        external_reference = f"kampus_koin-repayment-{order.id}-{int(timezone.now().timestamp())}"
+        if not velocity.hit('repay_attempt', user):
+            return Response({"error": "Too many repayments. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        external_reference = payment_reference('repayment', order.id, user.id, uuid.uuid4().hex[:6])
         try:
             Transaction.objects.create(
                 owner=user,
@@ -207,12 +343,49 @@ class PaymentCallbackView(APIView):
         return Response({"message": "Callback processed or forwarded"}, status=status.HTTP_200_OK)
 
     def process_kampus_koin_payment(self, callback_data, external_reference):
+        # Straight to the shard of the user the reference names; the others
+        # are only searched when the reference isn't found there
+        owner_id = reference_owner_id(external_reference)
+        with on_shard(shard_for_user(owner_id) if owner_id is not None else 'default'):
+            self.apply_kampus_koin_payment(callback_data, external_reference)
+
+    def other_reference_shard(self, external_reference):
+        """
+        Another ledger shard holding this reference's rows, for when the
+        current one doesn't (an older reference with no user, or a
+        rebalance still under way), or None.
+        """
+        if external_reference.startswith('kampus_koin-split-'):
+            models = [SplitDeposit]
+        else:
+            models = [Transaction, ArchivedTransaction]
+        for alias in ledger_shards():
+            if alias == ledger_db():
+                continue
+            if any(model.objects.using(alias).filter(checkout_request_id=external_reference).exists() for model in models):
+                return alias
+        return None
+
+    def apply_kampus_koin_payment(self, callback_data, external_reference):
         try:
+            if external_reference.startswith('kampus_koin-split-'):
+                self.process_split_deposit(callback_data, external_reference)
+                return
+
             existing_transaction = Transaction.objects.filter(checkout_request_id=external_reference).first()
             
             if existing_transaction and existing_transaction.status == 'completed':
                 print(f"Duplicate completed transaction ignored: {external_reference}")
                 return
+            # Settled long ago and moved out of the hot table
+            if not existing_transaction and is_archived_reference(external_reference):
+                print(f"Callback for archived transaction ignored: {external_reference}")
+                return
+            if not existing_transaction:
+                elsewhere = self.other_reference_shard(external_reference)
+                if elsewhere is not None:
+                    with on_shard(elsewhere):
+                        return self.apply_kampus_koin_payment(callback_data, external_reference)
 
             parts = external_reference.split('-')
             tx_type = parts[1].upper() 
@@ -236,7 +409,7 @@ class PaymentCallbackView(APIView):
             receipt_number = callback_data.get('Receipt') or callback_data.get('MpesaReceiptNumber') or callback_data.get('MPESA_Reference')
 
             if tx_type == 'DEPOSIT':
-                with transaction.atomic():
+                with ledger_atomic():
                     goal = Goal.objects.get(id=object_id)
                     user = goal.owner
                     
@@ -261,6 +434,10 @@ class PaymentCallbackView(APIView):
                             status='completed'
                         )
                     
+                    transaction.on_commit(lambda: invalidate_goal_summary(user.id))
+                    transaction.on_commit(lambda: pin_to_primary(user.id))
+                    transaction.on_commit(lambda: velocity.record('deposit', user))
+
                     # TRIGGER NOTIFICATION: DEPOSIT SUCCESS
                     send_fcm_notification(
                         user,
@@ -271,16 +448,18 @@ class PaymentCallbackView(APIView):
                     print(f"Successfully processed deposit for goal {goal.id}")
 
             elif tx_type == 'REPAYMENT':
-                with transaction.atomic():
+                with ledger_atomic():
                     order = Order.objects.get(id=object_id)
                     user = order.user
                     
                     order.amount_paid += amount_decimal
+                    allocate_payment(order, amount_decimal)
                     
                     if order.amount_paid >= order.amount_financed and order.status != 'PAID':
                         order.status = 'PAID'
                         user.koin_score += 1000 
                         user.save()
+                        settle_schedule(order)
                     
                     order.save()
                     
@@ -298,6 +477,9 @@ class PaymentCallbackView(APIView):
                             status='completed'
                         )
                     
+                    transaction.on_commit(lambda: pin_to_primary(user.id))
+                    transaction.on_commit(lambda: velocity.record('order_cycle', user))
+
                     # TRIGGER NOTIFICATION: REPAYMENT SUCCESS
                     send_fcm_notification(
                         user,
@@ -310,29 +492,179 @@ class PaymentCallbackView(APIView):
         except Exception as e:
             print(f"Error in process_kampus_koin_payment: {e}")
 
+    def process_split_deposit(self, callback_data, external_reference):
+        """
+        Settles a SplitDeposit in one database transaction with a fixed
+        number of queries, however many goals it covers: the goals and the
+        per-goal transactions are bulk-updated and the koin score is
+        incremented once for the whole amount.
+        """
+        with ledger_atomic():
+            split = select_related_across(
+                SplitDeposit.objects.select_for_update().filter(checkout_request_id=external_reference), 'owner',
+            ).first()
+            if not split:
+                elsewhere = self.other_reference_shard(external_reference)
+                if elsewhere is not None:
+                    with on_shard(elsewhere):
+                        return self.process_split_deposit(callback_data, external_reference)
+                print(f"Unknown split deposit ignored: {external_reference}")
+                return
+            if split.status != 'pending':
+                print(f"Duplicate split deposit callback ignored: {external_reference}")
+                return
+
+            user = split.owner
+            now = timezone.now()
+            pending = list(Transaction.objects.filter(checkout_request_id__in=split.references(), status='pending'))
+
+            if callback_data.get('ResultCode') != 0 and callback_data.get('Status') != 'Success':
+                print(f"Kampus Koin split deposit failed at MPESA. Ref: {external_reference}")
+                for tx in pending:
+                    tx.status = 'failed'
+                    tx.updated_at = now
+                Transaction.objects.bulk_update(pending, ['status', 'updated_at'])
+                split.status = 'failed'
+                split.save()
+                invalidate_user_responses(user.id)
+                send_fcm_notification(user, "Transaction Failed ⚠️", "Your deposit request could not be completed.")
+                return
+
+            amount_decimal = Decimal(str(callback_data.get('Amount')))
+            receipt_number = callback_data.get('Receipt') or callback_data.get('MpesaReceiptNumber') or callback_data.get('MPESA_Reference')
+            shares = split.shares(amount_decimal)
+
+            # Locked, so a concurrent single deposit to one of them isn't overwritten
+            goals = list(Goal.objects.select_for_update().filter(id__in=shares, owner=user))
+            for goal in goals:
+                goal.current_amount += shares[goal.id]
+                goal.updated_at = now
+            Goal.objects.bulk_update(goals, ['current_amount', 'updated_at'])
+            if len(goals) != len(shares):
+                print(f"Split deposit {external_reference}: goals {set(shares) - {goal.id for goal in goals}} no longer exist")
+
+            for tx in pending:
+                tx.status = 'completed'
+                tx.amount = shares[tx.goal_id]
+                tx.transaction_date = now
+                tx.updated_at = now
+            Transaction.objects.bulk_update(pending, ['status', 'amount', 'transaction_date', 'updated_at'])
+
+            User.objects.filter(id=user.id).update(koin_score=F('koin_score') + int((amount_decimal / 100) * 15))
+
+            split.status = 'completed'
+            split.mpesa_receipt_number = receipt_number
+            split.save()
+
+            # bulk_update() and update() skip the signals
+            invalidate_user_responses(user.id)
+            transaction.on_commit(lambda: invalidate_goal_summary(user.id))
+            transaction.on_commit(lambda: pin_to_primary(user.id))
+            transaction.on_commit(lambda: velocity.record('deposit', user))
+
+            send_fcm_notification(
+                user,
+                "Deposit Received! 💰",
+                f"Ksh. {amount_decimal:,.0f} has been deposited successfully across {len(goals)} goals.",
+                data={"type": "split_deposit", "goal_ids": ",".join(str(goal.id) for goal in goals), "amount": str(amount_decimal)}
+            )
+            print(f"Successfully processed split deposit {external_reference} for {len(goals)} goals")
+
     def forward_to_other_app(self, data):
         other_app_url = os.getenv('OTHER_APP_CALLBACK_URL')
         if not other_app_url:
             return
-        try: 
-            requests.post(other_app_url, json=data, timeout=5, verify=False)
-        except Exception as e:
-            print(f"Forwarding error: {e}")
+        # Queued rather than posted inline, so a slow or down app doesn't hold
+        # up PayHero's request; the forward_callbacks worker delivers it.
+        payload = data.dict() if hasattr(data, 'dict') else data
+        CallbackForward.objects.create(target_url=other_app_url, payload=payload)
 
-class TransactionListView(ListAPIView):
+class TransactionListView(UserShardMixin, CachedListMixin, ValuesListMixin, ListAPIView):
     serializer_class = TransactionSerializer
+    values_serializer = ValuesSerializer(TransactionSerializer)
     permission_classes = [IsAuthenticated]
     def get_queryset(self):
-        return Transaction.objects.filter(owner=self.request.user).order_by('-created_at')
+        expand = requested_expansions(self.request) & {'goal', 'goal__owner'}
+        return select_related_across(Transaction.objects.filter(owner=self.request.user), *expand).order_by('-created_at')
+
+    def get_archive_queryset(self):
+        expand = requested_expansions(self.request) & {'goal', 'goal__owner'}
+        return select_related_across(ArchivedTransaction.objects.filter(owner=self.request.user), *expand).order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        # The full history: hot rows merged with archived ones (see archive.py)
+        querysets = [self.get_queryset(), self.get_archive_queryset()]
+        if self.use_values_serializer(request):
+            return Response(self.values_serializer.serialize_merged(
+                querysets, 'created_at', fields=self.values_fields(request),
+            ))
+        return Response(self.get_serializer(list(newest_first(*querysets)), many=True).data)
+
+class SyncView(UserShardMixin, APIView):
+    """
+    Delta sync: `?since=<sync_token>` returns only the goals, orders and
+    transactions changed since that token, plus tombstones for deleted rows.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            payload = build_sync_payload(request, request.query_params.get('since'))
+        except InvalidSyncToken:
+            return Response({"error": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload, status=status.HTTP_200_OK)
+
+class BootstrapView(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    Everything the app loads on cold start (profile, goals, orders, products
+    and recent transactions) in one response. The user's orders are fetched
+    once and shared with the product serializers, so the whole payload costs
+    a fixed number of queries no matter how many products or orders exist.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
 
-class ProductListView(ListAPIView):
+        # ?fields= names sections first (fields=goals.id,user); unlisted
+        # sections are not built at all
+        wanted = parse_field_spec(request.query_params.get('fields'))
+        sections = {
+            'user': lambda context: UserSerializer(user, context=context),
+            'goals': lambda context: GoalSerializer(Goal.objects.filter(owner=user), many=True, context=context),
+            'orders': lambda context: OrderSerializer(orders, many=True, context=context),
+            'products': lambda context: ProductSerializer(Product.objects.all(), many=True, context=context),
+            'transactions': lambda context: TransactionSerializer(
+                recent_history(user, settings.BOOTSTRAP_RECENT_TRANSACTIONS), many=True, context=context,
+            ),
+        }
+        if wanted:
+            sections = {name: build for name, build in sections.items() if name in wanted}
+
+        orders = []
+        if 'orders' in sections or 'products' in sections:
+            orders = list(select_related_across(Order.objects.filter(user=user), 'product').order_by('-order_date'))
+        context = {'request': request, 'orders_by_product': index_orders_by_product(orders)}
+
+        return Response({
+            name: build({**context, 'sparse_path': [name]}).data for name, build in sections.items()
+        }, status=status.HTTP_200_OK)
+
+class ProductListView(UserShardMixin, ReplicaReadMixin, ListAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # One query for the user's orders instead of two per product
+        context['orders_by_product'] = index_orders_by_product(Order.objects.filter(user=self.request.user))
+        return context
+
 # --- 4. UPDATED ORDER CREATE VIEW (Smart Deduction) ---
-class OrderCreateView(CreateAPIView):
+class OrderCreateView(UserShardMixin, CreateAPIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [OrderCreateThrottle]
     serializer_class = OrderCreateSerializer 
     
     def create(self, request, *args, **kwargs):
@@ -357,9 +689,13 @@ class OrderCreateView(CreateAPIView):
         if Order.objects.filter(user=user, product=product).exists():
             raise ValidationError("You have already unlocked this item.")
 
+        # Unlock/repay cycles farm koin_score
+        if velocity.over_limit('order_cycle', user):
+            return Response({"error": "Too many unlocks. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
         down_payment = product.price * Decimal('0.25')
 
-        with transaction.atomic():
+        with ledger_atomic():
             # STRATEGY A: Specific Goals Deduction (Multi-select or Single)
             if specific_goal_ids:
                 # Fetch only the selected goals belonging to user
@@ -419,11 +755,16 @@ class OrderCreateView(CreateAPIView):
                 down_payment=down_payment,
                 amount_financed=amount_financed
             )
+            Installment.objects.bulk_create(build_schedule(order))
 
             User.objects.filter(id=user.id).update(
                 koin_score = F('koin_score') - product.required_koin_score
             )
             user.refresh_from_db()
+
+            # The down payment came out of the user's goals
+            transaction.on_commit(lambda: invalidate_goal_summary(user.id))
+            transaction.on_commit(lambda: velocity.record('order_cycle', user))
         
         output_serializer = OrderSerializer(order, context={'request': request})
         headers = self.get_success_headers(output_serializer.data)
@@ -437,9 +778,17 @@ class VerifyPickupView(APIView):
         if not qr_code:
             return Response({"error": "QR code is required."}, status=status.HTTP_400_BAD_REQUEST)
         
+        # The vendor's scan says nothing about whose order it is, so every
+        # ledger shard is asked
+        order = None
         try:
-            order = Order.objects.get(pickup_qr_code=qr_code)
-        except (Order.DoesNotExist, ValidationError):
+            for orders in across_shards(Order.objects.filter(pickup_qr_code=qr_code)):
+                order = orders.first()
+                if order is not None:
+                    break
+        except ValidationError:
+            pass
+        if order is None:
             return Response({"error": "Invalid or expired QR code."}, status=status.HTTP_404_NOT_FOUND)
 
         if order.status != 'READY_FOR_PICKUP':
@@ -448,7 +797,7 @@ class VerifyPickupView(APIView):
                 "current_status": order.status
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        with transaction.atomic():
+        with on_shard(order._state.db), transaction.atomic(using=order._state.db):
             order.status = 'COMPLETED' 
             order.save()
             
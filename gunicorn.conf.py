@@ -0,0 +1,35 @@
+# backend/gunicorn.conf.py
+# Picked up automatically when gunicorn is started from the project root.
+
+import os
+import shutil
+
+# WSGI (default):  gunicorn core.wsgi
+# ASGI:            GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn core.asgi
+# Under ASGI the async payment views (finance/async_views.py) hold a
+# coroutine, not a thread, while they wait on PayHero.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+if 'Uvicorn' in worker_class:
+    # See DB_CONN_MAX_AGE in core/settings.py
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+
+def on_starting(server):
+    # Metrics files from a previous run would be summed into the new one
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # The app is loaded; warm it before this worker accepts connections
+    from core.warmup import warm_up
+    warm_up()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,9 +1,10 @@
 # users/serializers.py
 
 from rest_framework import serializers
+from core.serializers import SparseFieldsetsMixin
 from .models import User
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     profile_picture = serializers.SerializerMethodField()
     class Meta:
         model = User
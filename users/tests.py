@@ -1,3 +1,35 @@
+from unittest import skipUnless
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmarks import RUN_BENCHMARKS, Scenario, check_scenarios, seed_benchmark_data, uncovered_url_names
+from .urls import urlpatterns
+
+
+# --- ENDPOINT BENCHMARKS (see core/benchmarks.py) ---
+
+USERS_SCENARIOS = [
+    Scenario('register', 'POST', '/api/users/register/',
+             lambda data, i: {'email': f"new{i}@bench.test", 'name': "New Student", 'password': "bench-pass-123"},
+             status=201, auth=False),
+    Scenario('me', 'GET', '/api/users/me/'),
+    Scenario('me', 'PATCH', '/api/users/me/', {'name': "Renamed Student"}),
+]
+
+
+class UsersEndpointBenchmarkTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_benchmark_data()
+
+    def test_every_endpoint_has_a_scenario(self):
+        self.assertEqual(uncovered_url_names(urlpatterns, USERS_SCENARIOS), [])
+
+    def test_query_counts_within_baseline(self):
+        check_scenarios(self, USERS_SCENARIOS, self.data)
+
+    @skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to measure latency")
+    def test_latency_within_baseline(self):
+        check_scenarios(self, USERS_SCENARIOS, self.data, measure_latency=True)